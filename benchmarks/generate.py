@@ -0,0 +1,103 @@
+"""
+Generators of synthetic ssh configs, key directories and known_hosts files for the benchmarks.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import shutil
+
+
+def host_name(i) -> str:
+    return f"host{i:06}"
+
+
+def write_config(path, hosts, comments=True, wildcards=True, aliases=False):
+    """
+    This function writes an ssh config with `hosts` hosts, with a mix of options, comments and wildcard blocks
+    like a real config.
+    :param path: The path of the config file
+    :param hosts: The number of hosts
+    :param comments: Whether to add comments (a group comment every 10 hosts)
+    :param wildcards: Whether to add wildcard blocks (two every 100 hosts)
+    :param aliases: Whether every `Host` line has a second name (e.g. `Host host000001 host000001.example.com`)
+    """
+    with open(path, "w") as file:
+        file.write("# generated\nUser admin\n\n")
+        for i in range(hosts):
+            if comments and i % 10 == 0:
+                file.write(f"# group {i // 10}\n")
+            if wildcards and i % 100 == 0:
+                file.write(f"Host *.group{i // 100}.example.com\n    ForwardAgent no\n\n"
+                           f"Host host{i // 100:04}??\n    ServerAliveInterval 60\n\n")
+            alias = f" {host_name(i)}.example.com" if aliases else ""
+            file.write(f"Host {host_name(i)}{alias}\n"
+                       f"    HostName 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}\n"
+                       f"    User deploy\n"
+                       f"    Port {22 + i % 3}\n"
+                       f"    IdentityFile {os.path.dirname(path)}/keys/{host_name(i)}\n\n")
+        file.write("Host *\n    ServerAliveInterval 30\n")
+
+
+def write_fragments(path, config_dir, hosts):
+    """
+    This function writes an ssh config that includes a config directory with one file per host
+    (like `SSH_CLI_CONFIG_DIR`), with the hosts of `write_config`.
+    :param path: The path of the config file
+    :param config_dir: The path of the config directory (it is emptied first)
+    :param hosts: The number of hosts
+    """
+    shutil.rmtree(config_dir, ignore_errors=True)
+    os.makedirs(config_dir)
+    with open(path, "w") as file:
+        file.write(f"Include {config_dir}/*\n\n# generated\nUser admin\n\nHost *\n    ServerAliveInterval 30\n")
+    for i in range(hosts):
+        with open(os.path.join(config_dir, host_name(i)), "w") as file:
+            file.write(f"Host {host_name(i)}\n"
+                       f"    HostName 10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}\n"
+                       f"    User deploy\n"
+                       f"    IdentityFile {os.path.dirname(path)}/keys/{host_name(i)}\n")
+
+
+def _public_key(name) -> str:
+    # a well-formed ed25519 public key (derived from the name, not a real key pair)
+    blob = b"".join(len(part).to_bytes(4, "big") + part
+                    for part in (b"ssh-ed25519", hashlib.sha256(name.encode()).digest()))
+    return f"ssh-ed25519 {base64.b64encode(blob).decode()} key_for_{name}\n"
+
+
+def write_key_dir(path, hosts, unused=0.1):
+    """
+    This function writes a key directory with key files for the hosts of `write_config` (empty private key files
+    and public key files), plus `unused` (a fraction of `hosts`) key files that no host uses.
+    :param path: The path of the key directory
+    :param hosts: The number of hosts
+    :param unused: The fraction of additional unused key files
+    """
+    os.makedirs(path, exist_ok=True)
+    names = [host_name(i) for i in range(hosts)] + [f"unused{i:06}" for i in range(int(hosts * unused))]
+    for name in names:
+        with open(os.path.join(path, name), "w"):
+            pass
+        with open(os.path.join(path, f"{name}.pub"), "w") as file:
+            file.write(_public_key(name))
+
+
+def write_known_hosts(path, hosts, hashed=0.5):
+    """
+    This function writes a known_hosts file with an entry for the hostname of every host of `write_config`,
+    a fraction `hashed` of them is hashed (like with `HashKnownHosts yes`).
+    :param path: The path of the known_hosts file
+    :param hosts: The number of hosts
+    :param hashed: The fraction of hashed entries
+    """
+    key = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIOMqqnkVzrm0SdG6UOoqKLsabgH5C9okWi0dh2l9GKJl"
+    every = round(1 / hashed) if hashed else 0
+    with open(path, "w") as file:
+        for i in range(hosts):
+            name = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+            if every and i % every == 0:
+                salt = hashlib.sha1(name.encode()).digest()
+                digest = hmac.new(salt, name.encode(), hashlib.sha1).digest()
+                name = f"|1|{base64.b64encode(salt).decode()}|{base64.b64encode(digest).decode()}"
+            file.write(f"{name} {key}\n")
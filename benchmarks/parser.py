@@ -0,0 +1,64 @@
+"""
+Compares the ssh config parser of ssh-cli with `sshconf` (parse time and peak memory).
+
+    python benchmarks/parser.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generate import write_config  # noqa: E402
+from ssh_cli import sshconfig  # noqa: E402
+
+
+def measure(parse, path, repeat) -> tuple[float, float]:
+    """
+    This function measures the best parse time (seconds) and the peak memory (MiB) of a parser.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        parse(path)
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    c = parse(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del c
+    return best, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    parsers = {"ssh-cli": sshconfig.read_ssh_config}
+    try:
+        import sshconf
+        parsers["sshconf"] = sshconf.read_ssh_config
+    except ImportError:
+        print("sshconf is not installed, only ssh-cli is measured")
+
+    print(f"{'hosts':>8}  {'parser':<8}  {'parse':>10}  {'peak memory':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"config-{size}")
+            write_config(path, size, aliases=True)
+            for name, parse in parsers.items():
+                seconds, mib = measure(parse, path, args.repeat)
+                print(f"{size:>8}  {name:<8}  {seconds * 1000:>7.1f} ms  {mib:>8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
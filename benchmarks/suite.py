@@ -0,0 +1,225 @@
+"""
+Times the main code paths of ssh-cli on synthetic configs and key directories, and compares the results with a baseline.
+
+    python benchmarks/suite.py [--sizes 1000 10000 100000] [--repeat 3] [--output results.json]
+                               [--baseline old.json] [--max-regression 1.25] [--threshold load_cold=1.5 ...]
+
+Every benchmark runs in a temporary directory (config, keys, known_hosts and cache), the best of `--repeat` runs
+is recorded. With `--baseline`, the exit code is 1 if a benchmark is slower than the baseline by more than its
+threshold (the ratio of `--max-regression`, or the one given with `--threshold NAME=RATIO`).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate import host_name, write_config, write_fragments, write_key_dir, write_known_hosts
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# differences below this (in seconds) are noise, they are never reported as a regression
+NOISE = 0.002
+
+
+def _best(run, repeat, setup=None) -> float:
+    """
+    This function returns the best time (seconds) of `repeat` runs, `setup` is called before every run (not timed).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _startup(env, repeat) -> tuple[float, float]:
+    """
+    This function measures the import time of the package and the run time of `ssh-cli --version` (seconds).
+    """
+    code = "import sys; sys.argv = ['ssh-cli', '--version']; from ssh_cli import main; main()"
+    best_import, best_run = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             env=env, capture_output=True, text=True, cwd=ROOT)
+        best_run = min(best_run, time.perf_counter() - start)
+        for line in res.stderr.splitlines():
+            if line.startswith("import time:") and line.endswith("| ssh_cli"):
+                best_import = min(best_import, int(line.split("|")[1]) / 1e6)
+    return best_import, best_run
+
+
+def run_suite(sizes, repeat) -> dict:
+    """
+    This function runs all benchmarks for every size.
+    The environment of ssh-cli must point into a temporary directory (see `main`).
+    :param sizes: The numbers of hosts
+    :param repeat: The number of runs per benchmark
+    :return: A dict mapping `name[size]` to the best time in seconds
+    """
+    from ssh_cli import store
+    from ssh_cli.cmds.cleanup import _cleanup_key_files
+    from ssh_cli.cmds.delete import _delete_hosts
+    from ssh_cli.cmds.list import ListHosts
+    from ssh_cli.config import CONFIG_FILE_PATH, KEY_DIR_PATH, KNOWN_HOSTS_PATH
+    from ssh_cli.index import HostIndex
+    from ssh_cli.keys import PublicKeyCache
+    from ssh_cli.validation import host_exists
+
+    results = {}
+    for size in sizes:
+        def generate():
+            write_config(CONFIG_FILE_PATH, size)
+            write_known_hosts(KNOWN_HOSTS_PATH, size)
+            store.invalidate_cache()
+
+        generate()
+        shutil.rmtree(KEY_DIR_PATH, ignore_errors=True)
+        write_key_dir(KEY_DIR_PATH, size)
+
+        results[f"load_cold[{size}]"] = _best(store.load_config, repeat, setup=store.invalidate_cache)
+        results[f"load_cached[{size}]"] = _best(store.load_config, repeat)
+        results[f"list_table[{size}]"] = _best(lambda: ListHosts().run(), repeat)
+        results[f"list_ndjson[{size}]"] = _best(lambda: ListHosts().run(format="ndjson"), repeat)
+        results[f"list_effective[{size}]"] = _best(lambda: ListHosts().run(effective=True, format="ndjson"), repeat)
+        # the public keys of all hosts, read and hashed (cold) or from the cache of public keys
+        def list_keys():
+            ListHosts().run(format="ndjson", columns="name,key")
+
+        results[f"list_keys_cold[{size}]"] = _best(list_keys, repeat,
+                                                   setup=lambda: PublicKeyCache().path.unlink(missing_ok=True))
+        results[f"list_keys[{size}]"] = _best(list_keys, repeat)
+        results[f"host_exists[{size}]"] = _best(lambda: host_exists(None, "new-host"), repeat)
+        index = HostIndex(store.load_config())
+        results[f"host_exists_indexed[{size}]"] = _best(lambda: host_exists(None, "new-host", index), repeat)
+        results[f"cleanup_dry_run[{size}]"] = _best(
+            lambda: _cleanup_key_files(store.load_config(), dry_run=True), repeat
+        )
+        # delete 10 hosts (their key files and known_hosts entries), from a fresh config every run
+        results[f"delete[{size}]"] = _best(
+            lambda: _delete_hosts(store.load_config(), [host_name(i) for i in range(0, size, max(size // 10, 1))]),
+            repeat, setup=generate
+        )
+
+        # create a host (and write the config), in one config file or in a file of its own in a config directory
+        def create():
+            c = store.load_config()
+            store.add_host(c, "new-host", HostName="10.255.255.1")
+            store.save_config(c)
+
+        results[f"create[{size}]"] = _best(create, repeat, setup=generate)
+
+        config_dir = os.path.join(os.path.dirname(CONFIG_FILE_PATH), "config.d")
+        changed, new_host = os.path.join(config_dir, host_name(0)), os.path.join(config_dir, "new-host")
+
+        def change_fragment():
+            with open(changed, "a") as file:
+                file.write("# changed\n")
+
+        def remove_new_host():
+            if os.path.exists(new_host):
+                os.remove(new_host)
+            store.load_config()
+
+        write_fragments(CONFIG_FILE_PATH, config_dir, size)
+        store.invalidate_cache()
+        store.CONFIG_DIR = config_dir
+        try:
+            results[f"load_fragments_cold[{size}]"] = _best(store.load_config, repeat, setup=store.invalidate_cache)
+            # one file changed since the config was cached, only this file is parsed again
+            results[f"load_fragments_changed[{size}]"] = _best(store.load_config, repeat, setup=change_fragment)
+            results[f"create_fragment[{size}]"] = _best(create, repeat, setup=remove_new_host)
+        finally:
+            store.CONFIG_DIR = None
+    return results
+
+
+def compare(results, baseline, max_regression, thresholds) -> list[str]:
+    """
+    This function compares results with a baseline.
+    :param results: The results (see `run_suite`)
+    :param baseline: The baseline results
+    :param max_regression: The default maximum ratio of a result to its baseline
+    :param thresholds: A dict mapping benchmark names (without the size) to their maximum ratio
+    :return: A message per regression
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if (before := baseline.get(name)) is None:
+            continue
+        limit = thresholds.get(name.partition("[")[0], max_regression)
+        if seconds > before * limit and seconds - before > NOISE:
+            regressions.append(f"{name}: {seconds * 1000:.1f} ms (baseline {before * 1000:.1f} ms, "
+                               f"x{seconds / before:.2f} > x{limit})")
+    return regressions
+
+
+def _threshold(value) -> tuple[str, float]:
+    name, _, ratio = value.partition("=")
+    return name, float(ratio)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", metavar="FILE", help="Write the results to a JSON file")
+    parser.add_argument("--baseline", metavar="FILE", help="Compare the results with a JSON file of a previous run")
+    parser.add_argument("--max-regression", type=float, default=1.25, metavar="RATIO")
+    parser.add_argument("--threshold", type=_threshold, action="append", default=[], metavar="NAME=RATIO")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # ssh-cli reads its paths from the environment when it is imported
+        env = {
+            **os.environ,
+            "USER": os.getenv("USER") or "benchmark",
+            "SSH_CLI_CONFIG_PATH": os.path.join(tmp, "config"),
+            "SSH_CLI_KEY_DIR": os.path.join(tmp, "keys"),
+            "SSH_CLI_KNOWN_HOSTS": os.path.join(tmp, "known_hosts"),
+            "SSH_CLI_CACHE_DIR": os.path.join(tmp, "cache"),
+            "SSH_CLI_KEY_POOL_SIZE": "0",
+        }
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+
+        results = run_suite(args.sizes, args.repeat)
+        results["startup_import"], results["startup_run"] = _startup(env, args.repeat)
+
+    print(f"{'benchmark':<30}  {'time':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<30}  {seconds * 1000:>9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        if regressions := compare(results, baseline, args.max_regression, dict(args.threshold)):
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
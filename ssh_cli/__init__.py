@@ -1 +1,2 @@
+from . import trace  # imported first, so that a trace covers the imports of the package (see SSH_CLI_TRACE)
 from .__main__ import main
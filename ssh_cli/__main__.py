@@ -1,20 +1,21 @@
 from argparse import ArgumentParser
-from importlib.metadata import version
 
-import inquirer
-from termcolor import cprint
-
-from .cmds import CreateCmd, ConnectCmd, DeleteCmd, EditorCmd, ListCmd, ShowHostCmd, CleanupCmd
+from .trace import span, add_span, startup_time
+from .cmds import COMMANDS
 from .cmds.interface import Command
-from .config import CONFIG_FILE_PATH, KEY_DIR_PATH, KEY_TYPE, DEFAULT_USER, SSH_DEFAULT_PORT, EDITOR
+from .config import CONFIG_FILE_PATH, KEY_DIR_PATH, KNOWN_HOSTS_PATH, KEY_TYPE, DEFAULT_USER, SSH_DEFAULT_PORT, \
+    EDITOR, CACHE_DIR, USAGE_LOG_PATH, CONTROL_DIR, ensure_environment
 
-COMMANDS = [ListCmd(), ShowHostCmd(), ConnectCmd(), CreateCmd(), DeleteCmd(), EditorCmd(), CleanupCmd()]
+# note: the dependencies of the commands (inquirer, termcolor, ...) are imported where they are used,
+# so that e.g. `ssh-cli --version` starts without importing them (see tests/test_startup.py)
 
 
 def _show_title():
     """
     This function prints the welcome title.
     """
+    from termcolor import cprint
+
     print()
     cprint("Welcome to the SSH CLI Tool", "green")
     print()
@@ -37,13 +38,19 @@ class ShowCLIConfig(Command):
         """
         This function prints the configuration of this tool.
         """
+        from termcolor import cprint
+
         cprint("Configuration", "green")
         cprint(f"Config file path: {CONFIG_FILE_PATH}")
         cprint(f"Key directory path: {KEY_DIR_PATH}")
+        cprint(f"Known hosts file path: {KNOWN_HOSTS_PATH}")
         cprint(f"Key type: {KEY_TYPE}")
         cprint(f"Default user: {DEFAULT_USER}")
         cprint(f"Default port: {SSH_DEFAULT_PORT}")
         cprint(f"Editor: {EDITOR}")
+        cprint(f"Cache directory path: {CACHE_DIR}")
+        cprint(f"Usage log path: {USAGE_LOG_PATH}")
+        cprint(f"Control socket directory path: {CONTROL_DIR}")
         return 0
 
 
@@ -58,12 +65,21 @@ class ShellCmd(Command):
         return "shell"
 
     def run(self, *args, **kwargs) -> int:
+        """
+        This function runs the selected commands in a loop. The parsed config and its host index are kept in memory
+        for the whole session (and passed to the commands), they are only loaded again when the config file changes.
+        """
+        import inquirer
+        from termcolor import cprint
 
+        from .session import Session
+
+        session = Session()
         questions = [
             inquirer.List(
                 "cmd",
                 message="What do you want to do?",
-                choices=[cmd.help for cmd in COMMANDS],
+                choices=[(cmd.help, cmd) for cmd in COMMANDS],
             ),
         ]
 
@@ -75,19 +91,43 @@ class ShellCmd(Command):
             elif answers is None:
                 continue
 
-            for cmd in COMMANDS:
-                if cmd.help == answers["cmd"]:
-                    cmd.run()
-                    break
-            else:
-                cprint("Invalid option", "red")
+            cmd = answers["cmd"]
+            with span(f"run {cmd.cmd}"):
+                cmd.run(session=session)
 
             print()
 
+        session.close()
         cprint("Exiting - run `ssh-cli` to start again.", "yellow")
         return 0
 
 
+class CompletionCmd(Command):
+
+    @property
+    def help(self):
+        return "Print the completion script of a shell (e.g. `source <(ssh-cli --completion bash)`)"
+
+    @property
+    def cmd(self):
+        return "completion"
+
+    @property
+    def argument(self) -> dict:
+        return {"choices": ["bash", "zsh", "fish"], "metavar": "SHELL"}
+
+    def run(self, *args, completion=None, **kwargs) -> int:
+        """
+        This function prints the completion script of a shell, the host names are completed from a plain-text file
+        (written whenever the config is parsed or saved) without running ssh-cli.
+        """
+        from .completion import completion_script
+        from .store import hosts_file
+
+        print(completion_script(completion, _build_parser(_commands()), hosts_file()), end="")
+        return 0
+
+
 class VersionCmd(Command):
 
     @property
@@ -99,38 +139,142 @@ class VersionCmd(Command):
         return "version"
 
     def run(self, *args, **kwargs) -> int:
+        from importlib.metadata import version
+        from termcolor import cprint
+
         cprint(f"ssh-cli v{version(__package__ or __name__)}", "green")
         return 0
 
 
-def main():
+def _run_command(cmd: Command, args) -> int:
     """
-    This function parses the command line arguments and runs the appropriate function.
+    This function runs the selected command, with `--profile FILE` under cProfile (the stats are written to FILE).
     """
+    with span(f"run {cmd.cmd}"):
+        if not args.profile:
+            return cmd.run(**vars(args))
+
+        import cProfile
+        import sys
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(cmd.run, **vars(args))
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile} (view it with `python -m pstats {args.profile}`)",
+                  file=sys.stderr)
+
+
+# the commands that use the positional host
+_HOST_COMMANDS = {"connect", "show", "delete", "exec", "rotate-keys"}
+
+
+def _commands() -> list[Command]:
+    return [ShellCmd(), *COMMANDS, ShowCLIConfig(), CompletionCmd(), VersionCmd()]
 
+
+def _build_parser(commands) -> ArgumentParser:
+    """
+    This function creates the parser of the command line arguments.
+    :param commands: The commands (each one is selected with a flag)
+    :return: The argument parser
+    """
     # create a parser object
     parser = ArgumentParser(
         description="A simple CLI tool to manage your ssh config",
     )
 
-    commands = [ShellCmd(), *COMMANDS, ShowCLIConfig(), VersionCmd()]
+    # the host of --connect, --show, --delete, --exec and --rotate-keys (instead of prompting for it), --warm takes
+    # its hosts as the value of the flag
+    parser.add_argument("host", nargs="?", help="The host to use (without a command: connect to it)")
 
     # add the arguments
     for cmd in commands:
-        parser.add_argument(f"--{cmd.cmd}", action="store_true", help=cmd.help)
+        parser.add_argument(f"--{cmd.cmd}", help=cmd.help, **cmd.argument)
+
+    # add the options of the commands, they are passed to the selected command as keyword arguments
+    options = parser.add_argument_group("options")
+    options.add_argument("--from", dest="from_file", metavar="FILE",
+                         help="Create all hosts of a CSV, JSON or YAML file (`-` for stdin), use with --create")
+    options.add_argument("--from-format", choices=["csv", "json", "yaml"],
+                         help="The format of the --from file (default: detect it)")
+    options.add_argument("--keys", action="store_true",
+                         help="Generate a key file for every host created with --from that has no identityfile")
+    options.add_argument("--persist", action="store_true",
+                         help="Keep the connection open in the background as a master connection (for "
+                              "SSH_CLI_CONTROL_PERSIST) so the next connect skips the handshake, use with --connect")
+    options.add_argument("--concurrency", type=int, metavar="N",
+                         help="The maximum number of concurrent processes, --probe connections, "
+                              "--doctor file checks or --rotate-keys hosts")
+    options.add_argument("--dry-run", action="store_true",
+                         help="Only show the key files that would be removed, use with --cleanup")
+    options.add_argument("--recursive", action="store_true",
+                         help="Include the key files in subdirectories of the key directory, use with --cleanup")
+    options.add_argument("--probe", action="store_true",
+                         help="Check that an SSH server answers on every host, use with --list")
+    options.add_argument("--effective", action="store_true",
+                         help="Show the effective options of hosts (as ssh resolves them), use with --show or --list")
+    options.add_argument("--timeout", type=float, metavar="SECONDS",
+                         help="The timeout per host of --probe (default: 3) and --exec (default: none), "
+                              "per ssh command of --rotate-keys (default: 30)")
+    options.add_argument("--hosts", metavar="PATTERN",
+                         help="Select the hosts matching a pattern (e.g. `web*,!web-old`), "
+                              "use with --exec, --delete, --show or --rotate-keys")
+    options.add_argument("--collect", action="store_true",
+                         help="Print the output of --exec grouped by host (instead of line by line as it arrives)")
+
+    options.add_argument("--format", choices=["table", "json", "ndjson", "tsv"],
+                         help="The output format of --list, --show and --doctor (default: table), "
+                              "the other formats are written row by row for scripts")
+    options.add_argument("--columns", metavar="COLUMNS",
+                         help="The columns of --list and --show, e.g. `name,hostname,user,port,identityfile`")
+
+    options.add_argument("--sort", choices=["name", "recent"],
+                         help="The order of --list (default: name), `recent` lists the hosts used most "
+                              "(and most recently) first")
+    options.add_argument("--profile", metavar="FILE",
+                         help="Profile the command with cProfile and write the stats to FILE "
+                              "(set SSH_CLI_TRACE=1 for a summary of the phases)")
+    return parser
 
-    args = parser.parse_args()
 
-    # show the title
-    _show_title()
+def main():
+    """
+    This function parses the command line arguments and runs the appropriate function.
+    """
+    add_span("import ssh_cli", startup_time())
+
+    commands = _commands()
+    with span("parse arguments"):
+        parser = _build_parser(commands)
+        args = parser.parse_args()
+
+    # a host without a command connects to it
+    # `is not False` rather than `not in (None, False)`: `--refill-keys 0` selects its command and 0 == False
+    selected = next((cmd for cmd in commands
+                     if (value := getattr(args, cmd.cmd.replace("-", "_"))) is not None and value is not False), None)
+    if args.host is not None:
+        if selected is None:
+            selected = next(cmd for cmd in commands if cmd.cmd == "connect")
+            args.connect = True
+        elif selected.cmd not in _HOST_COMMANDS:
+            parser.error(f"--{selected.cmd} doesn't take a host (got `{args.host}`)")
+
+    if args.completion:
+        # the script is meant to be sourced, nothing else may be printed
+        exit(_run_command(next(cmd for cmd in commands if isinstance(cmd, CompletionCmd)), args))
+
+    # show the title (not in front of machine-readable output)
+    if args.format in (None, "table"):
+        _show_title()
 
     # run the appropriate function
-    for cmd in commands:
-        if getattr(args, cmd.cmd):
-            code = cmd.run()
-            exit(code)
-    else:
+    if selected is None:
         parser.print_help()
+    else:
+        ensure_environment()
+        exit(_run_command(selected, args))
 
 
 if __name__ == "__main__":
@@ -1,7 +1,48 @@
-from .cleanup import CleanupKeys as CleanupCmd
-from .connect import Connect as ConnectCmd
-from .create import CreateHostConfig as CreateCmd
-from .delete import Delete as DeleteCmd
-from .editor import Editor as EditorCmd
-from .list import ListHosts as ListCmd
-from .show_host import ShowHost as ShowHostCmd
+import importlib
+
+from .interface import LazyCommand
+
+# the commands are registered lazily, their modules (and dependencies) are only imported when a command runs
+COMMANDS = [
+    LazyCommand("list", "List all the hosts in the ssh config file", ".list", "ListHosts"),
+    LazyCommand("show", "Show the details of a host", ".show_host", "ShowHost"),
+    LazyCommand("connect", "Connect to a host via ssh", ".connect", "Connect"),
+    LazyCommand("create", "Create a new host", ".create", "CreateHostConfig"),
+    LazyCommand("delete", "Delete a host (and keys) from the ssh config", ".delete", "Delete"),
+    LazyCommand("editor", "Edit the ssh config file", ".editor", "Editor"),
+    LazyCommand("cleanup", "Cleanup all key files that are not in the ssh config", ".cleanup", "CleanupKeys"),
+    LazyCommand("refill-keys", "Fill the pool of spare keys (used to create hosts instantly) up to N keys",
+                ".refill_keys", "RefillKeys", {"type": int, "metavar": "N"}),
+    LazyCommand("warm", "Open persistent master connections to hosts in the background (for fast connects)",
+                ".warm", "Warm", {"nargs": "+", "metavar": "HOST"}),
+    LazyCommand("masters", "List and close the open master connections", ".masters", "Masters"),
+    LazyCommand("rotate-keys", "Replace the keys of the hosts selected with --hosts (or a selected host) with new keys",
+                ".rotate_keys", "RotateKeys"),
+    LazyCommand("doctor", "Check the ssh config and the key files of all hosts for problems", ".doctor", "Doctor"),
+    LazyCommand("exec", "Run a command on the hosts selected with --hosts (or a selected host)", ".exec", "Exec",
+                {"metavar": "CMD"}),
+]
+
+_EXPORTS = {
+    "CleanupCmd": (".cleanup", "CleanupKeys"),
+    "ConnectCmd": (".connect", "Connect"),
+    "CreateCmd": (".create", "CreateHostConfig"),
+    "DeleteCmd": (".delete", "Delete"),
+    "DoctorCmd": (".doctor", "Doctor"),
+    "EditorCmd": (".editor", "Editor"),
+    "ExecCmd": (".exec", "Exec"),
+    "ListCmd": (".list", "ListHosts"),
+    "MastersCmd": (".masters", "Masters"),
+    "RefillKeysCmd": (".refill_keys", "RefillKeys"),
+    "RotateKeysCmd": (".rotate_keys", "RotateKeys"),
+    "ShowHostCmd": (".show_host", "ShowHost"),
+    "WarmCmd": (".warm", "Warm"),
+}
+
+
+def __getattr__(name):
+    # the command classes are still importable from here, e.g. `from ssh_cli.cmds import ListCmd`
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _EXPORTS[name]
+    return getattr(importlib.import_module(module, __name__), attr)
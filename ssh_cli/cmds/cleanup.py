@@ -1,50 +1,92 @@
 import os
 
-from sshconf import read_ssh_config
+import inquirer
 from termcolor import cprint
 
 from .interface import Command
-from ..config import CONFIG_FILE_PATH, KEY_DIR_PATH
+from ..config import KEY_DIR_PATH, KEY_POOL_DIR, CANCEL
+from ..keygen import identity_files, remove_key_files
 from ..lib import confirm_action
+from ..store import load_config
 
+_REMOVE_ALL = "Remove all"
+_REVIEW = "Review each key"
 
-def _cleanup_key_files(c):
+
+def _found_key_files(directory, recursive=False) -> set[str]:
+    """
+    This function lists the key files (without the `.pub` suffix) in the key directory.
+    Hidden files and directories (e.g. the pool of spare keys) are not part of the cleanup.
+    :param directory: The key directory
+    :param recursive: Whether to include the key files in subdirectories
+    :return: A set of absolute paths
+    """
+    found = set()
+    pending = [os.path.realpath(directory)]
+    pool_dir = os.path.realpath(KEY_POOL_DIR)
+
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or entry.path == pool_dir:
+                    continue
+                # scandir knows the type of most entries without an extra stat call
+                if entry.is_file():
+                    found.add(entry.path.removesuffix(".pub"))
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+    return found
+
+
+def _cleanup_key_files(c, recursive=False, dry_run=False) -> int:
     """
     This function removes all key files that are not in the ssh config file.
+    All unused keys are confirmed at once, optionally each key can be reviewed.
     :param c: the ssh config object
+    :param recursive: Whether to include the key files in subdirectories of the key directory
+    :param dry_run: Only report the unused key files
+    :return: The number of removed files
     """
 
     # step 1, get all key files from ssh config
-    used_key_files = [c.host(host).get("identityfile") for host in c.hosts()]
+    used_key_files = set(identity_files(c))
 
     # step 2, get all key files from key directory
-    found_key_files = set(
-        os.path.join(KEY_DIR_PATH, f).removesuffix(".pub")
-        for f in os.listdir(KEY_DIR_PATH)
-        if os.path.isfile(os.path.join(KEY_DIR_PATH, f))
-    )
+    found_key_files = _found_key_files(KEY_DIR_PATH, recursive)
 
     # step 3, get all key files that are not in the ssh config
-    unused_key_files = [key_file for key_file in found_key_files if key_file not in used_key_files]
+    unused_key_files = sorted(found_key_files - used_key_files)
 
-    # step 4, remove all key files that are not in the ssh config
+    if not unused_key_files:
+        cprint("No unused key files found", "green")
+        return 0
+
+    cprint(f"{len(unused_key_files)} of {len(found_key_files)} key files are not used in the ssh config:", "yellow")
     for key_file in unused_key_files:
+        print(f"\t{key_file}(.pub)")
 
-        if not confirm_action(f"Remove key files `{key_file}` and `{key_file}.pub`?"):
-            cprint(f"Skipping ...", "green")
-            continue
+    if dry_run:
+        return 0
 
-        try:
-            os.remove(key_file)
-            cprint(f'Removed key files `{key_file}`', "green")
-        except FileNotFoundError:
-            cprint(f'Key files `{key_file}` could not be removed', "yellow")
+    # step 4, remove all key files that are not in the ssh config
+    answer = inquirer.list_input(
+        f"Remove {len(unused_key_files)} unused key files?",
+        choices=[_REMOVE_ALL, _REVIEW, CANCEL]
+    )
+    if answer == _REVIEW:
+        unused_key_files = [
+            key_file for key_file in unused_key_files
+            if confirm_action(f"Remove key files `{key_file}` and `{key_file}.pub`?")
+        ]
+    elif answer != _REMOVE_ALL:
+        cprint("Cancelled cleanup", "yellow")
+        return 0
 
-        try:
-            os.remove(f'{key_file}.pub')
-            cprint(f'Removed public key files `{key_file}.pub`', "green")
-        except FileNotFoundError:
-            cprint(f'Public key files `{key_file}.pub` could not be removed', "yellow")
+    removed, _ = remove_key_files(
+        unused_key_files, on_error=lambda path, e: cprint(f"`{path}` could not be removed: {e.strerror}", "yellow")
+    )
+    cprint(f"Removed {removed} files", "green")
+    return removed
 
 
 class CleanupKeys(Command):
@@ -60,13 +102,15 @@ class CleanupKeys(Command):
     def help(self):
         return "Cleanup all key files that are not in the ssh config"
 
-    def run(self):
-        c = read_ssh_config(CONFIG_FILE_PATH)
+    def run(self, *args, recursive=False, dry_run=False, session=None, **kwargs) -> int:
+        c = session.config if session else load_config()
 
-        cprint("This will remove all key files that are not in uns in the ssh config", "yellow")
+        if not dry_run:
+            cprint("This will remove all key files that are not used in the ssh config", "yellow")
 
         # remove all key files that are not in the ssh config
-        _cleanup_key_files(c)
+        _cleanup_key_files(c, recursive=recursive, dry_run=dry_run)
 
-        cprint("Cleanup complete", "green")
+        if not dry_run:
+            cprint("Cleanup complete", "green")
         return 0
@@ -5,6 +5,9 @@ from termcolor import cprint
 
 from .interface import Command
 from ..lib import select_host
+from ..mux import ssh_command
+from ..store import load_config
+from ..usage import record
 
 
 class Connect(Command):
@@ -20,17 +23,21 @@ class Connect(Command):
     def cmd(self):
         return "connect"
 
-    def run(self, *args, **kwargs) -> int:
+    def run(self, *args, host=None, persist=False, session=None, **kwargs) -> int:
         """
-        This function prompts the user to select a host from the ssh config file and then connects to it.
+        This function prompts the user to select a host from the ssh config file (unless `host` is given)
+        and then connects to it.
+        With `persist`, the connection stays open as a master connection after the session (see `mux.ssh_command`).
         """
-        if not (host := select_host()):
+        c = session.config if session else load_config()
+        if not (host := select_host(c, host)):
             return 1
 
         cprint(f"Connecting to {host}", "green")
+        record(host, "connect")
 
-        # run the ssh command
-        code = subprocess.run(["ssh", host])
+        # run the ssh command (reusing the master connection of the host, if there is one)
+        code = subprocess.run(ssh_command(host, master=persist, c=c)).returncode
 
         # print a welcome message if the connection was successful
         if code == 0 and os.getenv("HOSTNAME"):
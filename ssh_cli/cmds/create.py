@@ -1,15 +1,17 @@
-import os
-import subprocess
-
 import inquirer
 import validators
-from sshconf import read_ssh_config
+from inquirer.errors import ValidationError
 from termcolor import cprint
 
 from .interface import Command
-from ..config import DEFAULT_USER, SSH_DEFAULT_PORT, CONFIG_FILE_PATH, KEY_DIR_PATH, KEY_TYPE
+from ..config import DEFAULT_USER, SSH_DEFAULT_PORT, KEY_DIR_PATH
+from ..index import HostIndex
+from ..inventory import read_inventory, FIELDS
+from ..keygen import generate_key, generate_keys, key_comment, remove_key_files
+from ..keypool import claim_key, refill_in_background
 from ..lib import show_host_config
-from ..validation import is_valid_hostname, is_not_empty, host_exists, is_number
+from ..store import add_host, load_config, save_config
+from ..validation import is_valid_hostname, is_valid_alias, host_exists, is_number
 
 
 def _create_key_file(host) -> str or int or None:
@@ -17,20 +19,116 @@ def _create_key_file(host) -> str or int or None:
         return None
     password = inquirer.password("Enter a password for the key file (optional)") or ""
     key_file = f'{KEY_DIR_PATH}/{host}'
-    res = subprocess.run(
-        ["ssh-keygen",
-         "-t", KEY_TYPE,
-         "-C", f"'key_for_{host}'",
-         "-f", key_file,
-         "-N", password,
-         "-q"
-         ])
-    if res.returncode != 0:
-        cprint(f"Error creating key file: {res.stderr}", "red")
+
+    # take a pre-generated key from the pool of spare keys if possible, otherwise generate one now
+    if claim_key(key_file, key_comment(host), password):
+        refill_in_background()
+        return key_file
+
+    if error := generate_key(key_file, key_comment(host), password):
+        cprint(f"Error creating key file: {error}", "red")
         return None
     return key_file
 
 
+def _validate_row(row, index: HostIndex) -> dict:
+    """
+    This function validates a row of an inventory with the same rules as the interactive prompt
+    and fills in the defaults.
+    :param row: The row (a dict with the keys host, hostname, user, port and identityfile)
+    :param index: The host index (hosts from previous rows are already added)
+    :return: The options of the host, raises a ValidationError or ValueError if the row is invalid
+    """
+    if unknown := [key for key in row if key not in FIELDS]:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)} (allowed: {', '.join(FIELDS)})")
+
+    row = {key: str(value).strip() for key, value in row.items() if value not in (None, "")}
+    hostname = row.get("hostname", "")
+    is_valid_hostname(None, hostname)
+
+    host = row.get("host") or (hostname.split(".")[0] if validators.domain(hostname) else "")
+    is_valid_alias(None, host)
+    host_exists(None, host, index)
+
+    port = row.get("port", str(SSH_DEFAULT_PORT))
+    is_number(None, port)
+
+    options = {"Hostname": hostname, "User": row.get("user", DEFAULT_USER), "Port": port}
+    if identity_file := row.get("identityfile"):
+        options["IdentityFile"] = identity_file
+    return {"host": host, **options}
+
+
+def _print_key_progress(done, total, host, error):
+    if error:
+        cprint(f"[{done}/{total}] Error creating key file for {host}: {error}", "red")
+    else:
+        cprint(f"[{done}/{total}] Created key file for {host}", "green")
+
+
+def _create_from_inventory(path, fmt=None, keys=False, concurrency=None) -> int:
+    """
+    This function creates all hosts of an inventory file (CSV, JSON or YAML) without prompting.
+    All rows are validated in one pass and added to one config object, which is written once at the end.
+    :param path: The path of the inventory file ("-" for stdin)
+    :param fmt: The format of the inventory file (default: detect it)
+    :param keys: Generate a key file (without passphrase) for every host without an identityfile
+    :param concurrency: The maximum number of concurrent ssh-keygen processes (default: number of cpus)
+    :return: 0 if all hosts were created, 1 otherwise
+    """
+    c = load_config()
+    index = HostIndex(c)
+    hosts, errors = {}, 0
+
+    try:
+        for row_number, row in read_inventory(path, fmt):
+            try:
+                options = _validate_row(row, index)
+            except ValidationError as e:
+                cprint(f"Row {row_number}: {e.reason} ({e.value})", "red")
+                errors += 1
+                continue
+            except ValueError as e:
+                cprint(f"Row {row_number}: {e}", "red")
+                errors += 1
+                continue
+
+            host = options.pop("host")
+            hosts[host] = options
+            index.add(host, options["Hostname"])
+    except (OSError, ValueError) as e:
+        cprint(f"Error reading {path}: {e}", "red")
+        return 1
+
+    # generate the keys of all hosts concurrently, hosts whose key can't be created are skipped
+    key_files = {}
+    if keys and (missing := {host: f"{KEY_DIR_PATH}/{host}" for host, options in hosts.items()
+                             if "IdentityFile" not in options}):
+        key_files, key_errors = generate_keys(missing, concurrency=concurrency, progress=_print_key_progress)
+        for host in key_errors:
+            del hosts[host]
+        for host, key_file in key_files.items():
+            hosts[host]["IdentityFile"] = key_file
+        errors += len(key_errors)
+
+    try:
+        for host, options in hosts.items():
+            add_host(c, host, **options)
+        if hosts:
+            save_config(c)
+    except BaseException:
+        # the hosts were not saved, so the keys generated for them are not used
+        remove_key_files(key_files.values())
+        raise
+
+    cprint(f"Created {len(hosts)} host(s)", "green" if hosts else "yellow")
+    if errors:
+        cprint(f"Skipped {errors} invalid row(s)", "red")
+        return 1
+
+    return 0
+
+
 class CreateHostConfig(Command):
     """
     This class prompts the user to enter the details for a new host and then creates it in the ssh config file.
@@ -44,12 +142,18 @@ class CreateHostConfig(Command):
     def cmd(self):
         return "create"
 
-    def run(self, *args, **kwargs) -> int:
+    def run(self, *args, from_file=None, from_format=None, keys=False, concurrency=None, session=None,
+            **kwargs) -> int:
         """
         This function prompts the user to enter the details for a new host and then creates it in the ssh config file.
         It also prompts the user to create a key file for the host.
+        With `from_file` all hosts of an inventory file are created without prompting.
         """
-        c = read_ssh_config(CONFIG_FILE_PATH)
+        if from_file:
+            return _create_from_inventory(from_file, from_format, keys, concurrency)
+
+        c = session.config if session else load_config()
+        index = session.index if session else HostIndex(c)
 
         host_config_questions = [
             inquirer.Text(
@@ -60,7 +164,7 @@ class CreateHostConfig(Command):
             inquirer.Text(
                 "host",
                 message="Enter a name for this host (e.g. example)",
-                validate=lambda _, x: is_not_empty(_, x) and host_exists(_, x),
+                validate=lambda _, x: is_valid_alias(_, x) and host_exists(_, x, index),
                 default=lambda ans: ans["hostname"].split(".")[0] if validators.domain(ans["hostname"]) else None
             ),
             inquirer.Text(
@@ -79,7 +183,11 @@ class CreateHostConfig(Command):
         if (answers := inquirer.prompt(host_config_questions)) is None:
             return 1
 
-        c.add(answers["host"], Hostname=answers["hostname"], User=answers["user"], Port=answers["port"])
+        if other_hosts := index.hosts_for_hostname(answers["hostname"]):
+            cprint(f'{answers["hostname"]} is already configured as `{"`, `".join(other_hosts)}`', "yellow")
+
+        add_host(c, answers["host"], Hostname=answers["hostname"], User=answers["user"], Port=answers["port"])
+        index.add(answers["host"], answers["hostname"])
 
         if key_file := _create_key_file(answers["host"]):
             c.set(answers["host"], IdentityFile=key_file)
@@ -89,12 +197,14 @@ class CreateHostConfig(Command):
 
         if not inquirer.confirm("Do you want to save this host?", default=True):
             if key_file:
-                os.remove(key_file)
-                os.remove(f'{key_file}.pub')
+                remove_key_files([key_file])
+            # the config and index may be kept by the shell, so the host is removed from them again
+            c.remove(answers["host"])
+            index.remove(answers["host"])
             cprint(f'Host {answers["host"]} not saved', "yellow")
             return 1
 
-        c.write(CONFIG_FILE_PATH)
+        save_config(c)
         cprint(f'Host {answers["host"]} saved', "green")
 
         return 0
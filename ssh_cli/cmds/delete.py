@@ -1,12 +1,70 @@
-import os
-import subprocess
-
-from sshconf import read_ssh_config
 from termcolor import cprint
 
 from .interface import Command
-from ..config import CONFIG_FILE_PATH
+from ..index import HostIndex, host_options, match_hosts
+from ..keygen import identity_files, remove_key_files
+from ..known_hosts import host_names, remove_hosts
 from ..lib import select_host, confirm_action
+from ..sshconfig import SshConfig
+from ..store import load_config, save_config
+
+
+def _delete_hosts(c: SshConfig, hosts, index: HostIndex = None) -> int:
+    """
+    This function deletes hosts (and their keys and known_hosts entries) from the ssh config.
+    The known_hosts file and the ssh config file are written once, however many hosts are deleted.
+    Key files and known_hosts entries are removed once the ssh config is written, key files are kept while a host
+    that is not deleted still uses them.
+    :param c: The ssh config object
+    :param hosts: The host names
+    :param index: The host index of the config, the hosts are removed from it (default: build one)
+    :return: The number of deleted hosts
+    """
+    hosts = set(hosts)
+    options = host_options(c, "hostname", "port")
+    if index is None:
+        index = HostIndex(c)
+    for host in hosts:
+        index.remove(host)
+
+    # the key files of the hosts (with `~` and tokens expanded), a key file is kept while another host still uses it
+    deleted = {name for host in hosts for name in host.split()}
+    key_files, kept = set(), set()
+    for key_file, users in identity_files(c).items():
+        if deleted.intersection(users):
+            (key_files if deleted.issuperset(users) else kept).add(key_file)
+
+    # the known_hosts names of the hosts, a hostname is kept while another host still uses it
+    names = set()
+    for host in hosts:
+        hostname, port = options.get(host, {}).get("hostname"), options.get(host, {}).get("port")
+        names |= host_names(host, None if hostname and index.hosts_for_hostname(hostname) else hostname, port)
+
+    # remove hosts
+    for host in hosts:
+        c.remove(host)
+        cprint(f'Removed host {host}', "green")
+    save_config(c)
+
+    # remove from known_hosts file (after the ssh config no longer refers to the hosts)
+    try:
+        removed = remove_hosts(names)
+        cprint(f"Removed {removed} entries from known_hosts file", "green")
+    except OSError as e:
+        cprint(f"Error removing hosts from known_hosts file: {e}", "red")
+
+    # remove key files (after the ssh config no longer refers to them)
+    for key_file in sorted(kept):
+        cprint(f"Keeping key files {key_file}(.pub), other hosts still use them", "yellow")
+    removed, missing = remove_key_files(
+        sorted(key_files), on_error=lambda path, e: cprint(f"`{path}` could not be removed: {e.strerror}", "red")
+    )
+    if removed:
+        cprint(f"Removed {removed} key files", "green")
+    for path in missing:
+        cprint(f"Key file not found: {path}", "red")
+
+    return len(hosts)
 
 
 class Delete(Command):
@@ -22,15 +80,23 @@ class Delete(Command):
     def cmd(self):
         return "delete"
 
-    def run(self, *args, **kwargs) -> int:
+    def run(self, *args, hosts=None, host=None, session=None, **kwargs) -> int:
         """
-        This function prompts the user to select a host from the ssh config file and then deletes it.
+        This function prompts the user to select a host from the ssh config file (unless `host` is given)
+        and then deletes it.
+        With `hosts`, all hosts matching the pattern are deleted at once.
         """
-        c = read_ssh_config(CONFIG_FILE_PATH)
+        c = session.config if session else load_config()
 
-        host = select_host()
-
-        if host is None:
+        if hosts:
+            selected = match_hosts(c.hosts(), hosts)
+            if not selected:
+                cprint(f"No hosts match `{hosts}`", "yellow")
+                return 1
+            cprint(f"Selected {len(selected)} host(s): {', '.join(selected)}", "yellow")
+        elif (host := select_host(c, host)) is not None:
+            selected = [host]
+        else:
             return 1
 
         # ask user to confirm
@@ -38,23 +104,5 @@ class Delete(Command):
             cprint("Cancelled deleting", "yellow")
             return 1
 
-        # remove key file if it exists
-        if key_file := c.host(host).get("identityfile"):
-            try:
-                os.remove(key_file)
-                os.remove(f'{key_file}.pub')
-                cprint(f'Removed key files for host {host} ({key_file}(.pub))', "green")
-            except FileNotFoundError:
-                cprint(f"Key files not found: {key_file}(.pub)", "red")
-
-        # remove from known_hosts file
-        res = subprocess.run(["ssh-keygen", "-R", host])
-        if res.returncode != 0:
-            cprint(f"Error removing host from known_hosts file: {res.stderr}", "red")
-        else:
-            cprint(f'Removed host {host} from known_hosts file', "green")
-
-        # remove host
-        c.remove(host)
-        c.write(CONFIG_FILE_PATH)
-        cprint(f'Removed host {host}', "green")
+        _delete_hosts(c, selected, session.index if session else None)
+        return 0
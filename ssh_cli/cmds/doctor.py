@@ -0,0 +1,51 @@
+from termcolor import cprint
+
+from .interface import Command
+from ..doctor import SEVERITIES, diagnose
+from ..output import write_rows
+from ..store import load_config
+from ..trace import span
+
+_COLUMNS = ["severity", "check", "hosts", "message", "path"]
+_COLORS = {"error": "red", "warning": "yellow"}
+
+
+class Doctor(Command):
+    """
+    This class implements the "doctor" command that checks the ssh config and the key files of all hosts.
+    """
+
+    @property
+    def help(self):
+        return "Check the ssh config and the key files of all hosts for problems"
+
+    @property
+    def cmd(self):
+        return "doctor"
+
+    def run(self, *args, concurrency=None, format=None, session=None, **kwargs) -> int:
+        """
+        This function checks all hosts and prints the problems found, grouped by severity.
+        With `format` "json", "ndjson" or "tsv", the problems are written in that format.
+        :return: 1 if an error was found, 0 otherwise
+        """
+        c = session.config if session else load_config()
+        findings = diagnose(c, concurrency)
+
+        if format not in (None, "table"):
+            with span("render", format=format):
+                write_rows((finding._asdict() for finding in findings), _COLUMNS, format)
+        elif not findings:
+            cprint(f"No problems found in {len(c.hosts())} hosts", "green")
+        else:
+            with span("render", format="table"):
+                for severity in SEVERITIES:
+                    group = [finding for finding in findings if finding.severity == severity]
+                    if not group:
+                        continue
+                    cprint(f"{len(group)} {severity}(s):", _COLORS[severity])
+                    for finding in group:
+                        print(f"\t[{finding.check}] {', '.join(finding.hosts)}: {finding.message}")
+                    print()
+
+        return 1 if any(finding.severity == "error" for finding in findings) else 0
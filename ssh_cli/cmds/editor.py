@@ -4,6 +4,7 @@ from termcolor import cprint
 
 from .interface import Command
 from ..config import EDITOR, CONFIG_FILE_PATH
+from ..store import invalidate_cache
 
 
 class Editor(Command):
@@ -19,11 +20,17 @@ class Editor(Command):
     def cmd(self):
         return "editor"
 
-    def run(self, *args, **kwargs) -> int:
+    def run(self, *args, session=None, **kwargs) -> int:
         """
         This function opens the ssh config file in the default editor.
         """
         res = subprocess.run([EDITOR, CONFIG_FILE_PATH])
+
+        # the file may have been changed, drop the cached config (and the config of the shell)
+        invalidate_cache()
+        if session:
+            session.invalidate()
+
         if res.returncode != 0:
             cprint(f"Error opening config file: {res.stderr}", "red")
             return 1
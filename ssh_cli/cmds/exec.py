@@ -0,0 +1,90 @@
+from termcolor import colored, cprint
+
+from .interface import Command
+from ..fanout import run_on_hosts
+from ..index import match_hosts
+from ..lib import select_host
+from ..store import load_config
+
+
+def _select_hosts(c, pattern, host=None) -> list[str]:
+    """
+    This function selects the hosts matching a pattern (e.g. `web*,!web-old`), or prompts for a single host.
+    :param c: The ssh config object
+    :param pattern: The host pattern (None: the given host or prompt)
+    :param host: The host given on the command line
+    :return: The selected hosts
+    """
+    if pattern:
+        return match_hosts(c.hosts(), pattern)
+    host = select_host(c, host)
+    return [host] if host else []
+
+
+def _print_summary(results):
+    """
+    This function prints the exit code and duration of every host (failed hosts last) and the totals.
+    """
+    cprint("Summary", attrs=["bold"])
+    width = max(len(result.host) for result in results)
+    for result in sorted(results, key=lambda r: (r.code != 0, r.host)):
+        status = result.error or f"exit {result.code}"
+        print(f"{result.host:<{width}}  {colored(f'{status:<10}', 'green' if result.code == 0 else 'red')}"
+              f"  {result.duration:6.2f}s")
+
+    failed = sum(result.code != 0 for result in results)
+    cprint(f"{len(results) - failed} of {len(results)} hosts succeeded", "red" if failed else "green")
+
+
+class Exec(Command):
+    """
+    This class implements the "exec" command that runs a command on many hosts concurrently.
+    """
+
+    @property
+    def help(self):
+        return "Run a command on the hosts selected with --hosts (or a selected host)"
+
+    @property
+    def cmd(self):
+        return "exec"
+
+    @property
+    def argument(self) -> dict:
+        return {"metavar": "CMD"}
+
+    def run(self, *args, exec=None, hosts=None, concurrency=None, timeout=None, collect=False, host=None,
+            session=None, **kwargs) -> int:
+        """
+        This function runs the command on every selected host and prints the output prefixed with the host
+        (or, with `collect`, grouped by host) followed by a summary.
+        """
+        if not exec:
+            cprint("No command given, use --exec CMD", "red")
+            return 1
+
+        c = session.config if session else load_config()
+        if not (selected := _select_hosts(c, hosts, host)):
+            cprint("No hosts selected", "yellow")
+            return 1
+
+        cprint(f"Running `{exec}` on {len(selected)} host(s)", "green")
+        width = max(len(host) for host in selected)
+
+        def on_line(host, stream, line):
+            print(f"{colored(f'{host:<{width}}', 'red' if stream == 'stderr' else 'cyan')} | {line}", flush=True)
+
+        def on_result(result):
+            cprint(f"── {result.host} ({result.error or f'exit {result.code}'}, {result.duration:.2f}s)",
+                   "green" if result.code == 0 else "red")
+            for stream, line in result.output:
+                print(colored(line, "red") if stream == "stderr" else line)
+
+        results = run_on_hosts(
+            selected, exec, concurrency=concurrency, timeout=timeout, collect=collect,
+            on_line=None if collect else on_line, on_result=on_result if collect else None
+        )
+
+        print()
+        _print_summary(results)
+        return 0 if all(result.code == 0 for result in results) else 1
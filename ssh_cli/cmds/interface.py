@@ -1,5 +1,8 @@
+import importlib
 from abc import ABCMeta, abstractmethod
 
+from ..trace import span
+
 
 class Command(metaclass=ABCMeta):
     """
@@ -16,6 +19,59 @@ class Command(metaclass=ABCMeta):
     def cmd(self):
         ...
 
+    @property
+    def argument(self) -> dict:
+        """
+        The keyword arguments for `ArgumentParser.add_argument` of the command flag,
+        commands that take a value (e.g. `--refill-keys N`) override this.
+        """
+        return {"action": "store_true"}
+
     @abstractmethod
     def run(self, *args, **kwargs) -> int:
         ...
+
+
+class LazyCommand(Command):
+    """
+    This class is a placeholder for a command, the module implementing the command is only imported when it runs.
+    This keeps the startup fast: parsing the arguments doesn't import any of the (heavy) command dependencies.
+    """
+
+    def __init__(self, cmd, help, module, name, argument=None):
+        """
+        :param cmd: The name of the command (used for the command line flag)
+        :param help: The help text of the command
+        :param module: The module implementing the command (relative to the `cmds` package)
+        :param name: The name of the command class in the module
+        :param argument: The keyword arguments for the command flag (default: a boolean flag)
+        """
+        self._cmd = cmd
+        self._help = help
+        self._module = module
+        self._name = name
+        self._argument = argument
+
+    @property
+    def help(self):
+        return self._help
+
+    @property
+    def cmd(self):
+        return self._cmd
+
+    @property
+    def argument(self) -> dict:
+        return self._argument or super().argument
+
+    def load(self) -> Command:
+        """
+        This function imports the module of the command and creates the command.
+        :return: The command
+        """
+        with span(f"import {self._module.lstrip('.')}"):
+            module = importlib.import_module(self._module, __package__)
+        return getattr(module, self._name)()
+
+    def run(self, *args, **kwargs) -> int:
+        return self.load().run(*args, **kwargs)
@@ -1,9 +1,121 @@
-from prettytable import PrettyTable
-from sshconf import read_ssh_config
-from termcolor import cprint
+import os
+from typing import Iterator
+
+from termcolor import colored, cprint
 
 from .interface import Command
-from ..config import CONFIG_FILE_PATH
+from ..config import SSH_DEFAULT_PORT
+from ..index import host_options, is_pattern
+from ..keygen import identity_file_path
+from ..keys import PublicKeyCache, host_key_files
+from ..output import parse_columns, write_rows
+from ..sshconfig import _remap_key
+from ..store import load_config
+from ..trace import span
+
+_STATUS_COLORS = {"ssh": "green", "open": "yellow"}
+
+_COLUMNS = ["name", "hostname"]
+_EFFECTIVE_COLUMNS = ["name", "hostname", "user", "port", "identityfile"]
+
+
+def _probe_hosts(hosts, options, concurrency=None, timeout=None) -> int:
+    """
+    This function probes the hosts and prints a row per host as soon as its result arrives.
+    :param hosts: The host names
+    :param options: The options of the hosts (see `index.host_options`)
+    :param concurrency: The maximum number of open connections
+    :param timeout: The timeout per host in seconds
+    :return: 0 if every host answered with an SSH banner, 1 otherwise
+    """
+    from ..probe import probe_hosts, DEFAULT_TIMEOUT
+
+    targets = [
+        (host, options.get(host, {}).get("hostname") or host, options.get(host, {}).get("port") or SSH_DEFAULT_PORT)
+        for host in hosts if not is_pattern(host)
+    ]
+    if not targets:
+        cprint("No hosts to probe", "yellow")
+        return 0
+    hostnames = {host: f"{hostname}:{port}" for host, hostname, port in targets}
+
+    # the rows are printed as they arrive, so the widths are computed upfront (instead of using a PrettyTable)
+    widths = [max(len(x) for x in [title, *column]) for title, column in
+              (("Name", hostnames.keys()), ("Host", hostnames.values()))]
+    print(f"{'Name':<{widths[0]}}  {'Host':<{widths[1]}}  {'Status':<10}  {'Latency':>9}  Banner")
+
+    answered = 0
+
+    def on_result(result):
+        nonlocal answered
+        answered += result.status == "ssh"
+        latency = f"{result.latency:.1f} ms" if result.latency is not None else "-"
+        status = colored(f"{result.status:<10}", _STATUS_COLORS.get(result.status, "red"))
+        print(f"{result.host:<{widths[0]}}  {hostnames[result.host]:<{widths[1]}}  {status}  {latency:>9}  "
+              f"{result.banner or ''}", flush=True)
+
+    probe_hosts(targets, on_result, concurrency=concurrency, timeout=timeout or DEFAULT_TIMEOUT)
+
+    cprint(f"{answered} of {len(targets)} hosts answered", "green" if answered == len(targets) else "yellow")
+    return 0 if answered == len(targets) else 1
+
+
+def _host_rows(c, columns, effective=False, sort="name") -> Iterator[dict]:
+    """
+    This function generates a row per host (sorted by name) with the requested columns only,
+    the options of a host are looked up (or resolved) when its row is generated.
+    :param c: The ssh config object
+    :param columns: The columns, "name", "key" (the type, size and fingerprint of the public key)
+                    or (lowercase) option names
+    :param effective: Whether to use the effective options of the hosts (pattern entries are left out)
+    :param sort: "name" or "recent" (the hosts used most often and most recently first)
+    """
+    if sort == "recent":
+        from ..usage import frecency_order
+
+        rank = {host: i for i, host in enumerate(frecency_order(c))}
+        records = sorted(c.records(), key=lambda record: rank[record.name])
+    else:
+        records = sorted(c.records(), key=lambda record: record.name)
+    options = [column for column in columns if column != "name"]
+    with_key = "key" in columns
+
+    with PublicKeyCache() as keys:
+        if effective:
+            from ..resolve import EffectiveConfig
+
+            resolver = EffectiveConfig(c)
+            config_dir = os.path.dirname(os.path.abspath(c.configs_[0][0])) if c.configs_ else None
+            for record in records:
+                if is_pattern(record.name):
+                    continue
+                resolved = resolver.resolve(record.name) if options else {}
+                row = {column: record.name if column == "name" else resolved.get(column) for column in columns}
+                if with_key:
+                    if (key_file := next(iter(resolved.get("identityfile") or []), None)) is not None:
+                        key_file = identity_file_path(key_file, record.name, resolved, config_dir, resolve_links=False)
+                    row["key"] = _describe_key(keys, key_file)
+                yield row
+        else:
+            key_files = host_key_files(c) if with_key else {}
+            for record in records:
+                row = {column: record.name if column == "name" else record.get(column) for column in columns}
+                if with_key:
+                    row["key"] = _describe_key(keys, key_files.get(record.name))
+                yield row
+
+
+def _describe_key(keys: PublicKeyCache, key_file) -> str | None:
+    """
+    This function returns the type, size and fingerprint of the public key of a key file (None if there is none).
+    """
+    if key_file is None or (public_key := keys.get(f"{key_file}.pub")) is None:
+        return None
+    return public_key.describe()
+
+
+def _table_header(column) -> str:
+    return {"name": "Name", "hostname": "Host", "key": "Key"}.get(column) or _remap_key(column)
 
 
 class ListHosts(Command):
@@ -19,25 +131,40 @@ class ListHosts(Command):
     def cmd(self):
         return "list"
 
-    def run(self, *args, **kwargs) -> int:
+    def run(self, *args, probe=False, concurrency=None, timeout=None, effective=False, format=None, columns=None,
+            sort=None, session=None, **kwargs) -> int:
         """
         This function lists all the hosts in the ssh config file and prints them in a table.
+        With `probe`, every host is checked for a reachable SSH server.
+        With `effective`, the effective hostname, user, port and key files of every host are listed.
+        With `format` "json", "ndjson" or "tsv", the hosts are written row by row in that format.
+        With `sort` "recent", the hosts used most often and most recently are listed first.
         """
-        c = read_ssh_config(CONFIG_FILE_PATH)
+        c = session.config if session else load_config()
+
+        if probe:
+            return _probe_hosts(sorted(c.hosts()), host_options(c, "hostname", "port"), concurrency, timeout)
+
+        columns = parse_columns(columns, _EFFECTIVE_COLUMNS if effective else _COLUMNS)
+        rows = _host_rows(c, columns, effective, sort or "name")
+
+        if format not in (None, "table"):
+            with span("render", format=format):
+                write_rows(rows, columns, format)
+            return 0
 
-        table = PrettyTable()
+        from prettytable import PrettyTable
 
-        table.field_names = ["Name", "Host"]
-        table.add_rows(
-            [
+        with span("render", format="table"):
+            table = PrettyTable()
+            table.field_names = [_table_header(column) for column in columns]
+            table.add_rows(
                 [
-                    host,
-                    c.host(host).get("hostname"),
+                    ["\n".join(value) if isinstance(value := row[column], list) else value for column in columns]
+                    for row in rows
                 ]
-                for host in sorted(c.hosts())
-            ]
-        )
+            )
 
-        cprint(table)
+            cprint(table)
 
         return 0
@@ -0,0 +1,52 @@
+import sys
+
+import inquirer
+from termcolor import cprint
+
+from .interface import Command
+from ..mux import masters, close_master
+
+
+def _format_age(seconds) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02}m" if hours else f"{minutes}m {seconds:02}s"
+
+
+class Masters(Command):
+    """
+    This class implements the "masters" command that lists (and closes) the live master connections.
+    """
+
+    @property
+    def help(self):
+        return "List and close the open master connections"
+
+    @property
+    def cmd(self):
+        return "masters"
+
+    def run(self, *args, **kwargs) -> int:
+        """
+        This function prints the live master connections and lets the user select the ones to close.
+        """
+        live = masters()
+        if not live:
+            cprint("No open master connections", "yellow")
+            return 0
+
+        for name, _, age in live:
+            print(f"{name}\t(open for {_format_age(age)})")
+
+        if not sys.stdin.isatty():
+            return 0
+
+        answers = inquirer.prompt([
+            inquirer.Checkbox("close", message="Select the master connections to close", choices=[x[0] for x in live])
+        ])
+        for name in (answers or {}).get("close", []):
+            if error := close_master(name):
+                cprint(f"Could not close the master connection to {name}: {error}", "red")
+            else:
+                cprint(f"Closed the master connection to {name}", "green")
+        return 0
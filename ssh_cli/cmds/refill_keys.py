@@ -0,0 +1,41 @@
+from termcolor import cprint
+
+from .interface import Command
+from ..config import KEY_POOL_SIZE
+from ..keypool import refill, spare_keys
+
+
+class RefillKeys(Command):
+    """
+    This class implements the "refill-keys" command that fills the pool of spare keys.
+    Spare keys are passphrase-less keys that are generated ahead of time,
+    so creating a host doesn't wait for ssh-keygen.
+    """
+
+    @property
+    def help(self):
+        return "Fill the pool of spare keys (used to create hosts instantly) up to N keys"
+
+    @property
+    def cmd(self):
+        return "refill-keys"
+
+    @property
+    def argument(self) -> dict:
+        return {"type": int, "metavar": "N"}
+
+    def run(self, *args, refill_keys=None, concurrency=None, **kwargs) -> int:
+        """
+        This function generates spare keys until the pool holds N (default: SSH_CLI_KEY_POOL_SIZE) keys.
+        """
+        size = refill_keys if refill_keys is not None else KEY_POOL_SIZE
+
+        def progress(done, total, _, error):
+            if error:
+                cprint(f"[{done}/{total}] Error creating spare key: {error}", "red")
+            else:
+                cprint(f"[{done}/{total}] Created spare key", "green")
+
+        created = refill(size, concurrency, progress)
+        cprint(f"Created {created} spare key(s), the pool holds {len(spare_keys())} key(s)", "green")
+        return 0
@@ -0,0 +1,70 @@
+from termcolor import cprint
+
+from .interface import Command
+from ..index import match_hosts
+from ..lib import confirm_action, select_host
+from ..rotate import RotationResult, plan_rotations, rotate_keys
+from ..store import load_config
+
+
+def _print_result(result: RotationResult):
+    if result.error is None:
+        cprint(f"Rotated the key of {result.host}: {result.rotation.new_key_file}", "green")
+    elif result.done:
+        cprint(f"{result.host}: {result.error}, check the host by hand", "red")
+    else:
+        cprint(f"{result.host}: {result.error}, the host keeps its old key", "red")
+
+
+def _print_unused_key(key_file):
+    cprint(f"{key_file} is no longer used, it is kept since it is not in the key directory", "yellow")
+
+
+class RotateKeys(Command):
+    """
+    This class implements the "rotate-keys" command that replaces the keys of hosts with new keys
+    (on the hosts and in the ssh config).
+    """
+
+    @property
+    def help(self):
+        return "Replace the keys of the hosts selected with --hosts (or a selected host) with new keys"
+
+    @property
+    def cmd(self):
+        return "rotate-keys"
+
+    def run(self, *args, hosts=None, host=None, concurrency=None, timeout=None, session=None, **kwargs) -> int:
+        """
+        This function rotates the keys of the hosts matching `hosts` (or a selected host) concurrently,
+        see `rotate.py`. Hosts whose rotation fails are rolled back and keep their old key.
+        :return: 0 if every host was rotated, 1 otherwise
+        """
+        c = session.config if session else load_config()
+
+        if hosts:
+            if not (selected := match_hosts(c.hosts(), hosts)):
+                cprint(f"No hosts match `{hosts}`", "yellow")
+                return 1
+        elif host := select_host(c, host):
+            selected = [host]
+        else:
+            return 1
+
+        rotations, errors = plan_rotations(c, selected)
+        for skipped, error in errors.items():
+            cprint(f"Skipping {skipped}: {error}", "yellow")
+        if not rotations:
+            return 1
+
+        cprint(f"Selected {len(rotations)} host(s): {', '.join(rotation.host for rotation in rotations)}", "yellow")
+        if not confirm_action(f"Replace the keys of {len(rotations)} host(s) with new keys (without passphrase)?"):
+            cprint("Cancelled rotating keys", "yellow")
+            return 1
+
+        results = rotate_keys(c, rotations, concurrency, timeout, _print_result, _print_unused_key)
+
+        rotated = sum(result.error is None for result in results)
+        cprint(f"Rotated the keys of {rotated} of {len(selected)} host(s)",
+               "green" if rotated == len(selected) else "red")
+        return 0 if rotated == len(selected) else 1
@@ -1,8 +1,48 @@
-from sshconf import read_ssh_config
+from termcolor import cprint
 
 from .interface import Command
-from ..config import CONFIG_FILE_PATH
+from ..index import match_hosts
+from ..keys import PublicKeyCache, host_key_files
 from ..lib import show_host_config, select_host
+from ..output import parse_columns, write_rows
+from ..store import load_config
+from ..trace import span
+from ..usage import record
+
+
+def _option_rows(c, hosts, columns, effective=False):
+    """
+    This function generates a row per host with its options (all options or the requested columns).
+    :param c: The ssh config object
+    :param hosts: The host names
+    :param columns: The columns, "name", "key" (the type, size and fingerprint of the public key)
+                    or (lowercase) option names (None: all options)
+    :param effective: Whether to use the effective options of the hosts
+    """
+    if effective:
+        from ..resolve import EffectiveConfig
+
+        options_of = EffectiveConfig(c).resolve
+    else:
+        options_of = c.host
+
+    key_files = host_key_files(c, hosts) if columns and "key" in columns else {}
+    with PublicKeyCache() as keys:
+        for host in hosts:
+            options = {"name": host, **options_of(host)}
+            if host in key_files and (public_key := keys.get(f"{key_files[host]}.pub")) is not None:
+                options["key"] = public_key.describe()
+            yield options if columns is None else {column: options.get(column) for column in columns}
+
+
+def _long_rows(rows):
+    """
+    This function turns rows of all options into (name, key, value) rows, e.g. for TSV where the columns are fixed.
+    """
+    for row in rows:
+        for key, value in row.items():
+            if key != "name":
+                yield {"name": row["name"], "key": key, "value": value}
 
 
 class ShowHost(Command):
@@ -17,12 +57,36 @@ class ShowHost(Command):
     def cmd(self):
         return "show"
 
-    def run(self, *args, **kwargs) -> int:
-        if not (host := select_host()):
+    def run(self, *args, effective=False, hosts=None, format=None, columns=None, host=None, session=None,
+            **kwargs) -> int:
+        """
+        This function prompts the user to select a host (unless `host` is given, or selects the hosts matching `hosts`)
+        and prints its configuration. With `effective`, the effective options of the host are printed (as ssh resolves them).
+        With `format` "json", "ndjson" or "tsv", the options are written in that format.
+        """
+        c = session.config if session else load_config()
+
+        if hosts:
+            if not (selected := match_hosts(c.hosts(), hosts)):
+                cprint(f"No hosts match `{hosts}`", "yellow")
+                return 1
+        elif host := select_host(c, host):
+            selected = [host]
+            record(host, "show")
+        else:
             return 1
 
-        c = read_ssh_config(CONFIG_FILE_PATH)
+        if format not in (None, "table"):
+            columns = parse_columns(columns, []) or None
+            rows = _option_rows(c, selected, columns, effective)
+            if columns is None and format == "tsv":
+                rows, columns = _long_rows(rows), ["name", "key", "value"]
+            with span("render", format=format):
+                write_rows(rows, columns, format)
+            return 0
 
-        show_host_config(host, c)
+        with PublicKeyCache() as keys:
+            for host in selected:
+                show_host_config(host, c, effective=effective, keys=keys)
 
         return 0
@@ -0,0 +1,42 @@
+from termcolor import cprint
+
+from .interface import Command
+from .. import mux
+from ..lib import select_host
+
+
+class Warm(Command):
+    """
+    This class implements the "warm" command that opens persistent master connections to hosts,
+    later connections to these hosts reuse the master and skip the handshake.
+    """
+
+    @property
+    def help(self):
+        return "Open persistent master connections to hosts in the background (for fast connects)"
+
+    @property
+    def cmd(self):
+        return "warm"
+
+    @property
+    def argument(self) -> dict:
+        return {"nargs": "+", "metavar": "HOST"}
+
+    def run(self, *args, warm=None, session=None, **kwargs) -> int:
+        """
+        This function opens a master connection to every given host (default: prompt for a host).
+        """
+        hosts = warm
+        if not hosts:
+            if not (host := select_host(session.config if session else None)):
+                return 1
+            hosts = [host]
+
+        results = mux.warm(hosts)
+        for host, error in results.items():
+            if error:
+                cprint(f"Could not open a master connection to {host}: {error}", "red")
+            else:
+                cprint(f"Master connection to {host} is open", "green")
+        return 1 if any(results.values()) else 0
@@ -0,0 +1,108 @@
+"""
+Shell completion scripts for bash, zsh and fish (printed by `ssh-cli --completion SHELL`).
+
+The scripts are generated with the options of the parser and the path of the host names file baked in, so completing
+a word never runs ssh-cli (nor python): the host names are read from the plain-text file that is written whenever
+ssh-cli parses or saves the config (see `store.hosts_file`), with shell builtins only.
+"""
+import shlex
+from argparse import ArgumentParser
+
+_BASH = """\
+# bash completion for ssh-cli, generated by `ssh-cli --completion bash`
+_ssh_cli() {{
+    local cur=${{COMP_WORDS[COMP_CWORD]}} prev=${{COMP_WORDS[COMP_CWORD-1]}}
+    case $prev in
+{choices}
+{files}    esac
+    if [[ $cur == -* ]]; then
+        COMPREPLY=($(compgen -W {options} -- "$cur"))
+    elif [[ -r {hosts} ]]; then
+        COMPREPLY=($(compgen -W "$(< {hosts})" -- "$cur"))
+    fi
+}}
+complete -F _ssh_cli ssh-cli
+"""
+
+_ZSH = """\
+#compdef ssh-cli
+# zsh completion for ssh-cli, generated by `ssh-cli --completion zsh`
+_ssh_cli() {{
+    local -a hosts
+    case ${{words[CURRENT-1]}} in
+{choices}
+{files}    esac
+    if [[ $PREFIX == -* ]]; then
+        compadd -- {options}
+    elif [[ -r {hosts} ]]; then
+        hosts=(${{(f)"$(< {hosts})"}})
+        compadd -a hosts
+    fi
+}}
+compdef _ssh_cli ssh-cli
+"""
+
+
+def _options(parser: ArgumentParser) -> list[tuple[str, str, list | None, str | None]]:
+    """
+    This function lists the long options of a parser.
+    :param parser: The argument parser of ssh-cli
+    :return: A list of (option, help, choices, metavar), the choices and metavar are None for flags without a value
+    """
+    result = []
+    for action in parser._actions:
+        for option in action.option_strings:
+            if option.startswith("--"):
+                choices = list(action.choices) if action.choices else None
+                metavar = action.metavar or action.dest.upper() if action.nargs != 0 else None
+                result.append((option, action.help or "", choices, metavar))
+    return result
+
+
+def _bash(options, hosts) -> str:
+    choices = "\n".join(f"        {option}) COMPREPLY=($(compgen -W {shlex.quote(' '.join(values))} -- \"$cur\")); "
+                        f"return;;" for option, _, values, _ in options if values)
+    files = "|".join(option for option, _, values, metavar in options if metavar == "FILE" and not values)
+    files = f"        {files}) COMPREPLY=($(compgen -f -- \"$cur\")); return;;\n" if files else ""
+    return _BASH.format(choices=choices, files=files, hosts=shlex.quote(hosts),
+                        options=shlex.quote(" ".join(option for option, *_ in options)))
+
+
+def _zsh(options, hosts) -> str:
+    choices = "\n".join(f"        {option}) compadd -- {' '.join(map(shlex.quote, values))}; return;;"
+                        for option, _, values, _ in options if values)
+    files = "|".join(option for option, _, values, metavar in options if metavar == "FILE" and not values)
+    files = f"        {files}) _files; return;;\n" if files else ""
+    return _ZSH.format(choices=choices, files=files, hosts=shlex.quote(hosts),
+                       options=" ".join(option for option, *_ in options))
+
+
+def _fish_quote(value) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _fish(options, hosts) -> str:
+    lines = ["# fish completion for ssh-cli, generated by `ssh-cli --completion fish`", "complete -c ssh-cli -f"]
+    for option, help, values, metavar in options:
+        line = f"complete -c ssh-cli -l {option[2:]} -d {_fish_quote(help)}"
+        if values:
+            line += f" -x -a {_fish_quote(' '.join(values))}"
+        elif metavar == "FILE":
+            line += " -r -F"
+        lines.append(line)
+    # the host names, read with the `string` builtin
+    lines.append(f"complete -c ssh-cli -n 'not string match -q -- \"-*\" (commandline -ct)' "
+                 f"-a {_fish_quote(f'(string trim < {_fish_quote(hosts)} 2>/dev/null)')}")
+    return "\n".join(lines) + "\n"
+
+
+def completion_script(shell, parser: ArgumentParser, hosts) -> str:
+    """
+    This function generates the completion script of a shell.
+    :param shell: The shell ("bash", "zsh" or "fish")
+    :param parser: The argument parser of ssh-cli (its options are completed)
+    :param hosts: The path of the host names file (see `store.hosts_file`)
+    :return: The completion script
+    """
+    generate = {"bash": _bash, "zsh": _zsh, "fish": _fish}[shell]
+    return generate(_options(parser), str(hosts))
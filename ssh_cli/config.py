@@ -2,28 +2,43 @@ import os
 import sys
 from pathlib import Path
 
-from termcolor import cprint
-
 CONFIG_FILE_PATH = os.getenv("SSH_CLI_CONFIG_PATH") or str(Path.home()) + "/.ssh/config"
+CONFIG_DIR = os.path.expanduser(os.getenv("SSH_CLI_CONFIG_DIR") or "") or None
 KEY_DIR_PATH = os.getenv("SSH_CLI_KEY_DIR") or str(Path.home()) + "/.ssh/keys"
+KNOWN_HOSTS_PATH = os.getenv("SSH_CLI_KNOWN_HOSTS") or str(Path.home()) + "/.ssh/known_hosts"
 KEY_TYPE = os.getenv("SSH_CLI_KEY_TYPE") or "ed25519"
+KEY_POOL_DIR = KEY_DIR_PATH + "/.pool"
+KEY_POOL_SIZE = int(os.getenv("SSH_CLI_KEY_POOL_SIZE") or 0)
 DEFAULT_USER = os.getenv("SSH_CLI_DEFAULT_USER") or os.getenv("USER")
 SSH_DEFAULT_PORT = os.getenv("SSH_CLI_DEFAULT_PORT") or 22
 EDITOR = os.getenv("SSH_CLI_EDITOR") or os.getenv("EDITOR") or "nano"
+CACHE_DIR = os.getenv("SSH_CLI_CACHE_DIR") or (os.getenv("XDG_CACHE_HOME") or str(Path.home()) + "/.cache") + "/ssh-cli"
+USAGE_LOG_PATH = os.getenv("SSH_CLI_USAGE_LOG") or CACHE_DIR + "/usage.log"
+CONTROL_DIR = os.getenv("SSH_CLI_CONTROL_DIR") or str(Path.home()) + "/.ssh/control"
+CONTROL_PERSIST = os.getenv("SSH_CLI_CONTROL_PERSIST") or "10m"
 CANCEL = "❌  Cancel"
 
-if 'pytest' not in sys.modules.keys():
+
+def ensure_environment():
+    """
+    This function creates the config file and the key directory if they don't exist
+    and checks that all the required environment variables are set.
+    It is called before a command runs (and not on import, to keep the startup fast and side-effect free).
+    The messages go to stderr, so that the output of a command (e.g. `--format json`) stays parseable.
+    """
+    from termcolor import cprint
+
     # check if the config file exists
     if not Path(CONFIG_FILE_PATH).exists():
         # create the config file if it doesn't exist
         Path(CONFIG_FILE_PATH).touch()
-        cprint(f"Config file created at {CONFIG_FILE_PATH}", "yellow")
+        cprint(f"Config file created at {CONFIG_FILE_PATH}", "yellow", file=sys.stderr)
 
     # check if the key directory exists
     if not Path(KEY_DIR_PATH).exists():
         # create the key directory if it doesn't exist
         Path(KEY_DIR_PATH).mkdir(parents=True)
-        cprint(f"Key directory created at {KEY_DIR_PATH}", "yellow")
+        cprint(f"Key directory created at {KEY_DIR_PATH}", "yellow", file=sys.stderr)
 
     # check if all the required environment variables are set
     if not DEFAULT_USER:
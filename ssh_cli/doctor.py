@@ -0,0 +1,158 @@
+"""
+Health checks of the ssh config and the key files of all hosts (`ssh-cli --doctor`).
+
+The checks of the config only look at the parsed config. The checks of the key files (`stat` and reading the
+`.pub` files) are I/O bound and run in a thread pool: on a network file system (e.g. a home directory on NFS)
+every `stat` is a round trip, so checking thousands of key files one after another would take very long.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, NamedTuple
+
+from inquirer.errors import ValidationError
+
+from .index import host_options, is_pattern
+from .keygen import identity_files
+from .keys import private_key_public_blob, public_key_blob
+from .sshconfig import SshConfig
+from .trace import span
+from .validation import is_number, is_valid_hostname
+
+SEVERITIES = ("error", "warning")
+
+# the checks of the key files wait for the file system, not the cpu
+DEFAULT_CONCURRENCY = 32
+
+
+class Finding(NamedTuple):
+    severity: str
+    check: str
+    hosts: list[str]
+    message: str
+    path: str | None = None
+
+
+def _duplicate_aliases(c: SshConfig) -> Iterator[Finding]:
+    """
+    This function finds host names that are defined in more than one `Host` line.
+    """
+    seen, lowercase = {}, {}
+    for record in c.records():
+        for name in record.name.split():
+            if is_pattern(name):
+                continue
+            if name in seen:
+                yield Finding("error", "duplicate-alias", [name],
+                              f"`{name}` is defined again after `Host {seen[name]}`, "
+                              f"ssh uses the first value of every option")
+                continue
+            seen[name] = record.name
+            if (other := lowercase.setdefault(name.lower(), name)) != name:
+                yield Finding("warning", "duplicate-alias", [other, name],
+                              f"`{other}` and `{name}` only differ in case")
+
+
+def _duplicate_endpoints(c: SshConfig) -> Iterator[Finding]:
+    """
+    This function finds hosts that connect to the same hostname and port.
+    """
+    endpoints = {}
+    for host, options in host_options(c, "hostname", "port").items():
+        if is_pattern(host) or "hostname" not in options or "%" in options["hostname"]:
+            continue
+        endpoint = (options["hostname"].lower(), options.get("port", "22"))
+        endpoints.setdefault(endpoint, []).append(host)
+    for (hostname, port), hosts in endpoints.items():
+        if len(hosts) > 1:
+            yield Finding("warning", "duplicate-endpoint", hosts, f"{len(hosts)} hosts connect to {hostname}:{port}")
+
+
+def _invalid_options(c: SshConfig) -> Iterator[Finding]:
+    """
+    This function finds invalid ports and hostnames (with the validators of the prompts).
+    """
+    for record in c.records():
+        if (port := record.get("port")) is not None:
+            try:
+                is_number(None, port)
+                if not 0 < int(port) < 65536:
+                    raise ValidationError(port, reason="Must be between 1 and 65535")
+            except ValidationError as e:
+                yield Finding("error", "invalid-port", [record.name], f"Port `{port}`: {e.reason}")
+
+        hostname = record.get("hostname")
+        if hostname is None or "%" in hostname or is_pattern(record.name):
+            continue
+        try:
+            is_valid_hostname(None, hostname)
+        except ValidationError as e:
+            # names without a domain (e.g. `localhost`, or names completed with the DNS search domains) are valid
+            if "." in hostname or not hostname.replace("-", "").isalnum() or hostname.startswith("-"):
+                yield Finding("error", "invalid-hostname", [record.name], f"HostName `{hostname}`: {e.reason}")
+
+
+def _check_key_file(path) -> list[tuple[str, str, str]]:
+    """
+    This function checks a key file: it exists, only the owner can read it and its `.pub` file matches it.
+    :param path: The path of the private key file
+    :return: A list of (severity, check, message) of the problems found
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return [("error", "missing-key", f"`{path}` doesn't exist")]
+    except OSError as e:
+        return [("error", "unreadable-key", f"`{path}` can't be read: {e.strerror}")]
+
+    problems = []
+    if st.st_mode & 0o077:
+        problems.append(("error", "insecure-key", f"`{path}` is accessible by others (mode {st.st_mode & 0o777:o}), "
+                                                  f"ssh refuses to use it"))
+    try:
+        public = public_key_blob(f"{path}.pub")
+    except FileNotFoundError:
+        # ssh doesn't need the public key file
+        return problems
+    except OSError as e:
+        return problems + [("warning", "unreadable-key", f"`{path}.pub` can't be read: {e.strerror}")]
+    if public is None:
+        return problems + [("warning", "invalid-public-key", f"`{path}.pub` is not a public key")]
+
+    try:
+        private = private_key_public_blob(path)
+    except OSError as e:
+        return problems + [("error", "unreadable-key", f"`{path}` can't be read: {e.strerror}")]
+    if private is not None and private != public:
+        problems.append(("error", "key-mismatch", f"`{path}.pub` is not the public key of `{path}`"))
+    return problems
+
+
+def check_key_files(files: dict, concurrency=None) -> Iterator[Finding]:
+    """
+    This function checks many key files concurrently in a thread pool.
+    :param files: A dict mapping the paths of the key files to the hosts using them (see `keygen.identity_files`)
+    :param concurrency: The maximum number of files checked at once (default: DEFAULT_CONCURRENCY)
+    :return: The problems found
+    """
+    with span("check key files", files=len(files)):
+        with ThreadPoolExecutor(max_workers=concurrency or DEFAULT_CONCURRENCY) as executor:
+            for (path, hosts), problems in zip(files.items(), executor.map(_check_key_file, files)):
+                for severity, check, message in problems:
+                    # ssh skips missing key files, a pattern (e.g. `IdentityFile ~/.ssh/id_%h` for `Host *`) may
+                    # name a key file for hosts that have none
+                    if check == "missing-key" and all(is_pattern(host) for host in hosts):
+                        continue
+                    yield Finding(severity, check, hosts, message, path)
+
+
+def diagnose(c: SshConfig, concurrency=None) -> list[Finding]:
+    """
+    This function runs all checks on the ssh config and the key files of its hosts.
+    :param c: The ssh config object
+    :param concurrency: The maximum number of key files checked at once (default: DEFAULT_CONCURRENCY)
+    :return: The problems found, the errors first
+    """
+    with span("check config"):
+        findings = [*_duplicate_aliases(c), *_duplicate_endpoints(c), *_invalid_options(c)]
+    findings.extend(check_key_files(identity_files(c), concurrency))
+    return sorted(findings, key=lambda finding: SEVERITIES.index(finding.severity))
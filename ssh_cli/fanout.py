@@ -0,0 +1,125 @@
+import asyncio
+import os
+import signal
+import time
+from typing import Callable, NamedTuple
+
+from .mux import ssh_command
+
+DEFAULT_CONCURRENCY = 64
+
+# the maximum length of an output line, longer lines are split
+_LINE_LIMIT = 1024 * 1024
+
+
+class ExecResult(NamedTuple):
+    host: str
+    code: int | None
+    duration: float
+    output: list[tuple[str, str]] | None = None
+    error: str | None = None
+
+
+def _command(host, command) -> list[str]:
+    """
+    This function returns the ssh command that runs a remote command on a host non-interactively,
+    reusing the master connection of the host if there is one.
+    """
+    *ssh, host = ssh_command(host, master=False)
+    return [*ssh, "-o", "BatchMode=yes", "-T", host, command]
+
+
+def _kill(process):
+    """
+    This function kills the process group of ssh, so that children of ssh (e.g. a ProxyCommand) don't keep running.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _read_lines(host, name, stream, on_line, output):
+    while True:
+        try:
+            line = await stream.readuntil(b"\n")
+        except asyncio.LimitOverrunError as e:
+            # the line is longer than the limit, pass it on in pieces (`readline` would drop the rest of the buffer)
+            line = await stream.readexactly(e.consumed)
+        except asyncio.IncompleteReadError as e:
+            # the last line has no newline
+            line = e.partial
+        if not line:
+            return
+        line = line.decode(errors="replace").rstrip("\r\n")
+        if output is not None:
+            output.append((name, line))
+        if on_line:
+            on_line(host, name, line)
+
+
+async def _run(host, command, timeout, on_line, collect) -> ExecResult:
+    start = time.perf_counter()
+    output = [] if collect else None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_command(host, command),
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            limit=_LINE_LIMIT, start_new_session=True
+        )
+    except OSError as e:
+        return ExecResult(host, None, time.perf_counter() - start, output, e.strerror or str(e))
+
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            _read_lines(host, "stdout", process.stdout, on_line, output),
+            _read_lines(host, "stderr", process.stderr, on_line, output),
+            process.wait()
+        ), timeout)
+    except (asyncio.TimeoutError, TimeoutError):
+        _kill(process)
+        await process.wait()
+        return ExecResult(host, None, time.perf_counter() - start, output, "timed out")
+    except BaseException:
+        # e.g. KeyboardInterrupt: ssh runs in its own session and doesn't get the SIGINT of the terminal
+        _kill(process)
+        raise
+
+    return ExecResult(host, process.returncode, time.perf_counter() - start, output)
+
+
+async def _run_all(hosts, command, concurrency, timeout, on_line, on_result, collect) -> list[ExecResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(host):
+        async with semaphore:
+            return await _run(host, command, timeout, on_line, collect)
+
+    results = []
+    for result in asyncio.as_completed([bounded(host) for host in hosts]):
+        results.append(result := await result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def run_on_hosts(hosts, command, concurrency=None, timeout=None,
+                 on_line: Callable[[str, str, str], None] = None,
+                 on_result: Callable[[ExecResult], None] = None,
+                 collect=False) -> list[ExecResult]:
+    """
+    This function runs a command on many hosts concurrently with ssh. The ssh processes are driven by a single
+    asyncio event loop, at most `concurrency` of them run at once. The output is read without threads, but on
+    Python 3.10/3.11 asyncio waits for each ssh process in a thread, so there are at most `concurrency` threads.
+    :param hosts: The host names
+    :param command: The remote command
+    :param concurrency: The maximum number of concurrent ssh processes (default: DEFAULT_CONCURRENCY)
+    :param timeout: The timeout per host in seconds, a host that takes longer is killed (default: no timeout)
+    :param on_line: A function called with every output line as on_line(host, "stdout" or "stderr", line)
+    :param on_result: A function called when a host is done
+    :param collect: Whether to collect the output of each host in its result
+    :return: The results in the order the hosts finished (with an error and no code if the host timed out)
+    """
+    return asyncio.run(
+        _run_all(hosts, command, concurrency or DEFAULT_CONCURRENCY, timeout, on_line, on_result, collect)
+    )
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from fnmatch import fnmatchcase
+
+from .sshconfig import SshConfig
+
+
+def host_options(c: SshConfig, *keys) -> dict:
+    """
+    This function collects some options of every host in a single pass over the host records
+    (calling `c.host(...)` for every host would build a dict of all options of every host).
+    :param c: The ssh config object
+    :param keys: The (lowercase) option names to collect, e.g. "hostname"
+    :return: A dict mapping host names to a dict of their (first) option values
+    """
+    options = {}
+    for record in c.records():
+        for key, value in zip(record.keys, record.values):
+            if key in keys:
+                options.setdefault(record.name, {}).setdefault(key, value)
+    return options
+
+
+def is_pattern(host) -> bool:
+    """
+    This function checks if a `Host` entry is a pattern (e.g. `Host *`) instead of a concrete host.
+    """
+    return any(char in host for char in "*?!")
+
+
+def match_hosts(hosts, pattern) -> list[str]:
+    """
+    This function selects hosts with an ssh-style pattern list, e.g. `web*,db?,!web-old` (case-insensitive).
+    A host matches if it matches one of the patterns and none of the negated (`!`) patterns.
+    Pattern entries (e.g. `Host *`) are never selected.
+    :param hosts: The host names
+    :param pattern: The comma separated patterns
+    :return: The matching hosts, in the order of `hosts`
+    """
+    patterns = [p.strip().lower() for p in pattern.split(",") if p.strip()]
+    include = [p for p in patterns if not p.startswith("!")]
+    exclude = [p[1:] for p in patterns if p.startswith("!")]
+    return [
+        host for host in hosts
+        if not is_pattern(host)
+        and any(fnmatchcase(host.lower(), p) for p in include)
+        and not any(fnmatchcase(host.lower(), p) for p in exclude)
+    ]
+
+
+class HostIndex:
+    """
+    This class is an in-memory index of the hosts in the ssh config.
+    It is built once per command and kept up to date with `add` and `remove` alongside the changes to the config.
+    """
+
+    def __init__(self, c: SshConfig = None):
+        self.hosts = set()
+        self._folded = defaultdict(set)
+        self._hostnames = {}
+        self._by_hostname = defaultdict(set)
+
+        if c is not None:
+            options = host_options(c, "hostname")
+            for host in c.hosts():
+                self.add(host, options.get(host, {}).get("hostname"))
+
+    def __contains__(self, host) -> bool:
+        return host in self.hosts
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def add(self, host, hostname=None):
+        """
+        This function adds a host to the index.
+        :param host: The host name
+        :param hostname: The hostname of the host (optional)
+        """
+        self.hosts.add(host)
+        self._folded[host.casefold()].add(host)
+        if hostname:
+            self._hostnames[host] = hostname
+            self._by_hostname[hostname.casefold()].add(host)
+
+    def remove(self, host):
+        """
+        This function removes a host from the index, unknown hosts are ignored.
+        :param host: The host name
+        """
+        self.hosts.discard(host)
+        self._folded[host.casefold()].discard(host)
+        if (hostname := self._hostnames.pop(host, None)) is not None:
+            self._by_hostname[hostname.casefold()].discard(host)
+
+    def find(self, host) -> str | None:
+        """
+        This function looks up a host ignoring case (ssh matches host names case-insensitively).
+        :param host: The host name
+        :return: The configured host name or None if the host is not configured
+        """
+        if host in self.hosts:
+            return host
+        return next(iter(sorted(self._folded.get(host.casefold(), ()))), None)
+
+    def hosts_for_hostname(self, hostname) -> list[str]:
+        """
+        This function returns all hosts that are configured with a given hostname.
+        :param hostname: The hostname (e.g. example.com or 10.0.0.5)
+        :return: The sorted list of host names
+        """
+        return sorted(self._by_hostname.get(hostname.casefold(), ()))
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+import os
+import sys
+from typing import Iterator
+
+FORMATS = ["csv", "json", "yaml"]
+
+FIELDS = ["host", "hostname", "user", "port", "identityfile"]
+
+_EXTENSIONS = {".csv": "csv", ".json": "json", ".ndjson": "json", ".jsonl": "json", ".yaml": "yaml", ".yml": "yaml"}
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _detect_format(path, head) -> str:
+    """
+    This function detects the format of an inventory from the file extension or (for stdin) from its first characters.
+    :param path: The path of the file ("-" for stdin)
+    :param head: The first characters of the file
+    :return: The format (one of FORMATS)
+    """
+    if fmt := _EXTENSIONS.get(os.path.splitext(path)[1].lower()):
+        return fmt
+    head = head.lstrip()
+    if head.startswith(("[", "{")):
+        return "json"
+    if head.startswith(("---", "- ")):
+        return "yaml"
+    return "csv"
+
+
+def _read_csv(file) -> Iterator[dict]:
+    """
+    This function reads the rows of a CSV file, the first line is the header.
+    """
+    try:
+        for row in csv.DictReader(file, skipinitialspace=True):
+            yield {key.strip().lower(): value for key, value in row.items() if key is not None}
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV: {e}")
+
+
+def _read_json(file) -> Iterator[dict]:
+    """
+    This function reads the rows of a JSON file without loading the whole file.
+    Both a JSON array of objects and one object per line (NDJSON) are supported.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, in_array = "", 0, False, None
+
+    while True:
+        # skip whitespace and the separators of the array
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ",")):
+            pos += 1
+
+        if pos < len(buffer) and in_array is None:
+            in_array = buffer[pos] == "["
+            pos += in_array
+            continue
+
+        if pos < len(buffer) and in_array and buffer[pos] == "]":
+            return
+
+        if pos < len(buffer):
+            try:
+                row, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # the object is incomplete, read more (or fail if there is nothing more to read)
+                if eof:
+                    raise ValueError(f"Invalid JSON near `{buffer[pos:pos + 30]}`")
+            else:
+                if not isinstance(row, dict):
+                    raise ValueError(f"Expected a JSON object for each host, got `{row}`")
+                yield {key.lower(): value for key, value in row.items()}
+                pos = end
+                continue
+
+        if eof:
+            if in_array:
+                raise ValueError("Invalid JSON, the array is not closed")
+            return
+
+        chunk = file.read(_CHUNK_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def _read_yaml(file) -> Iterator[dict]:
+    """
+    This function reads the rows of a YAML file: a list of mappings, or one mapping per document.
+    YAML support is optional and requires PyYAML.
+    """
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError("Reading YAML requires PyYAML, install it with `pip install pyyaml`")
+
+    try:
+        for document in yaml.safe_load_all(file):
+            for row in document if isinstance(document, list) else [document]:
+                if not isinstance(row, dict):
+                    raise ValueError(f"Expected a YAML mapping for each host, got `{row}`")
+                yield {str(key).lower(): value for key, value in row.items()}
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML: {e}")
+
+
+def read_inventory(path, fmt=None) -> Iterator[tuple[int, dict]]:
+    """
+    This function reads the hosts of an inventory file row by row (the file is never loaded completely).
+    Each row is a dict with lowercase keys, e.g. host, hostname, user, port and identityfile.
+    :param path: The path of the file ("-" for stdin)
+    :param fmt: The format of the file (one of FORMATS, default: detect it)
+    :return: An iterator of (row number, row) tuples
+    """
+    if path == "-":
+        # peek at stdin to detect the format without consuming it
+        head = sys.stdin.buffer.peek(64)[:64].decode(errors="ignore")
+        file = io.TextIOWrapper(sys.stdin.buffer, newline="")
+    else:
+        file = open(path, newline="")
+        head = file.read(64)
+        file.seek(0)
+
+    try:
+        reader = {"csv": _read_csv, "json": _read_json, "yaml": _read_yaml}[fmt or _detect_format(path, head)]
+        yield from enumerate(reader(file), start=1)
+    finally:
+        if path == "-":
+            file.detach()
+        else:
+            file.close()
@@ -0,0 +1,178 @@
+import getpass
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+from .config import KEY_TYPE
+from .index import host_options, is_pattern
+from .resolve import match_pattern_list
+from .sshconfig import SshConfig
+from .trace import span
+
+
+def key_comment(host) -> str:
+    """
+    This function returns the comment of the key file of a host.
+    :param host: The host name
+    :return: The comment
+    """
+    return f"'key_for_{host}'"
+
+
+def identity_file_path(identity_file, host, options=None, config_dir=None, resolve_links=True) -> str:
+    """
+    This function normalizes an `IdentityFile` value of the ssh config the way ssh reads it, so that paths written
+    differently (e.g. `~/.ssh/keys/x` and `/home/me/.ssh/keys/x`) compare equal.
+    `~` and the tokens `%d`, `%h`, `%n`, `%p`, `%r`, `%u` and `%%` are expanded, relative paths are resolved against
+    the directory of the ssh config (like `Include`) and symlinks are resolved.
+    :param identity_file: The value of the `IdentityFile` option
+    :param host: The host name
+    :param options: The options of the host (lowercase keys, e.g. from `index.host_options`)
+    :param config_dir: The directory of the ssh config file (default: the current directory)
+    :param resolve_links: Whether to resolve symlinks (needed to compare paths, not to open the file)
+    :return: The absolute path of the key file
+    """
+    path = os.path.expanduser(identity_file.strip('"'))
+    if "%" in path:
+        # the tokens are only computed for the paths that use them (most paths are plain)
+        options = options or {}
+        local_user = os.getenv("USER") or getpass.getuser()
+        tokens = {
+            "%": "%",
+            "d": os.path.expanduser("~"),
+            "h": options.get("hostname") or host,
+            "n": host,
+            "p": str(options.get("port") or 22),
+            "r": options.get("user") or local_user,
+            "u": local_user,
+        }
+        path = re.sub(r"%(.)", lambda m: tokens.get(m.group(1), m.group(0)), path)
+    path = os.path.join(config_dir or os.getcwd(), path)
+    return os.path.realpath(path) if resolve_links else os.path.abspath(path)
+
+
+def identity_files(c: SshConfig) -> dict[str, list[str]]:
+    """
+    This function collects the key files used in the ssh config in a single pass, normalized with
+    `identity_file_path`. Tokens (e.g. `%h`) are expanded for every name of a `Host` line, and for a pattern
+    (e.g. `Host web*`) for every host of the config that matches it.
+    :param c: The ssh config object
+    :return: A dict mapping the (absolute) paths of the key files to the hosts using them, a key file of a pattern
+        is used by the pattern (e.g. `*`)
+    """
+    # the options and the hosts by name (a `Host` line can list several names)
+    options = {name: values for host, values in host_options(c, "hostname", "user", "port").items()
+               for name in host.split()}
+    hosts = [name for host in c.hosts() for name in host.split() if not is_pattern(name)]
+    files = {}
+    for path, config_file in c.configs_:
+        config_dir = os.path.dirname(os.path.abspath(path))
+        for record in config_file.records():
+            names = record.name.split()
+            literal, patterns = not any(is_pattern(name) for name in names), ",".join(names)
+            for key, value in zip(record.keys, record.values):
+                if key != "identityfile" or value.lower() == "none":
+                    continue
+                if literal:
+                    targets = [(name, name) for name in names]
+                elif "%" in value:
+                    targets = [(host, record.name) for host in hosts if match_pattern_list(host, patterns)]
+                else:
+                    targets = [(record.name, record.name)]
+                for name, user in targets:
+                    key_file = identity_file_path(value, name, options.get(name), config_dir)
+                    files.setdefault(key_file, []).append(user)
+    return files
+
+
+def generate_key(key_file, comment, password="", key_type=None) -> str | None:
+    """
+    This function generates a keypair with `ssh-keygen`.
+    :param key_file: The path of the private key file (the public key is written to `<key_file>.pub`)
+    :param comment: The comment of the key
+    :param password: The passphrase of the key (default: no passphrase)
+    :param key_type: The type of the key (default: KEY_TYPE)
+    :return: None if the key was created, the error message otherwise
+    """
+    if os.path.exists(key_file):
+        return f"Key file {key_file} already exists"
+
+    with span("ssh-keygen", key_file=key_file):
+        res = subprocess.run(
+            ["ssh-keygen",
+             "-t", key_type or KEY_TYPE,
+             "-C", comment,
+             "-f", key_file,
+             "-N", password,
+             "-q"
+             ], stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if res.returncode != 0:
+        return res.stderr.strip() or f"ssh-keygen exited with {res.returncode}"
+    return None
+
+
+def generate_keys(key_files: dict, password="", concurrency=None,
+                  progress: Callable[[int, int, str, str | None], None] = None) -> tuple[dict, dict]:
+    """
+    This function generates many keypairs concurrently, running up to `concurrency` ssh-keygen processes at once
+    (ssh-keygen does the work, the threads of the pool only wait for their process).
+    If the generation is interrupted, all keys generated so far are removed again.
+    :param key_files: A dict mapping host names to the path of their private key file
+    :param password: The passphrase of the keys (default: no passphrase)
+    :param concurrency: The maximum number of concurrent ssh-keygen processes (default: number of cpus)
+    :param progress: A function called after each key as progress(done, total, host, error)
+    :return: A tuple of a dict mapping hosts to their created key file and a dict mapping hosts to their error
+    """
+    created, errors = {}, {}
+
+    with ThreadPoolExecutor(max_workers=concurrency or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(generate_key, key_file, key_comment(host), password): host
+            for host, key_file in key_files.items()
+        }
+        try:
+            for future in as_completed(futures):
+                host = futures[future]
+                if error := future.result():
+                    errors[host] = error
+                else:
+                    created[host] = key_files[host]
+                if progress:
+                    progress(len(created) + len(errors), len(key_files), host, error)
+        except BaseException:
+            # e.g. KeyboardInterrupt: don't start new processes and remove every key that was created
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            remove_key_files(
+                key_files[host] for future, host in futures.items()
+                if not future.cancelled() and future.exception() is None and future.result() is None
+            )
+            raise
+
+    return created, errors
+
+
+def remove_key_files(key_files, on_error: Callable[[str, OSError], None] = None) -> tuple[int, list[str]]:
+    """
+    This function removes keypairs (private and public key file).
+    :param key_files: The paths of the private key files
+    :param on_error: A function called with the path and the error of a file that can't be removed
+        (default: the error is raised)
+    :return: A tuple of the number of removed files and the paths of the files that don't exist
+    """
+    removed, missing = 0, []
+    for key_file in key_files:
+        for path in (key_file, f"{key_file}.pub"):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                missing.append(path)
+            except OSError as e:
+                if on_error is None:
+                    raise
+                on_error(path, e)
+    return removed, missing
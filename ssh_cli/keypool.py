@@ -0,0 +1,129 @@
+import fcntl
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+
+from .config import KEY_POOL_DIR, KEY_POOL_SIZE, KEY_TYPE
+from .keygen import generate_keys
+
+
+def _pool_dir(key_type=None) -> str:
+    """
+    This function returns the directory of the spare keys of a key type.
+    Every spare key lives in its own subdirectory (`<id>/key` and `<id>/key.pub`), so it can be claimed atomically
+    by renaming the subdirectory.
+    :param key_type: The key type (default: KEY_TYPE)
+    :return: The path of the directory
+    """
+    return os.path.join(KEY_POOL_DIR, key_type or KEY_TYPE)
+
+
+def spare_keys(key_type=None) -> list[str]:
+    """
+    This function lists the spare keys in the pool.
+    :param key_type: The key type (default: KEY_TYPE)
+    :return: The ids of the spare keys
+    """
+    try:
+        return [entry.name for entry in os.scandir(_pool_dir(key_type)) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def refill(size, concurrency=None, progress=None) -> int:
+    """
+    This function fills the pool with passphrase-less spare keys until it holds `size` keys.
+    Keys are generated in a temporary directory and moved into the pool when they are complete.
+    Only one refill runs at a time, a concurrent call returns immediately.
+    :param size: The number of spare keys the pool should hold
+    :param concurrency: The maximum number of concurrent ssh-keygen processes (default: number of cpus)
+    :param progress: A function called after each key, see `keygen.generate_keys`
+    :return: The number of generated keys
+    """
+    pool_dir = _pool_dir()
+    os.makedirs(pool_dir, mode=0o700, exist_ok=True)
+
+    with open(os.path.join(KEY_POOL_DIR, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+
+        if (missing := size - len(spare_keys())) <= 0:
+            return 0
+
+        tmp_dirs = {}
+        for _ in range(missing):
+            key_id = uuid.uuid4().hex
+            tmp_dirs[key_id] = tmp_dir = os.path.join(KEY_POOL_DIR, f".tmp-{key_id}")
+            os.mkdir(tmp_dir, mode=0o700)
+
+        try:
+            created, _ = generate_keys(
+                {key_id: os.path.join(tmp_dir, "key") for key_id, tmp_dir in tmp_dirs.items()},
+                concurrency=concurrency, progress=progress
+            )
+            for key_id in created:
+                os.rename(tmp_dirs[key_id], os.path.join(pool_dir, key_id))
+        finally:
+            for tmp_dir in tmp_dirs.values():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return len(created)
+
+
+def refill_in_background():
+    """
+    This function starts a detached `ssh-cli --refill-keys KEY_POOL_SIZE` process, if the pool is enabled.
+    """
+    if KEY_POOL_SIZE <= 0:
+        return
+    subprocess.Popen(
+        [sys.executable, "-m", "ssh_cli", "--refill-keys", str(KEY_POOL_SIZE)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+
+
+def claim_key(key_file, comment, password="") -> bool:
+    """
+    This function takes a spare key from the pool and moves it to `key_file`, no key is generated.
+    The comment of the key is rewritten and, if a password is given, the key is encrypted with it.
+    :param key_file: The path of the private key file (the public key is moved to `<key_file>.pub`)
+    :param comment: The comment of the key
+    :param password: The passphrase of the key (default: no passphrase)
+    :return: True if a key was claimed, False if the pool is empty
+    """
+    if os.path.exists(key_file) or os.path.exists(f"{key_file}.pub"):
+        return False
+
+    pool_dir = _pool_dir()
+    for key_id in spare_keys():
+        claimed = os.path.join(KEY_POOL_DIR, f".claimed-{key_id}")
+        try:
+            # renaming is atomic, if another process claimed the key first this fails
+            os.rename(os.path.join(pool_dir, key_id), claimed)
+        except FileNotFoundError:
+            continue
+
+        try:
+            os.rename(os.path.join(claimed, "key.pub"), f"{key_file}.pub")
+            os.rename(os.path.join(claimed, "key"), key_file)
+            subprocess.run(["ssh-keygen", "-c", "-C", comment, "-P", "", "-f", key_file],
+                           stdin=subprocess.DEVNULL, capture_output=True, check=True)
+            if password:
+                subprocess.run(["ssh-keygen", "-p", "-P", "", "-N", password, "-f", key_file],
+                               stdin=subprocess.DEVNULL, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            # don't hand out a key in an unknown state, the caller falls back to generating a new key
+            for path in (key_file, f"{key_file}.pub"):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+        finally:
+            shutil.rmtree(claimed, ignore_errors=True)
+
+        return True
+
+    return False
@@ -0,0 +1,93 @@
+import base64
+import hmac
+import os
+import shutil
+import tempfile
+
+from .config import KNOWN_HOSTS_PATH
+
+_HASH_MAGIC = "|1|"
+
+
+def host_names(host, hostname=None, port=None) -> set[str]:
+    """
+    This function returns the names a host can appear as in the known_hosts file.
+    ssh writes the name it connected to (alias or hostname) and, for a port other than 22, `[name]:port`.
+    :param host: The host name (alias)
+    :param hostname: The hostname of the host (optional)
+    :param port: The port of the host (optional)
+    :return: A set of (lowercase) names
+    """
+    names = {name.lower() for name in (host, hostname) if name}
+    if port and str(port) != "22":
+        names |= {f"[{name}]:{port}" for name in names}
+    return names
+
+
+def _matches(hosts_field, names, hashed) -> bool:
+    """
+    This function checks if the host field of a known_hosts line contains one of the names.
+    :param hosts_field: The first field of the line, e.g. `web1,10.0.0.1` or `|1|salt|hash`
+    :param names: A set of (lowercase) names
+    :param hashed: A list of the encoded names (hashed entries are compared by their HMAC)
+    :return: True if the line belongs to one of the names
+    """
+    for entry in hosts_field.split(","):
+        if not entry.startswith(_HASH_MAGIC):
+            if entry.lower() in names:
+                return True
+            continue
+
+        # hashed entry: |1|base64(salt)|base64(hmac_sha1(salt, name))
+        try:
+            salt, digest = (base64.b64decode(part) for part in entry[len(_HASH_MAGIC):].split("|", 1))
+        except ValueError:
+            continue
+        if any(hmac.compare_digest(hmac.digest(salt, name, "sha1"), digest) for name in hashed):
+            return True
+    return False
+
+
+def remove_hosts(names, path=None) -> int:
+    """
+    This function removes all entries of a set of hosts from the known_hosts file in a single streaming pass
+    (instead of running `ssh-keygen -R` once per name, which rewrites the whole file every time).
+    Plain and hashed entries are removed, `@cert-authority` and `@revoked` lines are kept.
+    The file is replaced atomically and the previous version is kept as `<path>.old` (like `ssh-keygen -R`).
+    :param names: The names to remove, see `host_names`
+    :param path: The path of the known_hosts file (default: KNOWN_HOSTS_PATH)
+    :return: The number of removed lines
+    """
+    path = path or KNOWN_HOSTS_PATH
+    names = {name.lower() for name in names}
+    hashed = [name.encode() for name in names]
+    if not names or not os.path.exists(path):
+        return 0
+
+    removed = 0
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".known_hosts-")
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            for line in src:
+                fields = line.split(None, 1)
+                if fields and not fields[0].startswith((b"#", b"@")) \
+                        and _matches(fields[0].decode(errors="replace"), names, hashed):
+                    removed += 1
+                    continue
+                dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        if not removed:
+            os.unlink(tmp)
+            return 0
+
+        shutil.copymode(path, tmp)
+        shutil.copy2(path, f"{path}.old")
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    return removed
@@ -1,50 +1,70 @@
-from pathlib import Path
+import sys
 
 import inquirer
-from sshconf import read_ssh_config, SshConfig
-from termcolor import colored
+from termcolor import colored, cprint
 
-from .config import CONFIG_FILE_PATH, CANCEL
+from .config import CANCEL
+from .keys import PublicKey, PublicKeyCache, host_key_files
+from .picker import pick_host
+from .search import search_index
+from .sshconfig import SshConfig
+from .store import load_config
+from .trace import span
+from .usage import frecency_order
 
 
-def get_public_key(host, c) -> str | None:
+def get_public_key(host, c, keys: PublicKeyCache = None) -> PublicKey | str | None:
     """
-    This function reads the public key file for a host and returns its content.
+    This function reads the public key file for a host (through the cache of public keys).
     :param host: The host name
     :param c: The ssh config object
-    :return: The content of the public key file or None if the file doesn't exist
+    :param keys: The cache of public keys (default: the cache in the cache directory)
+    :return: The public key, a message if the file doesn't exist or None if the host has no key file
     """
-    if c.host(host) is None:
+    if not (key_file := host_key_files(c, [host]).get(host)):
         return
 
-    if not (key_file := c.host(host).get("identityfile")):
-        return
-
-    path = f'{key_file}.pub'
+    if keys is None:
+        with PublicKeyCache() as keys:
+            public_key = keys.get(f"{key_file}.pub")
+    else:
+        public_key = keys.get(f"{key_file}.pub")
 
-    if not Path(path).exists():
-        return f"public key file not found"
+    return public_key or "public key file not found"
 
-    with open(path) as file:
-        return file.read().strip()
 
-
-def select_host() -> str | None:
+def select_host(c: SshConfig = None, host=None) -> str | None:
     """
     This function prompts the user to select a host from the ssh config file.
-    :return: The selected host (hostname) or None if the user cancels
+    The hosts used most often and most recently are shown first (see `usage.py`).
+    :param c: The ssh config object (default: read the ssh config file)
+    :param host: The host given on the command line, it is checked instead of prompting
+    :return: The selected host (hostname) or None if the user cancels or the given host doesn't exist
     """
-    c = read_ssh_config(CONFIG_FILE_PATH)
+    c = c or load_config()
+    if host is not None:
+        if host in c.hosts():
+            return host
+        cprint(f"Host `{host}` not found", "red")
+        return None
+    with span("build search index"):
+        index = search_index(c, frecency_order(c))
+
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        with span("prompt"):
+            return pick_host(index, message="Select the Host?")
+
     questions = [
         inquirer.List(
             "host",
             message="Select the Host?",
-            choices=[CANCEL, *sorted(c.hosts())]
+            choices=[CANCEL, *index.hosts]
         ),
     ]
-    answers = inquirer.prompt(questions)
+    with span("prompt"):
+        answers = inquirer.prompt(questions)
 
-    if answers["host"] == CANCEL or answers is None:
+    if answers is None or answers["host"] == CANCEL:
         return
 
     return answers["host"]
@@ -56,17 +76,32 @@ def confirm_action(message=None) -> bool:
     :param message: The message to display (default: "Are you sure?")
     :return: True if the user confirms, False otherwise
     """
-    return inquirer.confirm(message or "Are you sure?", default=False)
+    with span("prompt"):
+        return inquirer.confirm(message or "Are you sure?", default=False)
 
 
-def show_host_config(host: str, c: SshConfig):
+def show_host_config(host: str, c: SshConfig, effective=False, keys: PublicKeyCache = None):
     """
     This function prints the configuration of a host.
     :param host: The host name
     :param c: The ssh config object
+    :param effective: Whether to print the effective options (with those of matching patterns and the defaults)
+                      and where each option is defined, instead of the options of the Host block
+    :param keys: The cache of public keys (default: the cache in the cache directory)
     """
-    print(f"Host: {colored(host, attrs=['bold'])}")
-    for key in c.host(host).keys():
-        print(f"\t{key}: {colored(c.host(host).get(key), attrs=['underline'])}")
-    if public_key := get_public_key(host, c):
-        print(f"Public key: {colored(public_key, attrs=['reverse'])}")
+    with span("render"):
+        print(f"Host: {colored(host, attrs=['bold'])}")
+        if effective:
+            from .resolve import EffectiveConfig
+
+            for key, values in EffectiveConfig(c).resolve_sources(host).items():
+                for value, source in values:
+                    print(f"\t{key}: {colored(value, attrs=['underline'])} {colored(f'({source})', 'dark_grey')}")
+        else:
+            for key in c.host(host).keys():
+                print(f"\t{key}: {colored(c.host(host).get(key), attrs=['underline'])}")
+        if isinstance(public_key := get_public_key(host, c, keys), PublicKey):
+            print(f"Key: {public_key.describe()}")
+            print(f"Public key: {colored(public_key.text, attrs=['reverse'])}")
+        elif public_key:
+            print(f"Public key: {colored(public_key, attrs=['reverse'])}")
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import re
+import socket
+import stat
+import subprocess
+import time
+
+from .config import CONTROL_DIR, CONTROL_PERSIST
+
+# the path of a unix socket is limited to ~104 bytes (macOS) resp. 108 bytes (Linux)
+_MAX_SOCKET_PATH = 100
+
+# the options of ssh's own connection sharing, ssh-cli doesn't override them
+_CONTROL_OPTIONS = ("controlmaster", "controlpath", "controlpersist")
+
+
+def control_path(host) -> str:
+    """
+    This function returns the path of the control socket of the master connection of a host.
+    The socket is named after the host, hosts with unusual or long names get a hashed name.
+    :param host: The host name
+    :return: The path of the socket
+    """
+    path = os.path.join(CONTROL_DIR, host)
+    if not re.fullmatch(r"[\w.@-]+", host) or len(path) > _MAX_SOCKET_PATH:
+        path = os.path.join(CONTROL_DIR, "h-" + hashlib.sha1(host.encode()).hexdigest()[:16])
+    return path
+
+
+def is_alive(path) -> bool:
+    """
+    This function checks if a master connection listens on a control socket (without starting an ssh process).
+    A stale socket (the master exited without removing it) is removed.
+    :param path: The path of the socket
+    :return: True if the master is alive
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            return True
+        except ConnectionRefusedError:
+            try:
+                if stat.S_ISSOCK(os.lstat(path).st_mode):
+                    os.remove(path)
+            except OSError:
+                pass
+            return False
+        except OSError:
+            return False
+
+
+def _configures_sharing(c, host) -> bool:
+    """
+    This function checks if the ssh config sets up connection sharing (ControlMaster, ControlPath, ControlPersist)
+    for a host.
+    """
+    from .resolve import EffectiveConfig
+
+    options = EffectiveConfig(c).resolve(host)
+    return any(option in options for option in _CONTROL_OPTIONS)
+
+
+def ssh_command(host, master=False, c=None) -> list[str]:
+    """
+    This function returns the ssh command to connect to a host.
+    A live master connection (see `warm`) is reused. With `master`, the connection becomes a master that stays open
+    for CONTROL_PERSIST after the session ends, so the next connection skips the handshake, unless the ssh config
+    sets up connection sharing for the host itself (its options are not overridden).
+    :param host: The host name
+    :param master: Whether the connection becomes a persistent master (False: only reuse a live master)
+    :param c: The ssh config object, needed with `master` (default: read the ssh config file)
+    :return: The command (without the remote command)
+    """
+    path = control_path(host)
+    if is_alive(path):
+        return ["ssh", "-S", path, "-o", "ControlMaster=no", host]
+    if not master or CONTROL_PERSIST == "no":
+        return ["ssh", host]
+    if c is None:
+        from .store import load_config
+        c = load_config()
+    if _configures_sharing(c, host):
+        return ["ssh", host]
+    os.makedirs(CONTROL_DIR, mode=0o700, exist_ok=True)
+    return ["ssh", "-o", "ControlMaster=auto", "-o", f"ControlPath={path}", "-o", f"ControlPersist={CONTROL_PERSIST}",
+            host]
+
+
+def warm(hosts, timeout=30) -> dict:
+    """
+    This function opens persistent master connections to hosts in the background, all hosts at once.
+    Hosts that already have a live master are skipped. ssh runs in batch mode, hosts that would ask for a password fail.
+    :param hosts: The host names
+    :param timeout: The time in seconds to wait for the masters to authenticate
+    :return: A dict mapping hosts to their error, None if the master is open
+    """
+    os.makedirs(CONTROL_DIR, mode=0o700, exist_ok=True)
+
+    processes, results = {}, {}
+    for host in hosts:
+        path = control_path(host)
+        if is_alive(path):
+            results[host] = None
+            continue
+        # -f puts ssh into the background after authentication, so the process exits once the master is ready
+        # (warmed masters always persist, even if SSH_CLI_CONTROL_PERSIST is "no")
+        processes[host] = subprocess.Popen(
+            ["ssh", "-f", "-N", "-o", "BatchMode=yes", "-o", "ControlMaster=yes", "-o", f"ControlPath={path}",
+             "-o", f"ControlPersist={CONTROL_PERSIST if CONTROL_PERSIST != 'no' else '10m'}", host],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+
+    deadline = time.monotonic() + timeout
+    for host, process in processes.items():
+        try:
+            _, stderr = process.communicate(timeout=max(deadline - time.monotonic(), 0))
+            if process.returncode != 0:
+                results[host] = stderr.strip() or f"ssh exited with {process.returncode}"
+            else:
+                results[host] = None
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            results[host] = "timed out"
+    return results
+
+
+def masters() -> list[tuple[str, str, float]]:
+    """
+    This function lists the live master connections.
+    :return: A list of (socket name, socket path, age in seconds) tuples, sorted by name
+    """
+    try:
+        entries = list(os.scandir(CONTROL_DIR))
+    except FileNotFoundError:
+        return []
+
+    now, live = time.time(), []
+    for entry in entries:
+        st = entry.stat(follow_symlinks=False)
+        if stat.S_ISSOCK(st.st_mode) and is_alive(entry.path):
+            live.append((entry.name, entry.path, now - st.st_mtime))
+    return sorted(live)
+
+
+def close_master(name) -> str | None:
+    """
+    This function closes a master connection.
+    :param name: The name of the socket (see `masters`)
+    :return: None if the master was closed, the error message otherwise
+    """
+    path = os.path.join(CONTROL_DIR, name)
+    res = subprocess.run(["ssh", "-S", path, "-O", "exit", name], stdin=subprocess.DEVNULL, capture_output=True,
+                         text=True)
+    if res.returncode != 0 and is_alive(path):
+        return res.stderr.strip() or f"ssh exited with {res.returncode}"
+    return None
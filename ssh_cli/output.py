@@ -0,0 +1,72 @@
+"""
+Machine-readable output of rows (dicts) as JSON, NDJSON or TSV.
+
+The rows are written one by one as they are generated, so the output of many hosts starts immediately,
+and a closed pipe (e.g. `ssh-cli --list --format ndjson | head`) ends the output quietly.
+"""
+import json
+import os
+import sys
+from typing import Iterable
+
+FORMATS = ("table", "json", "ndjson", "tsv")
+
+
+def parse_columns(columns, default) -> list[str]:
+    """
+    This function parses a comma separated list of columns (option names, e.g. `hostname,user`).
+    :param columns: The columns (None: the default columns)
+    :param default: The default columns
+    :return: The lowercase column names
+    """
+    if not columns:
+        return list(default)
+    return [column.strip().lower() for column in columns.split(",") if column.strip()]
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = ",".join(value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _lines(rows, columns, fmt) -> Iterable[str]:
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps(row) + "\n"
+    elif fmt == "json":
+        yield "["
+        for i, row in enumerate(rows):
+            yield ("," if i else "") + "\n  " + json.dumps(row)
+        yield "\n]\n"
+    elif fmt == "tsv":
+        yield "\t".join(columns) + "\n"
+        for row in rows:
+            yield "\t".join(_tsv_value(row.get(column)) for column in columns) + "\n"
+    else:
+        raise ValueError(f"Unknown format {fmt}")
+
+
+def write_rows(rows: Iterable[dict], columns, fmt, file=None) -> bool:
+    """
+    This function writes rows in a machine-readable format, row by row as they are generated.
+    :param rows: The rows, dicts mapping the columns to their values
+    :param columns: The columns (the header of TSV)
+    :param fmt: "json", "ndjson" or "tsv"
+    :param file: The file to write to (default: stdout)
+    :return: True if all rows were written, False if the reader closed the pipe
+    """
+    file = file or sys.stdout
+    try:
+        for line in _lines(rows, columns, fmt):
+            file.write(line)
+        file.flush()
+        return True
+    except BrokenPipeError:
+        # the reader is gone, point stdout to devnull so that flushing it at exit doesn't fail again
+        if file is sys.stdout:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+        return False
@@ -0,0 +1,76 @@
+import sys
+
+import readchar
+from readchar import key
+from termcolor import colored
+
+from .search import HostSearchIndex
+
+_CLEAR_BELOW = "\x1b[J"
+
+
+def _move_up(lines) -> str:
+    return f"\x1b[{lines}F" if lines else "\r"
+
+
+def _render(message, query, hosts, details, selected, total) -> list[str]:
+    """
+    This function renders the picker (prompt line, matching hosts and a hint line).
+    :return: The lines to print
+    """
+    lines = [f"{colored('?', 'yellow')} {message} {query}"]
+    for i, host in enumerate(hosts):
+        hostname, user = details.get(host, (None, None))
+        detail = colored(f"  {user + '@' if user else ''}{hostname or ''}", "dark_grey")
+        if i == selected:
+            lines.append(f"{colored('>', 'yellow')} {colored(host, 'yellow', attrs=['bold'])}{detail}")
+        else:
+            lines.append(f"  {host}{detail}")
+    lines.append(colored(f"  {len(hosts)} of {total} hosts - type to filter, ↑/↓ to move, enter to select, esc to cancel",
+                         "dark_grey"))
+    return lines
+
+
+def pick_host(index: HostSearchIndex, message="Select the Host?", limit=10) -> str | None:
+    """
+    This function shows a filter-as-you-type host picker. Every keystroke queries the search index,
+    only the best `limit` matches are rendered.
+    :param index: The search index of the hosts
+    :param message: The prompt message
+    :param limit: The number of matches to show
+    :return: The selected host or None if the user cancels
+    """
+    details = dict(zip(index.hosts, index.details))
+    query, selected, drawn, picked = "", 0, 0, None
+    hosts = index.search(query, limit)
+
+    try:
+        while True:
+            lines = _render(message, query, hosts, details, selected, len(index))
+            sys.stdout.write(_move_up(drawn) + _CLEAR_BELOW + "\n".join(lines))
+            sys.stdout.flush()
+            drawn = len(lines) - 1
+
+            pressed = readchar.readkey()
+            if pressed in (key.ENTER, key.CR, key.LF):
+                if hosts:
+                    picked = hosts[selected]
+                    return picked
+            elif pressed == key.ESC:
+                return None
+            elif pressed == key.UP:
+                selected = max(selected - 1, 0)
+            elif pressed in (key.DOWN, key.TAB):
+                selected = min(selected + 1, max(len(hosts) - 1, 0))
+            elif pressed == key.BACKSPACE:
+                query, selected = query[:-1], 0
+                hosts = index.search(query, limit)
+            elif len(pressed) == 1 and pressed.isprintable():
+                query, selected = query + pressed, 0
+                hosts = index.search(query, limit)
+    except KeyboardInterrupt:
+        return None
+    finally:
+        # replace the picker with a single line showing the answer
+        sys.stdout.write(_move_up(drawn) + _CLEAR_BELOW + f"{colored('?', 'yellow')} {message} {picked or ''}\n")
+        sys.stdout.flush()
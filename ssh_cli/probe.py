@@ -0,0 +1,90 @@
+import asyncio
+import resource
+import time
+from typing import Callable, NamedTuple
+
+DEFAULT_TIMEOUT = 3.0
+
+
+class ProbeResult(NamedTuple):
+    host: str
+    status: str
+    latency: float | None = None
+    banner: str | None = None
+
+
+def default_concurrency() -> int:
+    """
+    This function returns how many connections may be open at once, bounded by the limit of open files of the process.
+    :return: The number of concurrent connections
+    """
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 1024
+    return max(min(soft - 64, 1024), 1)
+
+
+async def probe(host, hostname, port, timeout=DEFAULT_TIMEOUT) -> ProbeResult:
+    """
+    This function opens a TCP connection to a host and reads the banner to check that an SSH server answers.
+    :param host: The host name
+    :param hostname: The hostname (or ip) to connect to
+    :param port: The port to connect to
+    :param timeout: The timeout in seconds for connecting and reading the banner
+    :return: The result, the status is one of "ssh", "open" (no SSH banner), "timeout", "refused", "invalid port"
+        or an error
+    """
+    try:
+        port = int(port)
+    except ValueError:
+        # e.g. `Port ssh` in the ssh config
+        return ProbeResult(host, "invalid port")
+    deadline = time.monotonic() + timeout
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(hostname, port), timeout)
+    except (asyncio.TimeoutError, TimeoutError):
+        return ProbeResult(host, "timeout")
+    except ConnectionRefusedError:
+        return ProbeResult(host, "refused")
+    except OSError as e:
+        return ProbeResult(host, e.strerror or type(e).__name__)
+    latency = (time.perf_counter() - start) * 1000
+
+    try:
+        banner = await asyncio.wait_for(reader.readline(), max(deadline - time.monotonic(), 0))
+        banner = banner.decode(errors="replace").strip()
+    except (asyncio.TimeoutError, TimeoutError, OSError, ValueError):
+        # ValueError: the server sent more than the buffer limit without a newline, that is no SSH banner
+        banner = ""
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    return ProbeResult(host, "ssh" if banner.startswith("SSH-") else "open", latency, banner or None)
+
+
+async def _probe_all(targets, concurrency, timeout, on_result):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(target):
+        async with semaphore:
+            return await probe(*target, timeout=timeout)
+
+    for result in asyncio.as_completed([bounded(target) for target in targets]):
+        on_result(await result)
+
+
+def probe_hosts(targets, on_result: Callable[[ProbeResult], None], concurrency=None, timeout=DEFAULT_TIMEOUT):
+    """
+    This function probes many hosts concurrently, so that all hosts are probed in about one timeout period
+    (and not one timeout per host). Results are passed to `on_result` as they arrive.
+    :param targets: A list of (host, hostname, port) tuples
+    :param on_result: A function called with the result of each host
+    :param concurrency: The maximum number of open connections (default: see `default_concurrency`)
+    :param timeout: The timeout per host in seconds
+    """
+    asyncio.run(_probe_all(targets, concurrency or default_concurrency(), timeout, on_result))
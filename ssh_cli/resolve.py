@@ -0,0 +1,278 @@
+"""
+Resolution of the effective options of hosts, the way `ssh -G` resolves them, but in-process and for all hosts at once.
+
+The `Host` patterns of the config are compiled once into an index: literal names are looked up in a dict, simple
+prefix (`web*`) and suffix (`*.example.com`) patterns in buckets keyed by their fixed part, and only the remaining
+patterns are matched with a regex. Resolving a host looks at the blocks that can match it instead of every block.
+
+Supported `Match` criteria are `all`, `host`, `originalhost`, `user` and `localuser`. Blocks with other criteria
+(`exec`, `canonical`, `final`, `localnetwork`, `tagged`) never match, as they can't be evaluated without connecting.
+"""
+import os
+import pwd
+import re
+from collections import defaultdict
+
+from .sshconfig import SshConfig, read_ssh_config_file, _MAX_INCLUDE_DEPTH, _key_value, _resolve_includes
+
+# options that can be given more than once (all values are used), for all other options the first value wins
+MULTI_OPTIONS = {"identityfile", "certificatefile", "localforward", "remoteforward", "dynamicforward", "sendenv"}
+
+_DEFAULT = "default"
+
+
+def _compile(pattern) -> re.Pattern:
+    """
+    This function compiles an ssh pattern (`*` and `?` are the only wildcards) into a regex.
+    """
+    return re.compile(re.escape(pattern).replace(r"\*", ".*").replace(r"\?", "."), re.DOTALL)
+
+
+def _is_literal(pattern) -> bool:
+    return "*" not in pattern and "?" not in pattern
+
+
+def match_pattern_list(name, patterns) -> bool:
+    """
+    This function matches a name against a comma separated ssh pattern list, e.g. `web*,!web-old`.
+    The name matches if it matches one of the patterns and none of the negated patterns.
+    """
+    matched = False
+    for pattern in patterns.split(","):
+        if pattern.startswith("!"):
+            if _compile(pattern[1:]).fullmatch(name):
+                return False
+        elif not matched and _compile(pattern).fullmatch(name):
+            matched = True
+    return matched
+
+
+class Block:
+    """
+    This class holds a `Host` or `Match` block (or the options before the first block) and its options.
+    A block of a file included inside of another block only applies if the enclosing block (its parent) applies.
+    """
+    __slots__ = ("kind", "value", "options", "source", "parent", "_positive", "_negated")
+
+    def __init__(self, kind, value, source, parent=None):
+        """
+        :param kind: "host", "match" or "all" (the options outside of any block)
+        :param value: The patterns of a Host block or the criteria of a Match block
+        :param source: Where the block is defined (`path:line`)
+        :param parent: The block of the `Include` line of the file of the block (if it is inside of a block)
+        """
+        self.kind = kind
+        self.value = value
+        self.options = []
+        self.source = source
+        self.parent = parent
+        self._positive = [_compile(p) for p in self.patterns()]
+        self._negated = [_compile(p[1:]) for p in value.split() if p.startswith("!")] if kind == "host" else []
+
+    def patterns(self) -> list[str]:
+        """
+        This function returns the positive patterns of a Host block.
+        """
+        return [p for p in self.value.split() if not p.startswith("!")] if self.kind == "host" else []
+
+    def matches(self, host, options, local_user, indexed=False) -> bool:
+        """
+        This function checks if the block applies to a host.
+        :param host: The host name (alias)
+        :param options: The options resolved so far (for `Match host` and `Match user`)
+        :param local_user: The name of the local user
+        :param indexed: Whether the positive patterns are known to match (the block was found with the index)
+        """
+        if self.parent is not None and not self.parent.matches(host, options, local_user):
+            return False
+        if self.kind == "all":
+            return True
+        if self.kind == "host":
+            if not indexed and not any(positive.fullmatch(host) for positive in self._positive):
+                return False
+            return not any(negated.fullmatch(host) for negated in self._negated)
+
+        tokens = self.value.split()
+        if not tokens:
+            return False
+        i = 0
+        while i < len(tokens):
+            criterion = tokens[i].lower()
+            negate = criterion.startswith("!")
+            criterion = criterion.lstrip("!")
+            if criterion == "all":
+                result = True
+            elif criterion in ("host", "originalhost", "user", "localuser") and i + 1 < len(tokens):
+                i += 1
+                if criterion == "host":
+                    name = _hostname(host, options)
+                elif criterion == "user":
+                    name = options["user"][0][0] if "user" in options else local_user
+                else:
+                    name = host if criterion == "originalhost" else local_user
+                result = match_pattern_list(name, tokens[i])
+            else:
+                # e.g. `exec`, `canonical` or `final`, they can't be evaluated here
+                return False
+            if result == negate:
+                return False
+            i += 1
+        return True
+
+
+def _hostname(host, options) -> str:
+    """
+    This function returns the hostname of a host resolved so far (with `%h` and `%%` expanded, lowercase like ssh).
+    """
+    if "hostname" not in options:
+        return host
+    return re.sub(r"%([h%])", lambda m: host if m.group(1) == "h" else "%", options["hostname"][0][0]).lower()
+
+
+def config_blocks(c: SshConfig) -> list[Block]:
+    """
+    This function splits an ssh config (and the files it includes, in place of the `Include` line) into blocks.
+    Options of an included file before its first block belong to the block of the `Include` line,
+    the blocks of the included file only apply if the block of the `Include` line applies (like ssh).
+    :param c: The ssh config object
+    :return: The blocks in the order ssh reads them
+    """
+    files = dict(c.configs_)
+    main_path = c.configs_[0][0]
+    base_path = os.path.dirname(main_path)
+    blocks = [Block("all", "", f"{main_path}:1")]
+
+    def read(path, depth, parent):
+        for lineno, line in enumerate(files[path].lines(), 1):
+            if not (kv := _key_value(line)):
+                continue
+            key, value = kv[0].lower(), kv[1]
+            if key in ("host", "match"):
+                blocks.append(Block(key, value, f"{path}:{lineno}", parent))
+            elif key == "include":
+                outer = blocks[-1]
+                inner_parent = outer if outer.kind != "all" else outer.parent
+                for pattern in value.split():
+                    for include_path in sorted(_resolve_includes(base_path, pattern)):
+                        if include_path not in files and os.path.isfile(include_path):
+                            files[include_path] = read_ssh_config_file(include_path)
+                        if include_path in files and depth < _MAX_INCLUDE_DEPTH:
+                            read(include_path, depth + 1, inner_parent)
+                if blocks[-1] is not outer:
+                    # the rest of the block continues after the included file
+                    blocks.append(Block(outer.kind, outer.value, f"{path}:{lineno}", outer.parent))
+            else:
+                blocks[-1].options.append((key, value, f"{path}:{lineno}"))
+
+    read(main_path, 0, None)
+    return blocks
+
+
+class PatternIndex:
+    """
+    This class is an index of the Host patterns of the blocks, it returns the blocks that can match a host.
+    """
+
+    def __init__(self, blocks: list[Block]):
+        self._literal = defaultdict(set)
+        self._prefix = defaultdict(set)
+        self._suffix = defaultdict(set)
+        self._regex = []
+        self._always = set()
+
+        for i, block in enumerate(blocks):
+            if block.kind != "host":
+                self._always.add(i)
+                continue
+            for pattern in block.patterns():
+                if _is_literal(pattern):
+                    self._literal[pattern].add(i)
+                elif pattern == "*":
+                    self._always.add(i)
+                elif pattern.endswith("*") and _is_literal(pattern[:-1]):
+                    self._prefix[pattern[:-1]].add(i)
+                elif pattern.startswith("*") and _is_literal(pattern[1:]):
+                    self._suffix[pattern[1:]].add(i)
+                else:
+                    self._regex.append((_compile(pattern), i))
+
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefix})
+        self._suffix_lengths = sorted({len(suffix) for suffix in self._suffix})
+
+    def candidates(self, host) -> list[int]:
+        """
+        This function returns the (sorted) indexes of the blocks whose positive patterns match a host,
+        and of the blocks that have to be checked for every host (`Match` blocks and the options outside of blocks).
+        """
+        found = set(self._always)
+        found.update(self._literal.get(host, ()))
+        for length in self._prefix_lengths:
+            if length > len(host):
+                break
+            found.update(self._prefix.get(host[:length], ()))
+        for length in self._suffix_lengths:
+            if length > len(host):
+                break
+            found.update(self._suffix.get(host[len(host) - length:], ()))
+        found.update(i for regex, i in self._regex if regex.fullmatch(host))
+        return sorted(found)
+
+
+class EffectiveConfig:
+    """
+    This class resolves the effective options of hosts. The config is split into blocks and indexed once,
+    so resolving all hosts takes time close to linear in the number of hosts.
+    """
+
+    def __init__(self, c: SshConfig, local_user=None):
+        self.blocks = config_blocks(c)
+        self.index = PatternIndex(self.blocks)
+        self.local_user = local_user or pwd.getpwuid(os.getuid()).pw_name
+
+    def resolve_sources(self, host) -> dict[str, list[tuple[str, str]]]:
+        """
+        This function resolves the effective options of a host together with where each value is defined.
+        :param host: The host name (alias)
+        :return: A dict mapping the (lowercase) option names to a list of (value, source) tuples,
+                 the source is `path:line` or "default"
+        """
+        options = {}
+        for i in self.index.candidates(host):
+            block = self.blocks[i]
+            if not block.matches(host, options, self.local_user, indexed=True):
+                continue
+            for key, value, source in block.options:
+                if key in MULTI_OPTIONS:
+                    options.setdefault(key, []).append((value, source))
+                elif key not in options:
+                    options[key] = [(value, source)]
+
+        if "hostname" in options:
+            options["hostname"] = [(_hostname(host, options), options["hostname"][0][1])]
+        else:
+            options["hostname"] = [(host, _DEFAULT)]
+        options.setdefault("user", [(self.local_user, _DEFAULT)])
+        options.setdefault("port", [("22", _DEFAULT)])
+        return options
+
+    def resolve(self, host) -> dict:
+        """
+        This function resolves the effective options of a host.
+        :param host: The host name (alias)
+        :return: A dict mapping the (lowercase) option names to their value (a list for `MULTI_OPTIONS`)
+        """
+        return {
+            key: [value for value, _ in values] if key in MULTI_OPTIONS else values[0][0]
+            for key, values in self.resolve_sources(host).items()
+        }
+
+
+def resolve_hosts(c: SshConfig, hosts=None) -> dict[str, dict]:
+    """
+    This function resolves the effective options of many hosts.
+    :param c: The ssh config object
+    :param hosts: The host names (default: all hosts of the config)
+    :return: A dict mapping the host names to their effective options (see `EffectiveConfig.resolve`)
+    """
+    effective = EffectiveConfig(c)
+    return {host: effective.resolve(host) for host in (c.hosts() if hosts is None else hosts)}
@@ -0,0 +1,284 @@
+"""
+Rotating the keys of many hosts at once: every host gets a new key pair, which replaces the old key on the host and
+in the ssh config.
+
+The hosts are rotated concurrently (a bounded thread pool, each thread waits for its ssh and ssh-keygen processes).
+Each host goes through these steps, and when a step fails, the steps done so far are undone in reverse order,
+so a host ends up either with its old key or with its new key, never without a working key:
+
+1. generate a new key pair (undo: remove the key files)
+2. install the new public key on the host, connecting with the old key (undo: remove it again)
+3. verify a login with the new key only
+4. remove the old public key from the host, connecting with the new key (undo: install it again)
+
+At the end, the `IdentityFile` of all rotated hosts is swapped in a single write of the ssh config. If that write
+fails, all hosts are rolled back. Old key files that no host uses anymore are removed if they are in the key
+directory (keys elsewhere, e.g. `~/.ssh/id_ed25519`, were not created by ssh-cli and are left alone).
+"""
+import base64
+import os
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, NamedTuple
+
+from .config import KEY_DIR_PATH, KEY_POOL_DIR
+from .keygen import generate_key, identity_files, key_comment, remove_key_files
+from .keys import host_key_files, private_key_public_blob, public_key_blob
+from .mux import ssh_command
+from .sshconfig import SshConfig
+from .store import save_config
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 30.0
+
+_STEPS = ("generate", "install", "verify", "remove old key")
+
+# appends a key to authorized_keys
+_INSTALL = "umask 077 && mkdir -p ~/.ssh && printf '%s\\n' {line} >> ~/.ssh/authorized_keys"
+
+# removes a key from authorized_keys (atomically, and only if the key to keep is still there afterwards)
+_REMOVE = ('f=~/.ssh/authorized_keys && t=$(mktemp "$f.XXXXXX") && '
+           '{{ grep -vF -e {key} "$f" > "$t"; grep -qF -e {keep} "$t"; }} && chmod 600 "$t" && mv -f "$t" "$f" '
+           '|| {{ rm -f "$t"; exit 1; }}')
+
+
+class Rotation(NamedTuple):
+    host: str
+    old_key_file: str
+    old_key: str
+    new_key_file: str
+
+
+class RotationResult(NamedTuple):
+    host: str
+    rotation: Rotation
+    done: tuple[str, ...]
+    error: str | None = None
+
+
+class _StepFailed(Exception):
+    pass
+
+
+def _authorized_key(key_file) -> str | None:
+    """
+    This function returns the public key of a key file as a line of authorized_keys (`<type> <base64 key>`),
+    it is read from the `.pub` file or else from the private key file.
+    """
+    try:
+        blob = public_key_blob(f"{key_file}.pub")
+    except FileNotFoundError:
+        blob = None
+    if blob is None:
+        try:
+            blob = private_key_public_blob(key_file)
+        except FileNotFoundError:
+            return None
+    if blob is None:
+        return None
+    key_type = blob[4:4 + int.from_bytes(blob[:4], "big")].decode(errors="replace")
+    return f"{key_type} {base64.b64encode(blob).decode()}"
+
+
+def _new_key_file(host, stamp) -> str:
+    # e.g. `web1-20240101120000`, or `web1-20240101120000-2` if the host was rotated within the same second
+    base = path = f"{KEY_DIR_PATH}/{host.split()[0]}-{stamp}"
+    n = 1
+    while os.path.exists(path) or os.path.exists(f"{path}.pub"):
+        n += 1
+        path = f"{base}-{n}"
+    return path
+
+
+def _is_managed(key_file) -> bool:
+    # only the key files in the key directory are created by ssh-cli (the pool is managed by keypool.py)
+    path = os.path.realpath(key_file)
+    key_dir, pool_dir = os.path.realpath(KEY_DIR_PATH), os.path.realpath(KEY_POOL_DIR)
+    return path.startswith(key_dir + os.sep) and not path.startswith(pool_dir + os.sep)
+
+
+def plan_rotations(c: SshConfig, hosts) -> tuple[list[Rotation], dict[str, str]]:
+    """
+    This function prepares the rotation of hosts: the current key of every host and the path of its new key.
+    :param c: The ssh config object
+    :param hosts: The host names
+    :return: A tuple of the rotations and a dict mapping the hosts that can't be rotated to the reason
+    """
+    key_files = host_key_files(c, hosts)
+    stamp = time.strftime("%Y%m%d%H%M%S")
+    rotations, errors = [], {}
+    for host in hosts:
+        if (key_file := key_files.get(host)) is None:
+            errors[host] = "no IdentityFile"
+        elif (old_key := _authorized_key(key_file)) is None:
+            errors[host] = f"the public key of `{key_file}` can't be read"
+        else:
+            rotations.append(Rotation(host, key_file, old_key, _new_key_file(host, stamp)))
+    return rotations, errors
+
+
+def _ssh(rotation: Rotation, command, timeout, new_key=False, verbose=False) -> subprocess.CompletedProcess:
+    """
+    This function runs a remote command on a host, with the ssh config of the host (and its current key) or
+    with the new key only.
+    """
+    target = rotation.host.split()[0]
+    if new_key:
+        # no master connection (it was authenticated with the old key) and no other keys (e.g. from the agent)
+        ssh = ["ssh", "-o", "ControlPath=none", "-o", "IdentitiesOnly=yes", "-o", "IdentityAgent=none",
+               "-i", rotation.new_key_file, *(["-v"] if verbose else []), target]
+    else:
+        ssh = ssh_command(target, master=False)
+    *ssh, target = ssh
+    try:
+        return subprocess.run([*ssh, "-o", "BatchMode=yes", "-T", target, command], stdin=subprocess.DEVNULL,
+                              capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise _StepFailed("timed out")
+    except OSError as e:
+        raise _StepFailed(e.strerror or str(e))
+
+
+def _check(result: subprocess.CompletedProcess):
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if not line.startswith("debug")]
+        raise _StepFailed(lines[-1] if lines else f"exited with {result.returncode}")
+
+
+def _new_key(rotation: Rotation) -> str:
+    with open(f"{rotation.new_key_file}.pub") as file:
+        return file.read().strip()
+
+
+def _remove_command(key, keep) -> str:
+    # the keys are matched by their base64 part (the type, options and comment may differ)
+    return _REMOVE.format(key=shlex.quote(key.split()[1]), keep=shlex.quote(keep.split()[1]))
+
+
+def _run_step(rotation: Rotation, step, timeout):
+    if step == "generate":
+        if error := generate_key(rotation.new_key_file, key_comment(rotation.host.split()[0])):
+            raise _StepFailed(error)
+    elif step == "install":
+        _check(_ssh(rotation, _INSTALL.format(line=shlex.quote(_new_key(rotation))), timeout))
+    elif step == "verify":
+        result = _ssh(rotation, "true", timeout, new_key=True, verbose=True)
+        _check(result)
+        # ssh falls back to other authentication methods (e.g. a password prompt is refused in batch mode,
+        # but host based authentication is not), so make sure that the new key was accepted
+        if f"Server accepts key: {rotation.new_key_file}" not in result.stderr:
+            raise _StepFailed("the host didn't accept the new key")
+    elif step == "remove old key":
+        _check(_ssh(rotation, _remove_command(rotation.old_key, _new_key(rotation)), timeout, new_key=True))
+
+
+def _undo_step(rotation: Rotation, step, timeout):
+    if step == "generate":
+        remove_key_files([rotation.new_key_file])
+    elif step == "install":
+        _check(_ssh(rotation, _remove_command(_new_key(rotation), rotation.old_key), timeout))
+    elif step == "remove old key":
+        _check(_ssh(rotation, _INSTALL.format(line=shlex.quote(rotation.old_key)), timeout, new_key=True))
+
+
+def rollback(result: RotationResult, timeout=DEFAULT_TIMEOUT) -> str | None:
+    """
+    This function undoes the steps done for a host, in reverse order.
+    :param result: The result of the rotation of the host
+    :param timeout: The timeout of each ssh command in seconds
+    :return: None if everything was undone, the error otherwise (the host may need to be fixed by hand)
+    """
+    for step in reversed(result.done):
+        try:
+            _undo_step(result.rotation, step, timeout)
+        except (_StepFailed, OSError) as e:
+            return f"undo {step}: {e}"
+    return None
+
+
+def _rollback_all(results, timeout, concurrency) -> dict[str, str]:
+    """
+    This function rolls back many hosts concurrently.
+    :return: A dict mapping the hosts that could not be rolled back to the error
+    """
+    with ThreadPoolExecutor(max_workers=concurrency or DEFAULT_CONCURRENCY) as executor:
+        errors = executor.map(lambda result: rollback(result, timeout), results)
+        return {result.host: error for result, error in zip(results, errors) if error}
+
+
+def _rotate(rotation: Rotation, timeout) -> RotationResult:
+    done = []
+    for step in _STEPS:
+        try:
+            _run_step(rotation, step, timeout)
+        except (_StepFailed, OSError) as e:
+            failed = RotationResult(rotation.host, rotation, tuple(done), f"{step}: {e}")
+            if error := rollback(failed, timeout):
+                return failed._replace(error=f"{failed.error} (rollback failed: {error})")
+            return failed._replace(done=())
+        if step != "verify":
+            done.append(step)
+    return RotationResult(rotation.host, rotation, tuple(done))
+
+
+def rotate_keys(c: SshConfig, rotations: list[Rotation], concurrency=None, timeout=None,
+                on_result: Callable[[RotationResult], None] = None,
+                on_unused_key: Callable[[str], None] = None) -> list[RotationResult]:
+    """
+    This function rotates the keys of many hosts concurrently and swaps their `IdentityFile` in one write of the
+    ssh config. A host whose rotation fails is rolled back (and keeps its old key), the other hosts are rotated.
+    If the process is interrupted or the config can't be written, all hosts are rolled back.
+    :param c: The ssh config object
+    :param rotations: The rotations (see `plan_rotations`)
+    :param concurrency: The maximum number of hosts rotated at once (default: DEFAULT_CONCURRENCY)
+    :param timeout: The timeout of each ssh command in seconds (default: DEFAULT_TIMEOUT)
+    :param on_result: A function called when a host is done
+    :param on_unused_key: A function called with each old key file that is no longer used but kept, because it is
+        not in the key directory
+    :return: The results in the order the hosts finished
+    """
+    timeout = timeout or DEFAULT_TIMEOUT
+    results = []
+
+    with ThreadPoolExecutor(max_workers=concurrency or DEFAULT_CONCURRENCY) as executor:
+        futures = [executor.submit(_rotate, rotation, timeout) for rotation in rotations]
+        try:
+            for future in as_completed(futures):
+                results.append(result := future.result())
+                if on_result:
+                    on_result(result)
+        except BaseException:
+            # e.g. KeyboardInterrupt: don't start new hosts and roll back every host that was rotated
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            _rollback_all([result for future in futures if not future.cancelled() and future.exception() is None
+                           and (result := future.result()).error is None], timeout, concurrency)
+            raise
+
+    rotated = [result for result in results if result.error is None]
+    if not rotated:
+        return results
+    try:
+        for result in rotated:
+            # the first IdentityFile is the key that was rotated, others are kept
+            values = c.host(result.host).get("identityfile")
+            values = values if isinstance(values, list) else [values]
+            c.set(result.host, IdentityFile=[result.rotation.new_key_file, *values[1:]])
+        save_config(c)
+    except BaseException:
+        _rollback_all(rotated, timeout, concurrency)
+        raise
+
+    # the old key files are removed unless another host still uses them or ssh-cli didn't create them
+    used = identity_files(c)
+    unused = {result.rotation.old_key_file for result in rotated
+              if os.path.realpath(result.rotation.old_key_file) not in used}
+    remove_key_files({key_file for key_file in unused if _is_managed(key_file)})
+    if on_unused_key:
+        for key_file in sorted(unused):
+            if not _is_managed(key_file):
+                on_unused_key(key_file)
+    return results
@@ -0,0 +1,245 @@
+import copy
+import heapq
+import re
+import weakref
+from array import array
+from collections import defaultdict
+
+from .index import host_options
+from .sshconfig import SshConfig
+from .store import load_derived, save_derived
+
+_TOKEN_SEPARATORS = re.compile(r"[\s.\-_@:]+")
+
+_cache = weakref.WeakKeyDictionary()
+
+# the most hosts that are scored to find typos in a term (see `HostSearchIndex._fallback`)
+_MAX_TYPO_CANDIDATES = 5000
+
+
+def _trigrams(text) -> set[str]:
+    """
+    This function returns all trigrams (substrings of length 3) of a text.
+    :param text: The text
+    :return: The set of trigrams
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _subsequence_score(query, text) -> int:
+    """
+    This function scores how well the characters of a query appear in order in a text (0 = no match).
+    Consecutive characters and matches at the start of the text score higher.
+    :param query: The (case-folded) query
+    :param text: The (case-folded) text
+    :return: The score
+    """
+    score, pos, streak = 0, 0, 0
+    for char in query:
+        found = text.find(char, pos)
+        if found < 0:
+            return 0
+        streak = streak + 1 if found == pos else 0
+        score += 1 + streak * 2 + (3 if found == 0 else 0)
+        pos = found + 1
+    return score
+
+
+def _substring_score(query, field, pos) -> int:
+    """
+    This function scores a field (alias, hostname or user) that contains the query.
+    Exact matches score highest, then prefixes, then matches close to the start of short fields.
+    :param query: The (case-folded) query
+    :param field: The (case-folded) field
+    :param pos: The position of the query in the field
+    :return: The score
+    """
+    if pos == 0:
+        return 1000 if len(field) == len(query) else 800 - len(field)
+    return 600 - pos - len(field)
+
+
+class HostSearchIndex:
+    """
+    This class is a fuzzy search index over the alias, hostname and user of all hosts.
+    Short queries are answered from a prefix index, longer ones from a trigram index, so a query only scores
+    hosts that share a prefix or trigrams with it instead of the whole host list.
+    """
+
+    def __init__(self, hosts, details=None):
+        """
+        :param hosts: The host names, in the order they are shown for an empty query
+        :param details: A dict mapping host names to a (hostname, user) tuple
+        """
+        details = details or {}
+        self.hosts = list(hosts)
+        self.details = [details.get(host, (None, None)) for host in self.hosts]
+        # the ids of the hosts are their positions in `_names`, `_rank` maps them to the display order
+        self._names = self.hosts
+        self._rank = range(len(self.hosts))
+        self._fields = []
+        prefixes = defaultdict(list)
+        trigrams = defaultdict(list)
+
+        for i, (host, (hostname, user)) in enumerate(zip(self.hosts, self.details)):
+            fields = (host.casefold(), hostname.casefold() if hostname else "", user.casefold() if user else "")
+            self._fields.append(fields)
+            host_prefixes, host_trigrams = set(), set()
+            for field in fields:
+                for token in _TOKEN_SEPARATORS.split(field):
+                    host_prefixes.update((token[:1], token[:2]))
+                host_trigrams.update(_trigrams(field))
+            for prefix in host_prefixes:
+                prefixes[prefix].append(i)
+            for trigram in host_trigrams:
+                trigrams[trigram].append(i)
+
+        # posting lists are stored as compact arrays (cheap to cache on disk) and turned into sets on first use
+        self._prefixes = {prefix: array("I", ids) for prefix, ids in prefixes.items()}
+        self._trigrams = {trigram: array("I", ids) for trigram, ids in trigrams.items()}
+        self._sets = {}
+
+    def __getstate__(self):
+        return {**self.__dict__, "_sets": {}}
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def ordered(self, hosts) -> "HostSearchIndex":
+        """
+        This function returns the index with the hosts in another display order (e.g. by frecency), which is used for
+        an empty query and to break ties between equal scores. The posting lists are shared, so this is cheap compared
+        to building a new index.
+        :param hosts: The host names in display order, hosts of the index that are missing follow sorted by name
+        :return: The reordered index
+        """
+        position = {host: i for i, host in enumerate(hosts)}
+        missing = len(position)
+        order = sorted(range(len(self._names)), key=lambda i: (position.get(self._names[i], missing), i))
+        rank = array("I", [0]) * len(order)
+        for display, i in enumerate(order):
+            rank[i] = display
+
+        index = copy.copy(self)
+        index.hosts = [self._names[i] for i in order]
+        index.details = [self.details[self._rank[i]] for i in order]
+        index._rank = rank
+        return index
+
+    def _posting(self, kind, key) -> set[int]:
+        """
+        This function returns a posting list of the prefix or trigram index as a set.
+        :param kind: Either "prefix" or "trigram"
+        :param key: The prefix or trigram
+        :return: The set of host ids
+        """
+        if (ids := self._sets.get((kind, key))) is None:
+            postings = self._prefixes if kind == "prefix" else self._trigrams
+            ids = self._sets[(kind, key)] = set(postings.get(key, ()))
+        return ids
+
+    def _candidates(self, term, limit) -> set[int]:
+        """
+        This function returns the ids of all hosts that could match a query term.
+        Longer terms are looked up in the trigram index. Hosts containing all trigrams of the term come first,
+        if there are not enough of them, hosts sharing at least half of the trigrams are used (tolerating typos).
+        :param term: The (case-folded) query term
+        :param limit: The number of results that are needed
+        :return: The set of host ids
+        """
+        if len(term) < 3:
+            return self._posting("prefix", term)
+
+        postings = sorted((self._posting("trigram", trigram) for trigram in _trigrams(term)), key=len)
+        if len(candidates := postings[0].intersection(*postings[1:])) >= (limit or 1):
+            return candidates
+
+        # a host in `required` of n lists must be in at least one of the n - required + 1 smallest ones
+        required = (len(postings) + 1) // 2
+        candidates = set().union(*postings[:len(postings) - required + 1])
+        if required <= 1:
+            return candidates
+        return {i for i in candidates if sum(i in posting for posting in postings) >= required}
+
+    def _fallback(self, terms, candidates):
+        """
+        This function adds the hosts that the indexes can't find to too few candidates: matches in the middle of
+        a word (e.g. `eb`) and typos (e.g. `wb1`). For a query of terms with one or two characters, all hosts are
+        scored (a match of so few characters can't be narrowed down). Otherwise, the hosts with a word starting
+        like every longer term are scored (typos are rare in the first character), unless there are too many.
+        :param terms: The (case-folded) query terms
+        :param candidates: The ids of the hosts found by the indexes
+        :return: The ids of the hosts to score
+        """
+        long_terms = [term for term in terms if len(term) > 2]
+        if not long_terms:
+            return range(len(self._names))
+        typos = set.intersection(*(self._posting("prefix", term[:1]) for term in long_terms))
+        if len(typos) > _MAX_TYPO_CANDIDATES:
+            return candidates
+        return candidates | typos
+
+    def search(self, query, limit=None) -> list[str]:
+        """
+        This function returns the hosts matching a query, best matches first.
+        Every whitespace separated term of the query must match the alias, hostname or user.
+        Matches in the alias rank above matches in the hostname or user.
+        :param query: The query
+        :param limit: The maximum number of hosts to return (default: all)
+        :return: The list of host names
+        """
+        if not (terms := query.casefold().split()):
+            return self.hosts[:limit]
+
+        candidates = set.intersection(*(self._candidates(term, limit) for term in terms))
+        if len(candidates) < (limit or 1):
+            candidates = self._fallback(terms, candidates)
+
+        scored = []
+        fields, rank = self._fields, self._rank
+        for i in candidates:
+            alias, hostname, user = fields[i]
+            total = 0
+            for term in terms:
+                # this loop runs for every candidate of broad queries, so it avoids any work beyond `find`
+                if (pos := alias.find(term)) >= 0:
+                    score = 2 * _substring_score(term, alias, pos)
+                elif (pos := hostname.find(term)) >= 0:
+                    score = _substring_score(term, hostname, pos)
+                elif (pos := user.find(term)) >= 0:
+                    score = _substring_score(term, user, pos)
+                elif not (score := max(_subsequence_score(term, alias) * 2, _subsequence_score(term, hostname),
+                                       _subsequence_score(term, user))):
+                    break
+                total += score
+            else:
+                # ties are broken by the display order, hence the negative rank
+                scored.append((total, -rank[i]))
+
+        best = heapq.nlargest(limit, scored) if limit else sorted(scored, reverse=True)
+        return [self.hosts[-negative_rank] for _, negative_rank in best]
+
+
+def search_index(c: SshConfig, hosts=None) -> HostSearchIndex:
+    """
+    This function returns the search index for a config.
+    It is built once per config version (over the sorted host names): it is kept in memory for the config object and
+    cached on disk until the ssh config file changes. Another display order (e.g. by frecency, which changes with
+    every connect) is applied to the cached index, see `HostSearchIndex.ordered`.
+    :param c: The ssh config object
+    :param hosts: The host names in display order (default: sorted host names)
+    :return: The search index
+    """
+    if (index := _cache.get(c)) is None:
+        names = sorted(c.hosts())
+        if (index := load_derived("search")) is None or index.hosts != names:
+            options = host_options(c, "hostname", "user")
+            index = HostSearchIndex(names, {
+                host: (options.get(host, {}).get("hostname"), options.get(host, {}).get("user")) for host in names
+            })
+            save_derived("search", c, index)
+        _cache[c] = index
+
+    if hosts is not None and (hosts := list(hosts)) != index.hosts:
+        return index.ordered(hosts)
+    return index
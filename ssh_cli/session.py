@@ -0,0 +1,70 @@
+import os
+
+from . import store
+from .index import HostIndex
+from .sshconfig import SshConfig
+from .watch import FileWatcher
+
+
+class Session:
+    """
+    This class holds the parsed ssh config and its host index for a long-lived process (the interactive shell).
+    The config is only loaded again when one of its files changed on disk (e.g. after a host was saved or the file
+    was edited), which is noticed with a `FileWatcher`.
+    """
+
+    def __init__(self, path=None, use_inotify=True):
+        """
+        :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+        :param use_inotify: Whether to watch the files with inotify (if available) instead of comparing `os.stat`
+        """
+        self.path = path
+        self.loads = 0
+        self._use_inotify = use_inotify
+        self._config = None
+        self._index = None
+        self._watcher = None
+
+    def _load(self):
+        # the files are watched before they are read, so that no change in between is missed
+        if self._watcher is None:
+            self._watcher = FileWatcher([os.path.abspath(self.path or store.CONFIG_FILE_PATH)], self._use_inotify)
+        c = store.load_config(self.path)
+        paths = [path for path, _ in c.configs_]
+        # a file added to the directory of an `Include` pattern is a change of the config too
+        directories = list(dict.fromkeys(directory for directory, key in getattr(c, "include_dirs_", ())
+                                         if key is not None))
+        if paths != self._watcher.paths or directories != self._watcher.directories:
+            self._watcher.close()
+            self._watcher = FileWatcher(paths, self._use_inotify, directories)
+        self._config, self._index = c, None
+        self.loads += 1
+
+    @property
+    def config(self) -> SshConfig:
+        """
+        The ssh config object, loaded again if a file of the config changed on disk.
+        """
+        if self._config is None or self._watcher.changed():
+            self._load()
+        return self._config
+
+    @property
+    def index(self) -> HostIndex:
+        """
+        The host index of the current config (the commands keep it up to date with their changes).
+        """
+        c = self.config
+        if self._index is None:
+            self._index = HostIndex(c)
+        return self._index
+
+    def invalidate(self):
+        """
+        This function drops the config (and index), it is loaded again when it is used next.
+        """
+        self._config, self._index = None, None
+
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.close()
@@ -0,0 +1,502 @@
+"""
+A streaming ssh config parser that keeps comments and formatting (for round-trips).
+
+The API follows the `sshconf` library (`read_ssh_config`, `SshConfig.host`, `add`, `set`, `remove`, ...),
+but instead of one object per line, every Host block is stored as a compact `HostRecord` holding its raw lines and
+the keys and values of its options. Lines outside of Host blocks are kept as plain strings.
+"""
+import gc
+import glob
+import os
+import re
+import sys
+from collections import Counter
+
+# taken from "man ssh_config", used to write new options with the usual casing
+KNOWN_PARAMS = (
+    "AddKeysToAgent", "AddressFamily", "BatchMode", "BindAddress", "CanonicalDomains", "CanonicalizeFallbackLocal",
+    "CanonicalizeHostname", "CanonicalizeMaxDots", "CanonicalizePermittedCNAMEs", "CertificateFile",
+    "ChallengeResponseAuthentication", "CheckHostIP", "Cipher", "Ciphers", "ClearAllForwardings", "Compression",
+    "CompressionLevel", "ConnectionAttempts", "ConnectTimeout", "ControlMaster", "ControlPath", "ControlPersist",
+    "DynamicForward", "EscapeChar", "ExitOnForwardFailure", "FingerprintHash", "ForwardAgent", "ForwardX11",
+    "ForwardX11Timeout", "ForwardX11Trusted", "GatewayPorts", "GlobalKnownHostsFile", "GSSAPIAuthentication",
+    "GSSAPIKeyExchange", "GSSAPIClientIdentity", "GSSAPIDelegateCredentials", "GSSAPIRenewalForcesRekey",
+    "GSSAPITrustDns", "GSSAPIKexAlgorithms", "HashKnownHosts", "Host", "HostbasedAuthentication", "HostbasedKeyTypes",
+    "HostKeyAlgorithms", "HostKeyAlias", "HostName", "IdentitiesOnly", "IdentityAgent", "IdentityFile", "Include",
+    "IPQoS", "KbdInteractiveAuthentication", "KbdInteractiveDevices", "KexAlgorithms", "LocalCommand", "LocalForward",
+    "LogLevel", "MACs", "Match", "NoHostAuthenticationForLocalhost", "NumberOfPasswordPrompts",
+    "PasswordAuthentication", "PermitLocalCommand", "PKCS11Provider", "Port", "PreferredAuthentications", "Protocol",
+    "ProxyCommand", "ProxyJump", "ProxyUseFdpass", "PubkeyAcceptedKeyTypes", "PubkeyAuthentication", "RekeyLimit",
+    "RemoteForward", "RequestTTY", "RhostsRSAAuthentication", "RSAAuthentication", "SendEnv", "ServerAliveInterval",
+    "ServerAliveCountMax", "StreamLocalBindMask", "StreamLocalBindUnlink", "StrictHostKeyChecking", "TCPKeepAlive",
+    "Tunnel", "TunnelDevice", "UpdateHostKeys", "UsePrivilegedPort", "User", "UserKnownHostsFile", "VerifyHostKeyDNS",
+    "VisualHostKey", "XAuthLocation",
+)
+
+_KNOWN_KEYS = {param.lower(): param for param in KNOWN_PARAMS}
+
+# the maximum nesting of `Include`, like ssh
+_MAX_INCLUDE_DEPTH = 16
+
+_OPTION = re.compile(r"([^\s=]+)\s*(?:=\s*|\s+)(.*)")
+_COMMENT = re.compile(r"(?:^|\s+)#.*")
+
+
+def _key_value(line) -> tuple[str, str] | None:
+    """
+    This function splits a line into key and value like ssh: `Key Value` and `Key=Value` are both valid, a `#` at the
+    start of a word begins a comment and double quotes around the value are removed.
+    :return: A tuple of key and value or None if the line has no value (e.g. a blank or comment line)
+    """
+    line = line.strip()
+    if not line or line.startswith("#") or not (m := _OPTION.fullmatch(line)):
+        return None
+    if not (value := _COMMENT.sub("", m.group(2))):
+        return None
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    return m.group(1), value
+
+
+def _remap_key(key) -> str:
+    """
+    This function changes a key into its usual casing, if it is a known option.
+    """
+    return _KNOWN_KEYS.get(key.lower(), key)
+
+
+class HostRecord:
+    """
+    This class holds a Host block: its raw lines (from the `Host` line to its last option)
+    and the (lowercase) keys and values of its options.
+    """
+
+    __slots__ = ("name", "lines", "keys", "values")
+
+    def __init__(self, name, lines, keys=None, values=None):
+        self.name = name
+        self.lines = lines
+        if keys is None:
+            keys, values = [], []
+            for line in lines[1:]:
+                if kv := _key_value(line):
+                    keys.append(sys.intern(kv[0].lower()))
+                    values.append(kv[1])
+        self.keys = keys
+        self.values = values
+
+    def __repr__(self):
+        return f"HostRecord({self.name!r}, {len(self.keys)} options)"
+
+    def get(self, key, default=None):
+        """
+        This function returns the first value of an option (like ssh, which uses the first value it finds).
+        :param key: The lowercase option name
+        :param default: The value if the host doesn't set the option
+        """
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return default
+
+    def options(self) -> dict:
+        """
+        This function returns the options as a dict (lowercase keys), options given more than once map to a list.
+        """
+        options = {}
+        for key, value in zip(self.keys, self.values):
+            if key == "host":
+                continue
+            if key not in options:
+                options[key] = value
+            elif isinstance(options[key], list):
+                options[key].append(value)
+            else:
+                options[key] = [options[key], value]
+        return options
+
+
+class SshConfigFile:
+    """
+    This class holds a parsed ssh config file: a list of Host records and the lines in between (as strings).
+    """
+
+    __slots__ = ("items", "index", "duplicates", "indent")
+
+    def __init__(self, lines=()):
+        """
+        :param lines: The lines of the file (an iterable, e.g. an open file, is read once)
+        """
+        self.items = []
+        self.index = {}
+        self.duplicates = set()
+
+        indents = Counter()
+        record, tail = None, []
+        intern = sys.intern
+
+        # the parser creates many small objects that are never garbage, skip the cyclic gc runs meanwhile
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for line in lines:
+                line = line.rstrip("\r\n")
+                kv = line.split(None, 1)
+                if "=" in line or '"' in line or "#" in line:
+                    # the common `Key Value` lines are split without a regex
+                    kv = _key_value(line)
+                if not kv or len(kv) < 2:
+                    # blank lines and comments belong to a Host block only if an option follows them
+                    (tail if record is not None else self.items).append(line)
+                    continue
+                key = intern(kv[0].lower())
+                if key == "host":
+                    self._append(record, tail)
+                    record, tail = HostRecord(kv[1].rstrip(), [line], [], []), []
+                    continue
+                indents[line[:len(line) - len(line.lstrip())]] += 1
+                if record is None:
+                    self.items.append(line)
+                    continue
+                if tail:
+                    record.lines.extend(tail)
+                    tail = []
+                record.lines.append(line)
+                record.keys.append(key)
+                record.values.append(kv[1].rstrip())
+            self._append(record, tail)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        # use the most common indent for new options, default '  '
+        self.indent = indents.most_common(1)[0][0] if indents else "  "
+
+    def _append(self, record, tail):
+        if record is not None:
+            self.items.append(record)
+            self._index_record(record)
+            self.items.extend(tail)
+
+    def _index_record(self, record):
+        if record.name in self.index:
+            self.duplicates.add(record.name)
+        else:
+            self.index[record.name] = record
+
+    def records(self):
+        """
+        This function iterates over the Host records in the order of the file.
+        """
+        return (item for item in self.items if isinstance(item, HostRecord))
+
+    def _records_of(self, host) -> list[HostRecord]:
+        # usually a host has a single block, the options of duplicate blocks are merged
+        if host in self.duplicates:
+            return [record for record in self.records() if record.name == host]
+        return [self.index[host]] if host in self.index else []
+
+    def _reindex(self):
+        self.index, self.duplicates = {}, set()
+        for record in self.records():
+            self._index_record(record)
+
+    @property
+    def hosts_(self) -> list[str]:
+        return [record.name for record in self.records()]
+
+    def hosts(self) -> tuple:
+        """
+        This function returns the hosts in the file (including patterns like "*").
+        """
+        return tuple(self.hosts_)
+
+    def host(self, host) -> dict:
+        """
+        This function returns the options of a host as a dict (lowercase keys), an empty dict for an unknown host.
+        """
+        records = self._records_of(host)
+        if len(records) == 1:
+            return records[0].options()
+        merged = HostRecord(host, [], [k for r in records for k in r.keys], [v for r in records for v in r.values])
+        return merged.options()
+
+    def _new_line(self, key, value) -> str:
+        return f"{self.indent}{key} {value}"
+
+    def _check(self, host, keys):
+        if host not in self.index:
+            raise ValueError(f"Host {host}: not found")
+        if "host" in [key.lower() for key in keys]:
+            raise ValueError("Cannot modify Host value")
+
+    def set(self, host, **kwargs):
+        """
+        This function sets options of an existing host, existing values are overwritten.
+        """
+        self._check(host, kwargs)
+        record = self.index[host]
+        for key, values in kwargs.items():
+            values = list(values) if isinstance(values, (list, tuple)) else [values]
+            lower_key = key.lower()
+            lines, last = [record.lines[0]], 0
+            for line in record.lines[1:]:
+                kv = _key_value(line)
+                if kv and kv[0].lower() == lower_key:
+                    if not values:
+                        continue
+                    line = self._new_line(kv[0], values.pop(0))
+                lines.append(line)
+                if kv:
+                    last = len(lines) - 1
+            new_lines = [self._new_line(_remap_key(key), value) for value in values]
+            record.lines = lines[:last + 1] + new_lines + lines[last + 1:]
+            record.__init__(host, record.lines)
+
+    def unset(self, host, *args):
+        """
+        This function removes options of a host.
+        """
+        self._check(host, args)
+        record = self.index[host]
+        record.__init__(host, [record.lines[0]] + [
+            line for line in record.lines[1:] if not ((kv := _key_value(line)) and kv[0].lower() in args)
+        ])
+
+    def rename(self, old_host, new_host):
+        """
+        This function renames a host.
+        """
+        if new_host in self.index:
+            raise ValueError(f"Host {new_host}: already exists.")
+        for record in self._records_of(old_host):
+            record.name = new_host
+            record.lines[0] = f"Host {new_host}"
+        self._reindex()
+
+    def add(self, host, before_host=None, **kwargs):
+        """
+        This function adds a host with the given options.
+        :param host: The host name
+        :param before_host: The host to insert the new host before (default: append it)
+        :param kwargs: The options of the host
+        """
+        if host in self.index:
+            raise ValueError(f"Host {host}: exists (use update).")
+        if before_host is not None and before_host not in self.index:
+            raise ValueError(f"Host {host}: not found, cannot insert before it.")
+
+        lines = [f"Host {host}"]
+        for key, values in kwargs.items():
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                lines.append(self._new_line(_remap_key(key), value))
+        new_items = ["", HostRecord(host, lines), ""]
+
+        if before_host is None:
+            self.items.extend(new_items)
+        else:
+            # insert before the lines (e.g. comments) that precede the block of `before_host`
+            i = next(i for i, item in enumerate(self.items) if item is self.index[before_host])
+            while i > 0 and not isinstance(self.items[i - 1], HostRecord):
+                i -= 1
+            self.items[i:i] = new_items
+        self.index[host] = new_items[1]
+
+    def remove(self, host):
+        """
+        This function removes a host.
+        """
+        if host not in self.index:
+            raise ValueError(f"Host {host}: not found.")
+        self.items = [item for item in self.items if not (isinstance(item, HostRecord) and item.name == host)]
+        del self.index[host]
+        self.duplicates.discard(host)
+
+    def splice(self, records: dict, removed=()):
+        """
+        This function replaces the blocks of hosts in place (hosts that are not in the file are appended) and removes
+        hosts, in a single pass. A blank line left behind by a removed host is dropped as well.
+        :param records: A dict mapping host names to their new record
+        :param removed: The hosts to remove
+        """
+        records, removed = dict(records), set(removed)
+        items, skip_blank = [], False
+        for item in self.items:
+            if isinstance(item, HostRecord) and (item.name in removed or item.name in records):
+                if item.name in records:
+                    items.append(records.pop(item.name))
+                skip_blank = item.name in removed and bool(items) and items[-1] == ""
+                continue
+            if skip_blank and item == "":
+                skip_blank = False
+                continue
+            skip_blank = False
+            items.append(item)
+
+        for record in records.values():
+            if items and items[-1] != "":
+                items.append("")
+            items.extend([record, ""])
+
+        self.items = items
+        self._reindex()
+
+    def lines(self):
+        """
+        This function iterates over the lines of the file.
+        """
+        for item in self.items:
+            if isinstance(item, HostRecord):
+                yield from item.lines
+            else:
+                yield item
+
+    def config(self, filter_includes=False) -> str:
+        """
+        This function returns the content of the file.
+        :param filter_includes: Whether to leave out `Include` lines
+        """
+        lines = self.lines()
+        if filter_includes:
+            lines = (line for line in lines if not ((kv := _key_value(line)) and kv[0].lower() == "include"))
+        return "\n".join(lines)
+
+    def write(self, path):
+        with open(path, "w") as file:
+            file.write(self.config())
+
+
+def read_ssh_config_file(path) -> SshConfigFile:
+    """
+    This function reads an ssh config file, the file is streamed (not loaded completely).
+    :param path: The path of the file
+    :return: The config file object
+    """
+    with open(path) as file:
+        return SshConfigFile(file)
+
+
+def _resolve_includes(base_path, pattern) -> list[str]:
+    pattern = os.path.join(base_path, os.path.expanduser(pattern))
+    directory, name = os.path.split(pattern)
+    if name == "*" and not glob.has_magic(directory):
+        # the usual `Include config.d/*` lists the directory (like glob, without hidden files)
+        try:
+            return [os.path.join(directory, entry) for entry in os.listdir(directory) if not entry.startswith(".")]
+        except OSError:
+            return []
+    return glob.glob(pattern)
+
+
+def _includes(config_file: SshConfigFile) -> list[str]:
+    """
+    This function returns the patterns of the `Include` lines of a file (in Host blocks too).
+    """
+    includes = []
+    for item in config_file.items:
+        if isinstance(item, HostRecord):
+            if "include" in item.keys:
+                includes.extend(value for key, value in zip(item.keys, item.values) if key == "include")
+        elif (kv := _key_value(item)) and kv[0].lower() == "include":
+            includes.append(kv[1])
+    return includes
+
+
+def read_ssh_config(path, read_file=read_ssh_config_file, resolve_includes=_resolve_includes) -> "SshConfig":
+    """
+    This function reads an ssh config file and the files it includes (`Include`), in the order ssh reads them.
+    Like ssh, the nesting of `Include` is limited, and a file is only read once (so includes can't loop).
+    :param path: The path of the ssh config file
+    :param read_file: The function that reads a file (e.g. to reuse files parsed before)
+    :param resolve_includes: The function that returns the paths of an `Include` pattern
+    :return: The ssh config object
+    """
+    base_path = os.path.dirname(path)
+    configs, seen = [], set()
+
+    def read(file_path, depth):
+        seen.add(os.path.normpath(file_path))
+        configs.append((file_path, config_file := read_file(file_path)))
+        if depth >= _MAX_INCLUDE_DEPTH:
+            return
+        for include in _includes(config_file):
+            # ssh reads the matches of a pattern in sorted order
+            for include_path in sorted(resolve_includes(base_path, include)):
+                if os.path.normpath(include_path) not in seen:
+                    read(include_path, depth + 1)
+
+    read(path, 0)
+    return SshConfig(configs)
+
+
+class SshConfig:
+    """
+    This class holds an ssh config file and the files it includes.
+    New hosts are added to the first (main) file, changes apply to the file that defines the host.
+    """
+
+    def __init__(self, configs):
+        """
+        :param configs: A list of (path, SshConfigFile) tuples, the main file first
+        """
+        self.configs_ = configs
+
+    def _file_of(self, host) -> SshConfigFile | None:
+        for _, config_file in self.configs_:
+            if host in config_file.index:
+                return config_file
+        return None
+
+    def records(self):
+        """
+        This function iterates over the Host records of all files.
+        """
+        for _, config_file in self.configs_:
+            yield from config_file.records()
+
+    def hosts(self) -> tuple:
+        """
+        This function returns the hosts of all files (including patterns like "*").
+        """
+        return tuple(host for _, config_file in self.configs_ for host in config_file.hosts_)
+
+    def host(self, host) -> dict:
+        """
+        This function returns the options of a host as a dict (lowercase keys), an empty dict for an unknown host.
+        """
+        config_file = self._file_of(host)
+        return config_file.host(host) if config_file is not None else {}
+
+    def set(self, host, **kwargs):
+        if (config_file := self._file_of(host)) is None:
+            raise ValueError(f"Host {host}: not found")
+        config_file.set(host, **kwargs)
+
+    def unset(self, host, *args):
+        if (config_file := self._file_of(host)) is None:
+            raise ValueError(f"Host {host}: not found")
+        config_file.unset(host, *args)
+
+    def rename(self, old_host, new_host):
+        if self._file_of(new_host) is not None:
+            raise ValueError(f"Host {new_host}: already exists.")
+        if (config_file := self._file_of(old_host)) is not None:
+            config_file.rename(old_host, new_host)
+
+    def add(self, host, before_host=None, **kwargs):
+        self.configs_[0][1].add(host, before_host=before_host, **kwargs)
+
+    def remove(self, host):
+        if (config_file := self._file_of(host)) is None:
+            raise ValueError(f"Host {host}: not found")
+        config_file.remove(host)
+
+    def config(self) -> str:
+        """
+        This function returns the content of all files as one config (without the `Include` lines).
+        """
+        return "\n".join(config_file.config(True) for _, config_file in self.configs_)
+
+    def write(self, path):
+        with open(path, "w") as file:
+            file.write(self.config())
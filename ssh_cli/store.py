@@ -0,0 +1,520 @@
+import fcntl
+import gc
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import CONFIG_FILE_PATH, CONFIG_DIR, CACHE_DIR
+from .index import is_pattern
+from .sshconfig import read_ssh_config, read_ssh_config_file, SshConfig, SshConfigFile, _key_value, _resolve_includes
+from .trace import span
+
+# bumped when the format of the cached values changes, caches of other versions are ignored
+_CACHE_VERSION = 4
+
+
+def _file_key(path) -> tuple:
+    """
+    This function returns the identity of a file, used to decide if a cached parse is still valid.
+    :param path: The path of the file
+    :return: A tuple of (size, mtime_ns, inode)
+    """
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _dir_key(directory) -> tuple | None:
+    """
+    This function returns the identity of a directory searched by an `Include` pattern, it changes when a file is
+    added to or removed from the directory.
+    :param directory: The path of the directory
+    :return: A tuple of (mtime_ns, inode) or None if the directory doesn't exist
+    """
+    try:
+        st = os.stat(directory)
+        return st.st_mtime_ns, st.st_ino
+    except OSError:
+        return None
+
+
+def _dirs_unchanged(dirs) -> bool:
+    # a pattern with wildcards in its directory (e.g. `*/config`) searches several directories, it is always resolved
+    return all(not glob.has_magic(directory) and _dir_key(directory) == key for directory, key in dirs)
+
+
+@contextmanager
+def _gc_paused():
+    """
+    This context manager skips the cyclic gc runs meanwhile (like the parser does). Creating many small objects, e.g.
+    when the cached config is unpickled, would otherwise trigger full collections of the large config again and again.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _cache_file(path, name="config") -> Path:
+    """
+    This function returns the path of a cache file for a given ssh config file.
+    :param path: The (absolute) path of the ssh config file
+    :param name: The name of the cached value (e.g. "config" for the parsed config)
+    :return: The path of the cache file
+    """
+    digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+    return Path(CACHE_DIR) / f"{name}-{digest}.pickle"
+
+
+def _read_cache(path, key, name="config", stale=False):
+    """
+    This function loads a cached value if it is still valid.
+    The cache file holds a small header (version, path, key, included files and the directories searched by `Include`
+    patterns) followed by the pickled value, so a stale cache is detected without unpickling the whole value.
+    :param path: The (absolute) path of the ssh config file
+    :param key: The current identity of the ssh config file
+    :param name: The name of the cached value
+    :param stale: Whether to return the value even if the files changed since it was cached
+    :return: The cached value or None if there is no valid cache
+    """
+    try:
+        with open(_cache_file(path, name), "rb") as file:
+            version, cached_path, cached_key, includes, dirs = pickle.load(file)
+            if version != _CACHE_VERSION or cached_path != path:
+                return None
+            if not stale and (cached_key != key or not _dirs_unchanged(dirs)
+                              or any(_file_key(include) != include_key for include, include_key in includes)):
+                return None
+            with _gc_paused():
+                return pickle.load(file)
+    except Exception:
+        # a missing, corrupt or outdated cache is never an error, we just parse the file again
+        return None
+
+
+def _write_cache(path, key, c: SshConfig, name="config", value=None):
+    """
+    This function writes a value to the cache (atomically).
+    :param path: The (absolute) path of the ssh config file
+    :param key: The identity of the ssh config file the value was derived from
+    :param c: The ssh config object
+    :param name: The name of the cached value
+    :param value: The value to cache (default: the ssh config object)
+    """
+    cache_file = _cache_file(path, name)
+    try:
+        cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # the identities of the files when they were read (see `_read_config`), else as they are now
+        file_keys = getattr(c, "file_keys_", None) or {p: _file_key(p) for p, _ in c.configs_}
+        includes = [(p, file_key) for p, file_key in file_keys.items() if p != path]
+        dirs = getattr(c, "include_dirs_", [])
+        fd, tmp = tempfile.mkstemp(dir=cache_file.parent, prefix=f".{name}-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((_CACHE_VERSION, path, key, includes, dirs), file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(c if value is None else value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        # the cache is an optimization only, a read-only cache dir must not break the cli
+        pass
+
+
+def hosts_file(path=None) -> Path:
+    """
+    This function returns the path of the plain-text list of host names (one per line) of an ssh config file,
+    which is read by the shell completion scripts (without running ssh-cli).
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    """
+    return _cache_file(os.path.abspath(path or CONFIG_FILE_PATH), "hosts").with_suffix(".txt")
+
+
+def _write_hosts_file(path, c: SshConfig):
+    """
+    This function writes the host names of the ssh config for the shell completion (atomically).
+    Patterns and Host lines with several names can't be completed as one word, they are left out.
+    :param path: The (absolute) path of the ssh config file
+    :param c: The ssh config object
+    """
+    target = hosts_file(path)
+    try:
+        target.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".hosts-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.writelines(f"{host}\n" for host in dict.fromkeys(c.hosts())
+                               if not is_pattern(host) and len(host.split()) == 1)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+
+
+def _host_blocks(config_file: SshConfigFile) -> dict:
+    """
+    This function returns the lines of every Host block of a config file.
+    :param config_file: The config file object
+    :return: A dict mapping host names to a tuple of their lines
+    """
+    blocks = {}
+    for record in config_file.records():
+        blocks.setdefault(record.name, tuple(record.lines))
+    return blocks
+
+
+def _take_snapshot(c: SshConfig, previous: dict = None):
+    """
+    This function remembers the Host blocks of the ssh config as they are on disk,
+    `save_config` writes only the blocks that were changed since.
+    :param c: The ssh config object
+    :param previous: A dict mapping paths to a tuple of (config file object, Host blocks) of unchanged files,
+                     a file that is still the same object keeps its Host blocks
+    """
+    previous = previous or {}
+    c.snapshot_ = {path: entry[1] if (entry := previous.get(path)) is not None and entry[0] is config_file
+                   else _host_blocks(config_file) for path, config_file in c.configs_}
+
+
+def _snapshots(c: SshConfig | None) -> dict:
+    """
+    This function returns the Host blocks of the files of an ssh config object (see `_take_snapshot`).
+    :return: A dict mapping paths to a tuple of (config file object, Host blocks)
+    """
+    snapshot = getattr(c, "snapshot_", None) or {}
+    return {path: (config_file, snapshot[path]) for path, config_file in (c.configs_ if c else ()) if path in snapshot}
+
+
+def _read_config(path, parsed: dict) -> SshConfig:
+    """
+    This function reads the ssh config file and the files it includes, a file that was parsed before is reused as long
+    as it is unchanged (so with many included files, only the files that changed are parsed again).
+    The identities of the files and of the directories searched by `Include` patterns are kept in the config object
+    (`file_keys_` and `include_dirs_`), they decide if its cache is still valid.
+    :param path: The (absolute) path of the ssh config file
+    :param parsed: A dict mapping paths to a tuple of (identity, config file object) of files parsed before
+    :return: The ssh config object
+    """
+    file_keys, dirs = {}, []
+
+    def read_file(file_path):
+        # the identity is taken before the file is read, so a change while reading is noticed next time
+        file_keys[file_path] = key = _file_key(file_path)
+        if (entry := parsed.get(file_path)) is not None and entry[0] == key:
+            return entry[1]
+        return read_ssh_config_file(file_path)
+
+    def resolve_includes(base_path, pattern):
+        directory = os.path.dirname(os.path.join(base_path, os.path.expanduser(pattern)))
+        dirs.append((directory, _dir_key(directory)))
+        return _resolve_includes(base_path, pattern)
+
+    c = read_ssh_config(path, read_file, resolve_includes)
+    c.file_keys_, c.include_dirs_ = file_keys, dirs
+    return c
+
+
+def _parsed_files(c: SshConfig | None) -> dict:
+    """
+    This function returns the files of an ssh config object with their identity when they were read.
+    :return: A dict mapping paths to a tuple of (identity, config file object)
+    """
+    file_keys = getattr(c, "file_keys_", None) or {}
+    return {path: (file_keys[path], config_file) for path, config_file in (c.configs_ if c else ())
+            if path in file_keys}
+
+
+def _disk_file(path, parsed: dict) -> SshConfigFile:
+    """
+    This function returns a config file as it is on disk now, a file that was parsed before is reused if unchanged.
+    :param path: The path of the file
+    :param parsed: A dict mapping paths to a tuple of (identity, config file object) of files parsed before
+    :return: The config file object (empty if the file doesn't exist)
+    """
+    try:
+        key = _file_key(path)
+    except FileNotFoundError:
+        return SshConfigFile([])
+    if (entry := parsed.get(path)) is not None and entry[0] == key:
+        return entry[1]
+    return read_ssh_config_file(path)
+
+
+def _changes(model: SshConfigFile, snapshot: dict) -> tuple[dict, set]:
+    """
+    This function compares a config file object with its snapshot.
+    :param model: The changed config file object
+    :param snapshot: The Host blocks of the config file when it was loaded
+    :return: A tuple of a dict mapping the added or changed hosts to their record and the set of removed hosts
+    """
+    blocks = _host_blocks(model)
+    removed = snapshot.keys() - blocks.keys()
+    changed = {host: model.index[host] for host, block in blocks.items() if snapshot.get(host) != block}
+    return changed, removed
+
+
+def _splice(disk: SshConfigFile, changed: dict, removed: set) -> SshConfigFile:
+    """
+    This function applies the changes of a config file object (see `_changes`) to the current content of the file.
+    Hosts that were changed by another process in the meantime are kept, unless they were changed here too.
+    :param disk: The config file as it is on disk now
+    :param changed: The added or changed hosts and their records
+    :param removed: The removed hosts
+    :return: The merged config file object
+    """
+    # changed blocks are replaced in place, new hosts (or hosts removed by another process) are appended
+    disk.splice(changed, removed)
+    return disk
+
+
+def _atomic_write(path, text):
+    """
+    This function replaces a file atomically: the text is written to a temp file that is renamed over the file,
+    so readers never see a partially written file.
+    :param path: The path of the file
+    :param text: The new content
+    """
+    directory = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}-")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    # make the rename durable
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+@contextmanager
+def _locked(path):
+    """
+    This context manager holds an exclusive advisory lock for the ssh config file (on a separate lock file,
+    because the config file itself is replaced on every write).
+    :param path: The (absolute) path of the ssh config file
+    """
+    lock_file = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.lock")
+    with open(lock_file, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _config_dir() -> str | None:
+    return os.path.abspath(CONFIG_DIR) if CONFIG_DIR else None
+
+
+def _fragment_path(c: SshConfig, config_dir, host) -> str:
+    # e.g. `config.d/web1`, or `config.d/web1-2` if a file of that name exists. Characters that are unsafe in file
+    # names become `_` and leading dots are dropped (hidden files are not read, see `_resolve_includes`)
+    name = re.sub(r"[^\w.-]", "_", host).lstrip(".") or "host"
+    base = path = os.path.join(config_dir, name)
+    n, paths = 1, {p for p, _ in c.configs_}
+    while path in paths or os.path.exists(path):
+        n += 1
+        path = f"{base}-{n}"
+    return path
+
+
+def add_host(c: SshConfig, host, **options):
+    """
+    This function adds a new host to the ssh config object. With a config directory (SSH_CLI_CONFIG_DIR), the host
+    gets a file of its own in it (the ssh config file includes the directory), so `save_config` writes only this
+    small file and deleting the host removes the file. Otherwise the host is added to the ssh config file.
+    :param c: The ssh config object
+    :param host: The host name
+    :param options: The options of the host
+    """
+    if (config_dir := _config_dir()) is None:
+        c.add(host, **options)
+        return
+    if any(host in config_file.index for _, config_file in c.configs_):
+        raise ValueError(f"Host {host}: exists (use update).")
+    fragment = SshConfigFile([])
+    fragment.add(host, **options)
+    # no blank line before the only host of the file
+    del fragment.items[0]
+    c.configs_.append((_fragment_path(c, config_dir, host), fragment))
+
+
+def _includes_config_dir(path, config_file: SshConfigFile) -> bool:
+    """
+    This function checks if the ssh config file has an `Include` line for the files of the config directory.
+    :param path: The (absolute) path of the ssh config file
+    :param config_file: The ssh config file object
+    """
+    pattern = os.path.join(_config_dir(), "*")
+    return any((kv := _key_value(line)) and kv[0].lower() == "include"
+               and os.path.join(os.path.dirname(path), os.path.expanduser(kv[1])) == pattern
+               for line in config_file.lines())
+
+
+def load_config(path=None) -> SshConfig:
+    """
+    This function reads the ssh config file. All reads of the ssh config should go through this function.
+    The parsed config is cached on disk and reused as long as the file (path, size, mtime and inode), the files it
+    includes and the directories searched by `Include` patterns are unchanged. Otherwise, only the files that changed
+    are parsed again (see `_read_config`).
+    Whenever the file is parsed, the host names are written for the shell completion (see `hosts_file`).
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    :return: The ssh config object
+    """
+    path = os.path.abspath(path or CONFIG_FILE_PATH)
+    key = _file_key(path)
+
+    with span("read config cache"):
+        c = _read_cache(path, key)
+    if c is not None:
+        if not hasattr(c, "snapshot_"):
+            # cached by an older version
+            _take_snapshot(c)
+        if not hosts_file(path).exists():
+            _write_hosts_file(path, c)
+        return c
+
+    with _gc_paused():
+        with span("read config cache"):
+            previous = _read_cache(path, key, stale=True)
+        with span("parse config", path=path):
+            c = _read_config(path, _parsed_files(previous))
+            _take_snapshot(c, _snapshots(previous))
+        with span("write config cache"):
+            _write_cache(path, c.file_keys_[path], c)
+            _write_hosts_file(path, c)
+    return c
+
+
+def save_config(c: SshConfig, path=None):
+    """
+    This function writes the changes of the ssh config object to the ssh config file (and included files)
+    and refreshes the cache. Concurrent invocations of the cli don't lose each other's changes:
+    under an exclusive lock, the files are read again, only the Host blocks that were added, changed or removed
+    since the config was loaded are spliced in, and each file is replaced atomically.
+    Only the files with changes are written, a file of the config directory that has no hosts left is removed.
+    :param c: The ssh config object
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    """
+    path = os.path.abspath(path or CONFIG_FILE_PATH)
+    snapshot = getattr(c, "snapshot_", None)
+
+    with span("save config"), _locked(path), _gc_paused():
+        config_dir = _config_dir()
+        # the cache holds the parsed files, each is reused if nobody changed it since it was cached. It is only read
+        # for a file outside of the config directory, the files in it hold a host each (reading one is cheaper)
+        cached, parsed, written = None, {}, set()
+
+        def disk_file(file_path) -> SshConfigFile:
+            nonlocal cached
+            if cached is None and os.path.dirname(file_path) != config_dir:
+                cached = _read_cache(path, None, stale=True) or SshConfig([])
+                parsed.update({p: entry for p, entry in _parsed_files(cached).items() if p not in written})
+            return _disk_file(file_path, parsed)
+
+        if (config_dir and not _includes_config_dir(path, c.configs_[0][1])
+                and any(os.path.dirname(file_path) == config_dir for file_path, _ in c.configs_)):
+            os.makedirs(config_dir, mode=0o700, exist_ok=True)
+            if not _includes_config_dir(path, main := disk_file(path)):
+                main.items[:0] = [f"Include {os.path.join(config_dir, '*')}", ""]
+                _atomic_write(path, main.config())
+                parsed[path] = (_file_key(path), main)
+                written.add(path)
+
+        for file_path, config_file in c.configs_:
+            if snapshot is None or file_path not in snapshot:
+                # a new file or the config was not loaded with `load_config`, its content replaces the file
+                merged = config_file
+            else:
+                changed, removed = _changes(config_file, snapshot[file_path])
+                if not changed and not removed:
+                    # nothing changed in this file, it is neither read nor written
+                    continue
+                merged = _splice(disk_file(file_path), changed, removed)
+            if os.path.dirname(file_path) == config_dir and not any(line.strip() for line in merged.lines()):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                parsed.pop(file_path, None)
+                written.add(file_path)
+                continue
+            _atomic_write(file_path, merged.config())
+            parsed[file_path] = (_file_key(file_path), merged)
+            written.add(file_path)
+
+        # the files are read again (files added by others are included), only files changed by others are parsed
+        new = _read_config(path, {**_parsed_files(c), **parsed})
+        # the unchanged files keep their snapshot (of this config object or of the cache)
+        snapshots = {**(_snapshots(c) if snapshot is not None else {}), **_snapshots(cached)}
+        c.configs_, c.file_keys_, c.include_dirs_ = new.configs_, new.file_keys_, new.include_dirs_
+        _take_snapshot(c, {p: entry for p, entry in snapshots.items() if p not in written})
+        _write_cache(path, c.file_keys_[path], c)
+        _write_hosts_file(path, c)
+
+
+def load_derived(name, path=None):
+    """
+    This function reads a value derived from the ssh config file (e.g. a search index) from the cache.
+    :param name: The name of the value
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    :return: The value or None if it is not cached or the ssh config file changed since it was cached
+    """
+    path = os.path.abspath(path or CONFIG_FILE_PATH)
+    try:
+        return _read_cache(path, _file_key(path), name)
+    except FileNotFoundError:
+        return None
+
+
+def save_derived(name, c: SshConfig, value, path=None):
+    """
+    This function caches a value derived from the ssh config file until the file changes.
+    :param name: The name of the value
+    :param c: The ssh config object the value was derived from
+    :param value: The value
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    """
+    path = os.path.abspath(path or CONFIG_FILE_PATH)
+    try:
+        _write_cache(path, _file_key(path), c, name, value)
+    except FileNotFoundError:
+        pass
+
+
+def invalidate_cache(path=None):
+    """
+    This function removes the cached ssh config object and all values derived from it,
+    e.g. after the file was edited outside of this tool.
+    :param path: The path of the ssh config file (default: CONFIG_FILE_PATH)
+    """
+    path = os.path.abspath(path or CONFIG_FILE_PATH)
+    cache_file = _cache_file(path)
+    for file in cache_file.parent.glob(f"*{cache_file.name.removeprefix('config')}"):
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,137 @@
+"""
+Lightweight tracing of the phases of ssh-cli (imports, config parsing, prompts, subprocesses and rendering).
+
+Tracing is enabled with the environment variable `SSH_CLI_TRACE`:
+- `SSH_CLI_TRACE=1` prints a summary of the spans to stderr when ssh-cli exits
+- `SSH_CLI_TRACE=trace.json` writes the spans to a file as Chrome trace events (for chrome://tracing or Perfetto)
+
+When tracing is disabled, `span` returns a shared no-op context manager, so the spans cost next to nothing.
+"""
+import atexit
+import os
+import sys
+import time
+from _thread import get_ident
+
+# the time this module was imported, it is imported first by the package (see `__init__.py`)
+_START = time.perf_counter()
+
+TRACE = os.getenv("SSH_CLI_TRACE") or None
+
+# the finished spans, as (name, start, end, thread id, args) tuples
+_spans = []
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _spans.append((self.name, self.start, time.perf_counter(), get_ident(), self.args))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **args):
+    """
+    This function returns a context manager that records the time spent in its block, e.g.
+    `with span("parse config", path=path): ...`
+    :param name: The name of the span (spans of the same name are summed up in the summary)
+    :param args: Details shown in the Chrome trace
+    """
+    if TRACE is None:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def add_span(name, start, end=None, **args):
+    """
+    This function records a span that was measured elsewhere (e.g. the imports before `main` runs).
+    :param name: The name of the span
+    :param start: The start time (from `time.perf_counter`)
+    :param end: The end time (default: now)
+    """
+    if TRACE is not None:
+        _spans.append((name, start, end if end is not None else time.perf_counter(), get_ident(), args))
+
+
+def startup_time() -> float:
+    """
+    This function returns the time this module was imported (from `time.perf_counter`).
+    """
+    return _START
+
+
+def summary() -> list[tuple[str, int, float, float]]:
+    """
+    This function sums up the spans by name.
+    :return: A list of (name, count, total seconds, maximum seconds) tuples, the slowest first
+    """
+    totals = {}
+    for name, start, end, _, _ in _spans:
+        count, total, longest = totals.get(name, (0, 0.0, 0.0))
+        totals[name] = (count + 1, total + end - start, max(longest, end - start))
+    return sorted(((name, *values) for name, values in totals.items()), key=lambda row: -row[2])
+
+
+def chrome_events() -> list[dict]:
+    """
+    This function returns the spans as Chrome trace events ("complete" events, times in microseconds).
+    """
+    pid = os.getpid()
+    return [
+        {"name": name, "ph": "X", "ts": (start - _START) * 1e6, "dur": (end - start) * 1e6, "pid": pid, "tid": tid,
+         "args": {key: str(value) for key, value in args.items()}}
+        for name, start, end, tid, args in _spans
+    ]
+
+
+def _report():
+    if TRACE is None or not _spans:
+        return
+    if TRACE.lower() in ("1", "true", "yes", "summary"):
+        rows = summary()
+        width = max(len("span"), *(len(name) for name, *_ in rows))
+        print(f"\n{'span':<{width}}  {'count':>5}  {'total':>10}  {'max':>10}", file=sys.stderr)
+        for name, count, total, longest in rows:
+            print(f"{name:<{width}}  {count:>5}  {total * 1000:>7.1f} ms  {longest * 1000:>7.1f} ms", file=sys.stderr)
+    else:
+        import json
+
+        with open(TRACE, "w") as file:
+            json.dump({"traceEvents": chrome_events(), "displayTimeUnit": "ms"}, file)
+        print(f"Trace written to {TRACE}", file=sys.stderr)
+
+
+def enable(output="1"):
+    """
+    This function enables tracing (like `SSH_CLI_TRACE`), the spans are reported when the process exits.
+    :param output: "1" for a summary on stderr or the path of a Chrome trace file
+    """
+    global TRACE
+    if TRACE is None:
+        atexit.register(_report)
+    TRACE = output
+
+
+if TRACE is not None:
+    atexit.register(_report)
@@ -0,0 +1,161 @@
+"""
+An append-only log of the hosts the user connects to (and shows), used to rank the hosts by frecency.
+
+Every use appends one line `<unix time>\t<weight>\t<host>` with a single `write` (no reading), so recording costs next
+to nothing. Appending holds a shared lock, which many processes can hold at once, and compacting an exclusive one,
+so that no line is appended to a log that is being replaced. The score of a host is the sum of the weights of its lines, halved every `HALF_LIFE` seconds.
+When the log grows beyond `MAX_LOG_SIZE`, it is compacted into one line per host holding its current score
+(at most `MAX_HOSTS` lines), which keeps the log small without changing the scores.
+"""
+import fcntl
+import os
+import tempfile
+import time
+
+from .config import USAGE_LOG_PATH
+from .sshconfig import SshConfig
+from .store import load_derived, save_derived
+
+# the weight of a use by its kind
+WEIGHTS = {"connect": 1.0, "show": 0.25}
+
+HALF_LIFE = 3 * 24 * 3600
+MAX_LOG_SIZE = 64 * 1024
+MAX_HOSTS = 1000
+
+# scores below this are forgotten when the log is compacted
+_MIN_SCORE = 0.001
+
+
+def record(host, kind="connect", path=None):
+    """
+    This function records a use of a host. Errors are ignored, ranking the hosts is best effort.
+    :param host: The host name
+    :param kind: The kind of use ("connect" or "show")
+    :param path: The path of the usage log (default: USAGE_LOG_PATH)
+    """
+    path = path or USAGE_LOG_PATH
+    if not host or any(char.isspace() for char in host):
+        return
+    line = f"{int(time.time())}\t{WEIGHTS[kind]}\t{host}\n".encode()
+    try:
+        try:
+            lock = _open_lock(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            lock = _open_lock(path)
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+        if size > MAX_LOG_SIZE:
+            compact(path)
+    except OSError:
+        pass
+
+
+def _open_lock(path):
+    return open(os.path.join(os.path.dirname(path), ".usage.lock"), "w")
+
+
+def _read_lines(path):
+    try:
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    timestamp, weight, host = line.decode().rstrip("\n").split("\t")
+                    yield int(timestamp), float(weight), host
+                except ValueError:
+                    # e.g. a line cut off by a crash, it is dropped at the next compaction
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def scores(path=None, now=None) -> dict[str, float]:
+    """
+    This function computes the frecency score of every host in the usage log.
+    :param path: The path of the usage log (default: USAGE_LOG_PATH)
+    :param now: The time to compute the scores for (default: now)
+    :return: A dict mapping host names to their score
+    """
+    now = time.time() if now is None else now
+    result = {}
+    for timestamp, weight, host in _read_lines(path or USAGE_LOG_PATH):
+        result[host] = result.get(host, 0.0) + weight * 2 ** ((timestamp - now) / HALF_LIFE)
+    return result
+
+
+def compact(path=None):
+    """
+    This function replaces the usage log with one line per host holding its current score
+    (the `MAX_HOSTS` hosts with the highest scores, forgotten hosts are dropped).
+    :param path: The path of the usage log (default: USAGE_LOG_PATH)
+    """
+    path = path or USAGE_LOG_PATH
+    with _open_lock(path) as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.getsize(path) <= MAX_LOG_SIZE:
+                # compacted by another process in the meantime
+                return
+        except FileNotFoundError:
+            return
+
+        now = int(time.time())
+        best = sorted(scores(path, now).items(), key=lambda item: -item[1])[:MAX_HOSTS]
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".usage-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.writelines(f"{now}\t{score:.6g}\t{host}\n" for host, score in best if score >= _MIN_SCORE)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+
+def _log_key(path) -> tuple | None:
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns, st.st_ino
+    except FileNotFoundError:
+        return None
+
+
+def ranked_hosts(c: SshConfig, path=None) -> list[str]:
+    """
+    This function returns the used hosts of the config, the most likely targets first.
+    The ranking is cached alongside the config (until the config or the usage log changes).
+    As all scores decay at the same rate, the ranking only changes when a host is used.
+    :param c: The ssh config object
+    :param path: The path of the usage log (default: USAGE_LOG_PATH)
+    :return: The host names with a score, by descending score
+    """
+    path = path or USAGE_LOG_PATH
+    key = _log_key(path)
+    if key is None:
+        return []
+    if (cached := load_derived("frecency")) is not None and cached[0] == (path, key):
+        return cached[1]
+
+    hosts = set(c.hosts())
+    host_scores = scores(path)
+    ranking = sorted((host for host in host_scores if host in hosts), key=lambda host: -host_scores[host])
+    save_derived("frecency", c, ((path, key), ranking))
+    return ranking
+
+
+def frecency_order(c: SshConfig, hosts=None) -> list[str]:
+    """
+    This function sorts hosts by frecency, hosts that were never used follow in alphabetical order.
+    :param c: The ssh config object
+    :param hosts: The host names (default: all hosts of the config)
+    :return: The sorted host names
+    """
+    hosts = set(c.hosts() if hosts is None else hosts)
+    ranking = [host for host in ranked_hosts(c) if host in hosts]
+    return ranking + sorted(hosts.difference(ranking))
@@ -1,8 +1,8 @@
 import validators
 from inquirer.errors import ValidationError
-from sshconf import read_ssh_config
 
-from .config import CONFIG_FILE_PATH
+from .index import HostIndex
+from .store import load_config
 
 
 def is_number(_, x):
@@ -29,6 +29,20 @@ def is_not_empty(_, x):
         return True
 
 
+def is_valid_alias(_, x):
+    """
+    This function checks if a given input can be the name of a new host (it is also the name of its key file).
+    :param x: what to check
+    :return: True if x is a valid name, raises a ValidationError otherwise
+    """
+    if not x:
+        raise ValidationError(x, reason='Cannot be empty')
+    elif "/" in x or any(char.isspace() for char in x):
+        raise ValidationError(x, reason='Must not contain `/` or whitespace')
+    else:
+        return True
+
+
 def is_valid_hostname(_, x):
     """
     This function checks if a given input is a valid hostname.
@@ -41,14 +55,19 @@ def is_valid_hostname(_, x):
         return True
 
 
-def host_exists(_, x):
+def host_exists(_, x, index: HostIndex = None):
     """
     This function checks if a given host already exists in the ssh config file.
     :param x: what to check
-    :return: True if x is not empty, raises a ValidationError otherwise
+    :param index: the host index to check against (default: build one from the ssh config file)
+    :return: True if x does not exist yet, raises a ValidationError otherwise
     """
-    c = read_ssh_config(CONFIG_FILE_PATH)
-    if x in c.hosts():
+    if index is None:
+        index = HostIndex(load_config())
+
+    if (host := index.find(x)) is None:
+        return True
+    elif host == x:
         raise ValidationError(x, reason='Host already exists, delete it first.')
     else:
-        return True
+        raise ValidationError(x, reason=f'Host already exists as `{host}`, delete it first.')
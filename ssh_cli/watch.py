@@ -0,0 +1,125 @@
+"""
+Watching files for changes: with inotify on Linux (through ctypes, no dependency), by comparing `os.stat` otherwise.
+
+The directories of the files are watched (not the files), so that files replaced with a rename
+(like `save_config` and most editors do) are still noticed. Whole directories can be watched too, e.g. the directory of
+an `Include config.d/*` pattern, where a new file is a change of the config.
+"""
+import ctypes
+import os
+import struct
+
+# inotify constants (see `man inotify`)
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+
+_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def _libc():
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc if hasattr(libc, "inotify_init1") else None
+    except OSError:
+        return None
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+    except FileNotFoundError:
+        return None
+
+
+class FileWatcher:
+    """
+    This class tells if any of a set of files (or of the files in a set of directories) changed on disk since the
+    last check.
+    """
+
+    def __init__(self, paths, use_inotify=True, directories=()):
+        """
+        :param paths: The paths of the files
+        :param use_inotify: Whether to use inotify if it is available (else the files are compared with `os.stat`)
+        :param directories: The paths of directories, a file added to or removed from them is a change too
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self._stats = {path: _stat(path) for path in [*self.paths, *self.directories]}
+        self._fd = None
+        self._names = {}
+
+        if use_inotify and (libc := _libc()) is not None:
+            self._start_inotify(libc)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    def _start_inotify(self, libc):
+        if (fd := libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)) < 0:
+            return
+        directories = {}
+        for path in self.paths:
+            directories.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+        for directory in self.directories:
+            # any file of the directory
+            directories[directory] = None
+        for directory, names in directories.items():
+            if (wd := libc.inotify_add_watch(fd, os.fsencode(directory), _MASK)) < 0:
+                # e.g. the directory doesn't exist or the limit of watches is reached
+                os.close(fd)
+                return
+            self._names[wd] = None if names is None else {os.fsencode(name) for name in names}
+        self._fd = fd
+
+    def _inotify_changed(self) -> bool:
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                names = self._names.get(wd, ())
+                if mask & _IN_Q_OVERFLOW or names is None or name in names:
+                    changed = True
+
+    def _stat_changed(self) -> bool:
+        changed = False
+        for path in self._stats:
+            if (stat := _stat(path)) != self._stats[path]:
+                self._stats[path] = stat
+                changed = True
+        return changed
+
+    def changed(self) -> bool:
+        """
+        This function checks if any of the files changed (was written, replaced or removed) since the last check.
+        It doesn't block.
+        """
+        if self._fd is not None:
+            return self._inotify_changed()
+        return self._stat_changed()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
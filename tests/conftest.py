@@ -0,0 +1,16 @@
+import pytest
+
+from ssh_cli import store, usage
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """
+    This fixture creates an ssh config file (with one host) and makes it the default config of the cli.
+    """
+    path = tmp_path / "config"
+    path.write_text("Host web1\n  HostName 10.0.0.1\n  User root\n")
+    monkeypatch.setattr(store, "CONFIG_FILE_PATH", str(path))
+    monkeypatch.setattr(store, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(usage, "USAGE_LOG_PATH", str(tmp_path / "cache" / "usage.log"))
+    return str(path)
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+SUITE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "suite.py")
+
+
+def _suite(*args):
+    return subprocess.run([sys.executable, SUITE, "--sizes", "50", "--repeat", "1", *args],
+                          capture_output=True, text=True)
+
+
+def test_suite_writes_results(tmp_path):
+    res = _suite("--output", str(tmp_path / "results.json"))
+    assert res.returncode == 0, res.stderr
+    results = json.loads((tmp_path / "results.json").read_text())["results"]
+    assert {"load_cold[50]", "list_table[50]", "host_exists[50]", "cleanup_dry_run[50]", "delete[50]",
+            "startup_import"} <= results.keys()
+
+
+def test_suite_fails_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"delete[50]": 1e-6, "load_cold[50]": 1e-6}}))
+
+    res = _suite("--baseline", str(baseline))
+    assert res.returncode == 1
+    assert "delete[50]" in res.stdout and "load_cold[50]" in res.stdout
+
+    # a threshold per benchmark overrides the default
+    res = _suite("--baseline", str(baseline), "--threshold", "delete=1e9", "--threshold", "load_cold=1e9")
+    assert res.returncode == 0, res.stdout
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from ssh_cli import store
+from ssh_cli.cmds import cleanup
+from ssh_cli.keygen import identity_file_path, identity_files, remove_key_files
+
+
+@pytest.fixture
+def key_dir(tmp_path, monkeypatch):
+    path = tmp_path / "keys"
+    path.mkdir()
+    monkeypatch.setattr(cleanup, "KEY_DIR_PATH", str(path))
+    monkeypatch.setattr(cleanup, "KEY_POOL_DIR", str(path / ".pool"))
+    return path
+
+
+def _touch_key(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("")
+    path.with_name(path.name + ".pub").write_text("")
+
+
+def test_identity_file_path(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USER", "me")
+    options = {"hostname": "10.0.0.1", "user": "root", "port": "2222"}
+
+    assert identity_file_path("~/.ssh/keys/web1", "web1") == str(tmp_path / ".ssh/keys/web1")
+    assert identity_file_path("%d/keys/%n", "web1", options) == str(tmp_path / "keys/web1")
+    assert identity_file_path("/k/%h-%p-%r-%u-%%", "web1", options) == "/k/10.0.0.1-2222-root-me-%"
+    assert identity_file_path("keys/web1", "web1", config_dir=str(tmp_path)) == str(tmp_path / "keys/web1")
+
+
+def test_cleanup_normalizes_paths(config_file, key_dir, monkeypatch):
+    monkeypatch.setenv("HOME", str(key_dir.parent))
+    with open(config_file, "a") as file:
+        file.write("  IdentityFile ~/keys/web1\n")
+        file.write("Host db1 db2\n  IdentityFile keys/%n\n")
+        file.write("Host *\n  IdentityFile %d/keys/all/%h\n")
+    for name in ["web1", "db1", "db2", "all/10.0.0.1", "unused", "sub/unused"]:
+        _touch_key(key_dir / name)
+    _touch_key(key_dir / ".pool" / "ed25519" / "spare" / "key")
+
+    c = store.load_config(config_file)
+    assert cleanup._found_key_files(str(key_dir)) == {str(key_dir / "unused"), str(key_dir / "db1"),
+                                                     str(key_dir / "db2"), str(key_dir / "web1")}
+    unused = cleanup._found_key_files(str(key_dir), recursive=True) - set(identity_files(c))
+    assert unused == {str(key_dir / "unused"), str(key_dir / "sub/unused")}
+
+
+def test_cleanup_dry_run_and_batch(config_file, key_dir, monkeypatch, capsys):
+    _touch_key(key_dir / "unused")
+    c = store.load_config(config_file)
+
+    monkeypatch.setattr(cleanup.inquirer, "list_input", lambda *_, **__: pytest.fail("asked in dry run"))
+    assert cleanup._cleanup_key_files(c, dry_run=True) == 0
+    assert (key_dir / "unused").exists()
+    assert cleanup.CleanupKeys().run(dry_run=True) == 0
+    assert "Cleanup complete" not in capsys.readouterr().out
+
+    monkeypatch.setattr(cleanup.inquirer, "list_input", lambda *_, **__: cleanup._REMOVE_ALL)
+    assert cleanup._cleanup_key_files(c) == 2
+    assert not os.listdir(key_dir)
+
+
+def test_cleanup_many_keys(config_file, key_dir, capsys):
+    with open(config_file, "a") as file:
+        for i in range(10_000):
+            file.write(f"Host host{i}\n  IdentityFile {key_dir}/host{i}\n")
+    for i in range(20_000):
+        (key_dir / f"host{i}").write_text("")
+        (key_dir / f"host{i}.pub").write_text("")
+    c = store.load_config(config_file)
+
+    cleanup._cleanup_key_files(c, dry_run=True)
+    assert "10000 of 20000 key files" in capsys.readouterr().out
+
+
+def test_remove_key_files(key_dir):
+    _touch_key(key_dir / "a")
+    (key_dir / "b").write_text("")
+    removed, missing = remove_key_files([str(key_dir / "a"), str(key_dir / "b")])
+    assert removed == 3 and missing == [str(key_dir / "b.pub")]
+    assert not os.listdir(key_dir)
+
+
+def test_identity_files_of_patterns(config_file, tmp_path):
+    with open(config_file, "w") as file:
+        file.write("Host web1 web2\n  IdentityFile /k/%n\nHost db1\nHost web* !web2\n  IdentityFile /k/p-%n\n"
+                   "Host *\n  IdentityFile /k/all\n  IdentityFile none\n")
+    # tokens of a pattern are expanded for the hosts matching it, the key files of patterns are used by the pattern
+    assert identity_files(store.load_config(config_file)) == {
+        "/k/web1": ["web1"], "/k/web2": ["web2"], "/k/p-web1": ["web* !web2"], "/k/all": ["*"]
+    }
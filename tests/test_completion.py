@@ -0,0 +1,116 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ssh_cli import store
+from ssh_cli.__main__ import _build_parser, _commands, main
+from ssh_cli.cmds.connect import Connect
+from ssh_cli.completion import completion_script
+from ssh_cli.lib import select_host
+
+
+def test_hosts_file_written(config_file):
+    with open(config_file, "a") as file:
+        file.write("Host web2\nHost db1 db1.example.com\nHost *.internal\nHost web1\n")
+    c = store.load_config()
+    assert store.hosts_file().read_text() == "web1\nweb2\n"
+
+    # rewritten when the config is saved
+    c.add("db2", Hostname="10.0.0.4")
+    store.save_config(c)
+    assert store.hosts_file().read_text().splitlines() == ["web1", "web2", "db2"]
+
+    # and when the config changed on disk
+    with open(config_file, "a") as file:
+        file.write("Host db3\n")
+    store.load_config()
+    assert store.hosts_file().read_text().splitlines()[-1] == "db3"
+
+    # and when it was removed (the parsed config is still cached)
+    store.hosts_file().unlink()
+    store.load_config()
+    assert store.hosts_file().exists()
+
+
+def test_positional_host(config_file, monkeypatch, capsys):
+    c = store.load_config()
+    monkeypatch.setattr("inquirer.prompt", lambda *args, **kwargs: pytest.fail("prompted for a host"))
+    assert select_host(c, "web1") == "web1"
+    assert select_host(c, "web9") is None
+    assert "web9" in capsys.readouterr().out
+
+    commands = []
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return subprocess.CompletedProcess(command, 0)
+
+    monkeypatch.setattr("ssh_cli.cmds.connect.subprocess.run", run)
+    assert Connect().run(host="web1") == 0
+    assert "web1" in commands[0]
+
+    # commands that don't use the host reject it
+    for command in ("--list", "--cleanup", "--create"):
+        monkeypatch.setattr(sys, "argv", ["ssh-cli", "web1", command])
+        with pytest.raises(SystemExit) as e:
+            main()
+        assert e.value.code == 2
+        assert f"{command} doesn't take a host" in capsys.readouterr().err
+
+
+def _complete(script, *words) -> list[str]:
+    """
+    This function runs the bash completion function for a command line (without python in PATH).
+    """
+    test = f"""{script}
+COMP_WORDS=({' '.join(words)}); COMP_CWORD={len(words) - 1}; _ssh_cli; printf '%s\\n' "${{COMPREPLY[@]}}"
+"""
+    result = subprocess.run([shutil.which("bash"), "--norc", "--noprofile", "-c", test], env={"PATH": ""},
+                            capture_output=True, text=True, timeout=10)
+    assert result.stderr == ""
+    return result.stdout.split()
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash is not installed")
+def test_bash_completion(config_file):
+    with open(config_file, "a") as file:
+        file.write("Host web2\nHost db1\nHost *.internal\n")
+    store.load_config()
+    script = completion_script("bash", _build_parser(_commands()), store.hosts_file())
+
+    assert _complete(script, "ssh-cli", "--connect", "we") == ["web1", "web2"]
+    assert _complete(script, "ssh-cli", "--connect", "''") == ["web1", "web2", "db1"]
+    assert _complete(script, "ssh-cli", "--sh") == ["--shell", "--show"]
+    assert _complete(script, "ssh-cli", "--format", "n") == ["ndjson"]
+    assert _complete(script, "ssh-cli", "--completion", "''") == ["bash", "zsh", "fish"]
+
+    start = time.perf_counter()
+    _complete(script, "ssh-cli", "--connect", "we")
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize("shell", ["zsh", "fish"])
+def test_other_shells(config_file, shell):
+    script = completion_script(shell, _build_parser(_commands()), store.hosts_file())
+    assert str(store.hosts_file()) in script
+    assert "connect" in script and "ndjson" in script
+    assert "python" not in script
+
+
+def test_completion_cmd(tmp_path):
+    env = {
+        **os.environ,
+        "USER": "test",
+        "SSH_CLI_CONFIG_PATH": str(tmp_path / "config"),
+        "SSH_CLI_KEY_DIR": str(tmp_path / "keys"),
+        "SSH_CLI_CACHE_DIR": str(tmp_path / "cache"),
+    }
+    result = subprocess.run([sys.executable, "-c", "from ssh_cli import main; main()", "--completion", "bash"],
+                            env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert result.returncode == 0
+    assert result.stdout.startswith("# bash completion for ssh-cli")
+    assert "complete -F _ssh_cli ssh-cli" in result.stdout
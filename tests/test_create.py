@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import shutil
+
+import pytest
+
+from ssh_cli.cmds import create
+from ssh_cli.cmds.create import _create_from_inventory
+from ssh_cli.store import load_config
+
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_create_from_csv(config_file, tmp_path):
+    path = _write(tmp_path, "hosts.csv", "hostname,host,user,port\nweb2.example.com,,admin,2222\n10.0.0.3,db1,,\n")
+    assert _create_from_inventory(path) == 0
+
+    c = load_config()
+    assert c.hosts() == ("web1", "web2", "db1")
+    assert c.host("web2") == {"hostname": "web2.example.com", "user": "admin", "port": "2222"}
+    assert c.host("db1")["port"] == "22"
+
+
+@pytest.mark.parametrize("content", [
+    json.dumps([{"host": "db1", "hostname": "10.0.0.3"}, {"host": "db2", "hostname": "10.0.0.4"}], indent=2),
+    '{"host": "db1", "hostname": "10.0.0.3"}\n{"host": "db2", "hostname": "10.0.0.4"}\n',
+])
+def test_create_from_json(config_file, tmp_path, content):
+    assert _create_from_inventory(_write(tmp_path, "hosts.json", content)) == 0
+    assert load_config().hosts() == ("web1", "db1", "db2")
+
+
+def test_create_from_yaml(config_file, tmp_path):
+    pytest.importorskip("yaml")
+    path = _write(tmp_path, "hosts.yaml", "- host: db1\n  hostname: 10.0.0.3\n  port: 2222\n")
+    assert _create_from_inventory(path) == 0
+    assert load_config().host("db1")["port"] == "2222"
+
+
+def test_create_reports_invalid_rows(config_file, tmp_path, capsys):
+    path = _write(tmp_path, "hosts.csv", "\n".join([
+        "host,hostname,port",
+        "web1,10.0.0.9,22",  # exists
+        "db1,not a hostname,22",
+        "db2,10.0.0.4,ssh",
+        "db3,10.0.0.5,22",
+        "db3,10.0.0.6,22",  # duplicate within the file
+    ]))
+    assert _create_from_inventory(path) == 1
+
+    out = capsys.readouterr().out
+    assert [f"Row {row}" in out for row in range(1, 6)] == [True, True, True, False, True]
+    assert load_config().hosts() == ("web1", "db3")
+
+
+def test_create_rejects_names_outside_the_key_dir(config_file, tmp_path, capsys):
+    path = _write(tmp_path, "hosts.csv", "host,hostname\n../db1,10.0.0.3\ndb 2,10.0.0.4\n")
+    assert _create_from_inventory(path) == 1
+    assert "Row 1" in capsys.readouterr().out
+    assert load_config().hosts() == ("web1",)
+
+
+def test_create_reports_malformed_files(config_file, tmp_path, capsys):
+    path = _write(tmp_path, "hosts.csv", "host,hostname\ndb1," + "x" * (csv.field_size_limit() + 1) + "\n")
+    assert _create_from_inventory(path) == 1
+    assert "Error reading" in capsys.readouterr().out
+
+    pytest.importorskip("yaml")
+    path = _write(tmp_path, "hosts.yaml", "- host: db1\n  hostname: [10.0.0.3\n")
+    assert _create_from_inventory(path) == 1
+    assert "Error reading" in capsys.readouterr().out
+    assert load_config().hosts() == ("web1",)
+
+
+@pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+def test_create_with_keys(config_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(create, "KEY_DIR_PATH", str(tmp_path))
+    path = _write(tmp_path, "hosts.csv", "host,hostname,identityfile\ndb1,10.0.0.3,\ndb2,10.0.0.4,/keys/db2\n")
+
+    assert _create_from_inventory(path, keys=True, concurrency=2) == 0
+    c = load_config()
+    assert c.host("db1")["identityfile"] == str(tmp_path / "db1")
+    assert c.host("db2")["identityfile"] == "/keys/db2"
+    assert os.path.exists(tmp_path / "db1.pub")
+
+
+@pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+def test_create_with_keys_rollback(config_file, tmp_path, monkeypatch):
+    def cancel(_):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(create, "KEY_DIR_PATH", str(tmp_path))
+    monkeypatch.setattr(create, "save_config", cancel)
+    path = _write(tmp_path, "hosts.csv", "host,hostname\ndb1,10.0.0.3\ndb2,10.0.0.4\n")
+
+    with pytest.raises(KeyboardInterrupt):
+        _create_from_inventory(path, keys=True)
+    assert not os.path.exists(tmp_path / "db1") and not os.path.exists(tmp_path / "db2.pub")
+    assert load_config().hosts() == ("web1",)
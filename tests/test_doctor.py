@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from ssh_cli import doctor
+from ssh_cli.cmds.doctor import Doctor
+from ssh_cli.doctor import diagnose
+from ssh_cli.keys import private_key_public_blob, public_key_blob
+from ssh_cli.sshconfig import SshConfig, SshConfigFile
+
+needs_keygen = pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+
+
+def _keygen(path, passphrase=""):
+    subprocess.run(["ssh-keygen", "-t", "ed25519", "-N", passphrase, "-f", str(path), "-q"], check=True)
+    return str(path)
+
+
+def _config(text, path="config") -> SshConfig:
+    return SshConfig([(str(path), SshConfigFile(text.splitlines()))])
+
+
+def _checks(findings) -> set:
+    return {(finding.severity, finding.check, tuple(finding.hosts)) for finding in findings}
+
+
+@needs_keygen
+@pytest.mark.parametrize("passphrase", ["", "secret"], ids=["plain", "encrypted"])
+def test_read_key_files(tmp_path, passphrase):
+    key_file = _keygen(tmp_path / "key", passphrase)
+    assert public_key_blob(f"{key_file}.pub") == private_key_public_blob(key_file)
+    assert public_key_blob(f"{key_file}.pub").startswith(b"\0\0\0\x0bssh-ed25519")
+
+    (tmp_path / "garbage").write_text("not a key\n")
+    assert public_key_blob(tmp_path / "garbage") is None
+    assert private_key_public_blob(tmp_path / "garbage") is None
+
+
+def test_config_checks():
+    c = _config("""\
+Host web1
+  HostName 10.0.0.1
+Host web2 WEB1
+  HostName 10.0.0.1
+  Port 22
+Host web1
+  HostName 10.0.0.9
+Host db1
+  HostName bad_host.example.com
+  Port 70000
+Host nas
+  HostName nas
+  Port ssh
+Host *
+  HostName %h.example.com
+""")
+    assert _checks(diagnose(c)) == {
+        ("error", "duplicate-alias", ("web1",)),
+        ("warning", "duplicate-alias", ("web1", "WEB1")),
+        ("warning", "duplicate-endpoint", ("web1", "web2 WEB1")),
+        ("error", "invalid-hostname", ("db1",)),
+        ("error", "invalid-port", ("db1",)),
+        ("error", "invalid-port", ("nas",)),
+    }
+
+
+@needs_keygen
+def test_key_file_checks(tmp_path):
+    good = _keygen(tmp_path / "good")
+    insecure = _keygen(tmp_path / "insecure")
+    os.chmod(insecure, 0o644)
+    mismatch = _keygen(tmp_path / "mismatch")
+    shutil.copy(f"{good}.pub", f"{mismatch}.pub")
+
+    c = _config(f"""\
+Host web1 web2
+  IdentityFile {good}
+Host web3
+  IdentityFile {insecure}
+Host web4
+  IdentityFile {mismatch}
+Host web5
+  IdentityFile keys/%h
+Host *
+  IdentityFile ~/.ssh/id_%h
+""", tmp_path / "config")
+    findings = diagnose(c)
+    assert _checks(findings) == {
+        ("error", "insecure-key", ("web3",)),
+        ("error", "key-mismatch", ("web4",)),
+        ("error", "missing-key", ("web5",)),
+    }
+    assert [finding.path for finding in findings if finding.check == "missing-key"] == [str(tmp_path / "keys/web5")]
+
+
+def test_key_files_checked_concurrently(monkeypatch):
+    c = _config("".join(f"Host web{i}\n  IdentityFile /keys/web{i}\n" for i in range(64)))
+    check = doctor._check_key_file
+
+    def slow_check(path):
+        # like a stat call on a slow network file system
+        time.sleep(0.05)
+        return check(path)
+
+    monkeypatch.setattr(doctor, "_check_key_file", slow_check)
+    start = time.perf_counter()
+    findings = diagnose(c, concurrency=32)
+    assert time.perf_counter() - start < 64 * 0.05 / 4
+    assert [finding.hosts for finding in findings] == [[f"web{i}"] for i in range(64)]
+
+
+def test_doctor_cmd(config_file, capsys):
+    with open(config_file, "a") as file:
+        file.write("Host web2\n  HostName 10.0.0.1\n  User root\n  Port 0\n")
+    assert Doctor().run(format="ndjson") == 1
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(row["severity"], row["check"]) for row in rows] == [("error", "invalid-port")]
+
+    assert Doctor().run() == 1
+    out = capsys.readouterr().out
+    assert "1 error(s)" in out and "[invalid-port] web2" in out
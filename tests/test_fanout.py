@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+
+from ssh_cli import fanout, mux
+
+# a stub `ssh` that runs the remote command locally, with the host in $HOST
+STUB_SSH = """#!/bin/sh
+for arg; do host=$command; command=$arg; done
+HOST=$host exec sh -c "$command"
+"""
+
+
+@pytest.fixture(autouse=True)
+def stub_ssh(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "ssh").write_text(STUB_SSH)
+    (bin_dir / "ssh").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(mux, "CONTROL_DIR", str(tmp_path / "cm"))
+
+
+def test_run_on_hosts_streams_lines():
+    lines = []
+    results = fanout.run_on_hosts(
+        ["web1", "bad"], 'echo "hello $HOST"; echo oops >&2; [ "$HOST" != bad ]',
+        on_line=lambda *line: lines.append(line)
+    )
+
+    assert sorted(lines) == [("bad", "stderr", "oops"), ("bad", "stdout", "hello bad"),
+                             ("web1", "stderr", "oops"), ("web1", "stdout", "hello web1")]
+    assert {result.host: result.code for result in results} == {"web1": 0, "bad": 1}
+    assert all(result.output is None for result in results)
+
+
+def test_run_on_hosts_collects_output_and_times_out():
+    results = fanout.run_on_hosts(
+        ["web1", "slow"], 'echo "$HOST"; [ "$HOST" = slow ] && sleep 5; true', timeout=0.5, collect=True
+    )
+    results = {result.host: result for result in results}
+
+    assert results["web1"].code == 0 and results["web1"].output == [("stdout", "web1")]
+    assert results["slow"].code is None and results["slow"].error == "timed out"
+    assert results["slow"].output == [("stdout", "slow")]
+
+
+def test_run_on_hosts_concurrently():
+    start = time.perf_counter()
+    results = fanout.run_on_hosts([f"host{i}" for i in range(100)], "sleep 0.3", concurrency=50)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 100 and all(result.code == 0 for result in results)
+    assert elapsed < 100 * 0.3 / 5
+
+
+def test_run_on_hosts_splits_long_lines():
+    results = fanout.run_on_hosts(["web1"], "head -c 3000000 /dev/zero | tr '\\0' x; echo; printf end",
+                                  collect=True)
+    output = results[0].output
+    assert "".join(line for _, line in output[:-1]) == "x" * 3000000
+    assert output[-1] == ("stdout", "end")
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+from ssh_cli import store
+from ssh_cli.cmds.create import _create_from_inventory
+from ssh_cli.session import Session
+
+
+@pytest.fixture
+def config_dir(config_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "CONFIG_DIR", str(tmp_path / "config.d"))
+    return tmp_path / "config.d"
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """
+    This fixture records the paths of the files that are parsed.
+    """
+    paths = []
+    read = store.read_ssh_config_file
+
+    def read_ssh_config_file(path):
+        paths.append(os.path.basename(path))
+        return read(path)
+
+    monkeypatch.setattr(store, "read_ssh_config_file", read_ssh_config_file)
+    return paths
+
+
+def test_hosts_get_a_file_of_their_own(config_file, config_dir):
+    c = store.load_config()
+    store.add_host(c, "web2", Hostname="10.0.0.2", User="root")
+    store.save_config(c)
+
+    assert (config_dir / "web2").read_text() == "Host web2\n  HostName 10.0.0.2\n  User root\n"
+    with open(config_file) as file:
+        assert file.read() == f"Include {config_dir}/*\n\nHost web1\n  HostName 10.0.0.1\n  User root"
+    assert store.load_config().hosts() == ("web1", "web2")
+
+    # the config file already includes the directory, it is not written again
+    main = os.stat(config_file)
+    c = store.load_config()
+    store.add_host(c, "web3", Hostname="10.0.0.3")
+    store.save_config(c)
+    c.set("web2", Port="2222")
+    store.save_config(c)
+    assert os.stat(config_file).st_mtime_ns == main.st_mtime_ns
+    assert store.load_config().host("web2")["port"] == "2222"
+
+    with pytest.raises(ValueError):
+        store.add_host(c, "web3", Hostname="10.0.0.3")
+
+    # a host that is removed takes its file along
+    c.remove("web2")
+    store.save_config(c)
+    assert sorted(os.listdir(config_dir)) == ["web3"]
+    assert os.stat(config_file).st_mtime_ns == main.st_mtime_ns
+    assert store.load_config().hosts() == ("web1", "web3")
+
+
+def test_existing_files_are_not_overwritten(config_dir):
+    config_dir.mkdir()
+    (config_dir / "db").write_text("Host db-old\n")
+    c = store.load_config()
+    store.add_host(c, "db", Hostname="10.0.0.5")
+    store.save_config(c)
+    assert (config_dir / "db").read_text() == "Host db-old\n"
+    assert sorted(store.load_config().hosts()) == ["db", "db-old", "web1"]
+
+
+def test_only_changed_files_are_parsed(config_file, config_dir, parsed):
+    c = store.load_config()
+    for i in range(20):
+        store.add_host(c, f"app{i}", Hostname=f"10.0.1.{i}")
+    store.save_config(c)
+    parsed.clear()
+
+    assert len(store.load_config().hosts()) == 21
+    assert parsed == []
+
+    (config_dir / "app3").write_text("Host app3\n  HostName 10.0.2.3\n")
+    assert store.load_config().host("app3") == {"hostname": "10.0.2.3"}
+    assert parsed == ["app3"]
+
+    # a file added to the directory (without changing the config file) is noticed
+    (config_dir / "extra").write_text("Host extra\n")
+    assert "extra" in store.load_config().hosts()
+    assert parsed == ["app3", "extra"]
+
+    # saving reads (and writes) no other files
+    parsed.clear()
+    c = store.load_config()
+    c.remove("app5")
+    store.save_config(c)
+    assert parsed == ["app5"]
+    assert not (config_dir / "app5").exists()
+
+
+def test_save_config_keeps_changes_of_others(config_dir):
+    first, second = store.load_config(), store.load_config()
+    store.add_host(first, "web2", Hostname="10.0.0.2")
+    store.save_config(first)
+    store.add_host(second, "web3", Hostname="10.0.0.3")
+    store.save_config(second)
+
+    # the second invocation sees the host of the first one (and can change it)
+    assert sorted(second.hosts()) == ["web1", "web2", "web3"]
+    second.set("web2", Port="2222")
+    store.save_config(second)
+    assert store.load_config().host("web2") == {"hostname": "10.0.0.2", "port": "2222"}
+
+
+def test_create_from_inventory(config_dir, tmp_path):
+    (tmp_path / "hosts.csv").write_text("host,hostname\napp1,10.0.0.11\napp2,10.0.0.12\n")
+    assert _create_from_inventory(str(tmp_path / "hosts.csv")) == 0
+    assert sorted(os.listdir(config_dir)) == ["app1", "app2"]
+
+
+@pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "stat"])
+def test_session_notices_new_files(config_dir, use_inotify):
+    c = store.load_config()
+    store.add_host(c, "web2", Hostname="10.0.0.2")
+    store.save_config(c)
+
+    session = Session(use_inotify=use_inotify)
+    assert "web2" in session.config.hosts()
+    (config_dir / "web3").write_text("Host web3\n")
+    assert "web3" in session.config.hosts()
+    assert session.loads == 2
+
+
+def test_fragment_names_are_safe(config_dir):
+    c = store.load_config()
+    for host in (".hidden", "web/1", "a b*"):
+        store.add_host(c, host, Hostname="10.0.0.9")
+    store.save_config(c)
+    assert sorted(os.listdir(config_dir)) == ["a_b_", "hidden", "web_1"]
+    assert sorted(store.load_config().hosts()) == [".hidden", "a b*", "web/1", "web1"]
@@ -0,0 +1,30 @@
+from ssh_cli.index import HostIndex, match_hosts
+from ssh_cli.sshconfig import SshConfigFile, SshConfig
+
+
+def _config(text):
+    return SshConfig([("config", SshConfigFile(text.splitlines()))])
+
+
+def test_index_from_config():
+    index = HostIndex(_config("Host db1\n  HostName 10.0.0.5\nHost db2\n  HostName 10.0.0.5\nHost web1\n"))
+    assert "db1" in index and "web1" in index and len(index) == 3
+    assert index.hosts_for_hostname("10.0.0.5") == ["db1", "db2"]
+    assert index.find("DB1") == "db1"
+
+
+def test_index_add_remove():
+    index = HostIndex()
+    index.add("Web1", "Example.com")
+    assert index.hosts_for_hostname("example.com") == ["Web1"]
+    index.remove("Web1")
+    assert "Web1" not in index
+    assert index.find("web1") is None
+    assert index.hosts_for_hostname("example.com") == []
+
+
+def test_match_hosts():
+    hosts = ["web1", "web2", "Web-old", "db1", "*"]
+    assert match_hosts(hosts, "web*") == ["web1", "web2", "Web-old"]
+    assert match_hosts(hosts, "web*, db?, !web-old") == ["web1", "web2", "db1"]
+    assert match_hosts(hosts, "*") == ["web1", "web2", "Web-old", "db1"]
@@ -0,0 +1,33 @@
+import os
+import shutil
+
+import pytest
+
+from ssh_cli.keygen import generate_keys
+
+pytestmark = pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+
+
+def test_generate_keys(tmp_path):
+    key_files = {f"web{i}": str(tmp_path / f"web{i}") for i in range(4)}
+    (tmp_path / "web3").write_text("existing key")
+    progress = []
+
+    created, errors = generate_keys(key_files, concurrency=2, progress=lambda *args: progress.append(args))
+
+    assert sorted(created) == ["web0", "web1", "web2"]
+    assert list(errors) == ["web3"]
+    assert all(os.path.exists(f"{key_file}.pub") for key_file in created.values())
+    assert sorted(done for done, *_ in progress) == [1, 2, 3, 4]
+
+
+def test_generate_keys_rollback(tmp_path):
+    key_files = {f"web{i}": str(tmp_path / f"web{i}") for i in range(4)}
+
+    def cancel(done, *_):
+        if done == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        generate_keys(key_files, concurrency=1, progress=cancel)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,63 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from ssh_cli import keypool
+from ssh_cli.__main__ import main
+
+pytestmark = pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(keypool, "KEY_POOL_DIR", str(tmp_path / ".pool"))
+    return tmp_path
+
+
+def test_refill(pool):
+    assert keypool.refill(3, concurrency=2) == 3
+    assert keypool.refill(3) == 0
+    assert len(keypool.spare_keys()) == 3
+
+
+def test_claim_key(pool):
+    keypool.refill(2)
+    key_file = str(pool / "web1")
+
+    assert keypool.claim_key(key_file, "key_for_web1")
+    assert len(keypool.spare_keys()) == 1
+    with open(f"{key_file}.pub") as file:
+        assert file.read().strip().endswith(" key_for_web1")
+
+    # the host already has a key, the pool is not touched
+    assert not keypool.claim_key(key_file, "key_for_web1")
+    assert len(keypool.spare_keys()) == 1
+
+
+def test_claim_key_with_password(pool):
+    keypool.refill(1)
+    key_file = str(pool / "web1")
+
+    assert keypool.claim_key(key_file, "key_for_web1", password="secret")
+    res = subprocess.run(["ssh-keygen", "-y", "-P", "secret", "-f", key_file], capture_output=True, text=True)
+    assert res.returncode == 0
+    with open(f"{key_file}.pub") as file:
+        assert file.read().split()[1] == res.stdout.split()[1]
+
+
+def test_claim_key_empty_pool(pool):
+    assert not keypool.claim_key(str(pool / "web1"), "key_for_web1")
+    assert not os.path.exists(pool / "web1")
+
+
+def test_refill_keys_zero(pool, monkeypatch, capsys):
+    keypool.refill(1)
+    monkeypatch.setattr("ssh_cli.__main__.ensure_environment", lambda: None)
+    monkeypatch.setattr(sys, "argv", ["ssh-cli", "--refill-keys", "0"])
+    with pytest.raises(SystemExit) as e:
+        main()
+    assert e.value.code == 0
+    assert "the pool holds 1 key(s)" in capsys.readouterr().out
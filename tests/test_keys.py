@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from ssh_cli import keys, store
+from ssh_cli.cmds.list import ListHosts
+from ssh_cli.keys import PublicKeyCache, read_public_key
+from ssh_cli.lib import show_host_config
+
+pytestmark = pytest.mark.skipif(shutil.which("ssh-keygen") is None, reason="ssh-keygen not installed")
+
+
+def _keygen(path, key_type="ed25519", bits=None):
+    subprocess.run(["ssh-keygen", "-t", key_type, *(["-b", str(bits)] if bits else []), "-N", "", "-f", str(path),
+                    "-q"], check=True)
+    return str(path)
+
+
+@pytest.mark.parametrize("key_type,bits", [("ed25519", None), ("rsa", 2048), ("ecdsa", 384)])
+def test_read_public_key(tmp_path, key_type, bits):
+    key_file = _keygen(tmp_path / "key", key_type, bits)
+    # e.g. `256 SHA256:... comment (ED25519)`
+    size, fingerprint, *_, name = subprocess.run(["ssh-keygen", "-l", "-f", f"{key_file}.pub"], check=True,
+                                                 capture_output=True, text=True).stdout.split()
+
+    public_key = read_public_key(f"{key_file}.pub")
+    assert (public_key.type, public_key.bits, public_key.fingerprint) == (name.strip("()"), int(size), fingerprint)
+    assert public_key.text == (tmp_path / "key.pub").read_text().strip()
+
+
+def test_cache(tmp_path, monkeypatch):
+    key_file = _keygen(tmp_path / "key")
+    with PublicKeyCache(tmp_path / "cache.pickle") as cache:
+        public_key = cache.get(f"{key_file}.pub")
+        assert cache.get(tmp_path / "missing.pub") is None
+
+    read = keys.read_public_key
+    monkeypatch.setattr(keys, "read_public_key", lambda path: pytest.fail(f"{path} read again"))
+    with PublicKeyCache(tmp_path / "cache.pickle") as cache:
+        assert cache.get(f"{key_file}.pub") == public_key
+
+    # a changed key file is read again
+    monkeypatch.setattr(keys, "read_public_key", read)
+    os.remove(key_file)
+    os.remove(f"{key_file}.pub")
+    _keygen(tmp_path / "key")
+    with PublicKeyCache(tmp_path / "cache.pickle") as cache:
+        assert cache.get(f"{key_file}.pub").fingerprint != public_key.fingerprint
+
+
+def test_key_column(config_file, tmp_path, capsys):
+    key_file = _keygen(tmp_path / "web1")
+    with open(config_file, "a") as file:
+        file.write(f"  IdentityFile {key_file}\nHost web2\n  IdentityFile ~/missing\n")
+    fingerprint = read_public_key(f"{key_file}.pub").fingerprint
+
+    ListHosts().run(format="ndjson", columns="name,key")
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [
+        {"name": "web1", "key": f"ED25519 256 {fingerprint}"},
+        {"name": "web2", "key": None},
+    ]
+    ListHosts().run(format="ndjson", columns="name,key", effective=True)
+    assert json.loads(capsys.readouterr().out.splitlines()[0])["key"] == f"ED25519 256 {fingerprint}"
+
+    show_host_config("web1", store.load_config())
+    out = capsys.readouterr().out
+    assert fingerprint in out and (tmp_path / "web1.pub").read_text().strip() in out
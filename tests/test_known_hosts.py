@@ -0,0 +1,101 @@
+import base64
+import hashlib
+import hmac
+import os
+
+import pytest
+
+from ssh_cli import known_hosts, store
+from ssh_cli.cmds import delete
+
+KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIOMqqnkVzrm0SdG6UOoqKLsabgH5C9okWi0dh2l9GKJl"
+
+
+def _hashed(name, salt=b"0123456789abcdefghij"):
+    digest = hmac.new(salt, name.encode(), hashlib.sha1).digest()
+    return f"|1|{base64.b64encode(salt).decode()}|{base64.b64encode(digest).decode()}"
+
+
+def test_host_names():
+    assert known_hosts.host_names("Web1", "10.0.0.1") == {"web1", "10.0.0.1"}
+    assert known_hosts.host_names("web1", port="2222") == {"web1", "[web1]:2222"}
+
+
+def test_remove_hosts(tmp_path):
+    path = tmp_path / "known_hosts"
+    lines = [
+        "# comment\n",
+        f"web1,10.0.0.1 {KEY}\n",
+        f"{_hashed('db1')} {KEY}\n",
+        f"{_hashed('[db2]:2222')} {KEY}\n",
+        f"[web2]:2222 {KEY}\n",
+        f"@cert-authority web1 {KEY}\n",
+        f"other {KEY}\n",
+        f"{_hashed('other')} {KEY}\n",
+    ]
+    path.write_text("".join(lines))
+    os.chmod(path, 0o600)
+
+    assert known_hosts.remove_hosts({"10.0.0.1", "db1", "[db2]:2222", "[web2]:2222"}, str(path)) == 4
+    assert path.read_text() == "".join(lines[i] for i in (0, 5, 6, 7))
+    assert (tmp_path / "known_hosts.old").read_text() == "".join(lines)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    # nothing to remove, the file is not rewritten
+    mtime = os.stat(path).st_mtime_ns
+    assert known_hosts.remove_hosts({"unknown"}, str(path)) == 0
+    assert os.stat(path).st_mtime_ns == mtime
+    assert [f for f in os.listdir(tmp_path) if f.startswith(".")] == []
+
+
+def test_delete_hosts(config_file, tmp_path, monkeypatch):
+    with open(config_file, "a") as file:
+        file.write("Host web2\n  HostName 10.0.0.1\nHost db1\n  HostName 10.0.0.5\n  Port 2222\n")
+    path = tmp_path / "known_hosts"
+    path.write_text(f"web1 {KEY}\n10.0.0.1 {KEY}\n{_hashed('[10.0.0.5]:2222')} {KEY}\nweb2 {KEY}\n")
+    monkeypatch.setattr(known_hosts, "KNOWN_HOSTS_PATH", str(path))
+
+    c = store.load_config(config_file)
+    assert delete._delete_hosts(c, ["web1", "db1"]) == 2
+
+    # web2 still uses 10.0.0.1
+    assert path.read_text() == f"10.0.0.1 {KEY}\nweb2 {KEY}\n"
+    assert store.load_config(config_file).hosts() == ("web2",)
+
+
+
+def test_delete_hosts_removes_unused_key_files(config_file, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(known_hosts, "KNOWN_HOSTS_PATH", str(tmp_path / "known_hosts"))
+    (tmp_path / "keys").mkdir()
+    for name in ("app1", "shared", "shared.pub"):
+        (tmp_path / "keys" / name).write_text("")
+    with open(config_file, "w") as file:
+        file.write("Host app1\n  IdentityFile ~/keys/%n\n"
+                   "Host app2\n  IdentityFile ~/keys/shared\nHost db1\n  IdentityFile ~/keys/shared\n")
+
+    # db1 still uses the shared key
+    assert delete._delete_hosts(store.load_config(config_file), ["app1", "app2"]) == 2
+    assert sorted(os.listdir(tmp_path / "keys")) == ["shared", "shared.pub"]
+    out = capsys.readouterr().out
+    assert "Removed 1 key files" in out and f"Key file not found: {tmp_path}/keys/app1.pub" in out
+
+    assert delete._delete_hosts(store.load_config(config_file), ["db1"]) == 1
+    assert os.listdir(tmp_path / "keys") == []
+
+
+def test_delete_hosts_keeps_key_files_if_the_config_is_not_written(config_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(known_hosts, "KNOWN_HOSTS_PATH", str(tmp_path / "known_hosts"))
+    (tmp_path / "known_hosts").write_text("web1 ssh-ed25519 AAAA\n")
+    (tmp_path / "web1").write_text("")
+    with open(config_file, "w") as file:
+        file.write(f"Host web1\n  IdentityFile {tmp_path}/web1\n")
+
+    def fail(_):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(delete, "save_config", fail)
+    with pytest.raises(OSError):
+        delete._delete_hosts(store.load_config(config_file), ["web1"])
+    assert (tmp_path / "web1").exists()
+    assert (tmp_path / "known_hosts").read_text() == "web1 ssh-ed25519 AAAA\n"
@@ -0,0 +1,105 @@
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from ssh_cli import mux, store
+
+# a stub `ssh`: `-f` starts a "master" listening on the ControlPath, `-O exit` stops it,
+# everything else is logged to $SSH_STUB_LOG
+STUB_SSH = f"""#!{sys.executable}
+import os, socket, sys
+args = sys.argv[1:]
+with open(os.environ["SSH_STUB_LOG"], "a") as log:
+    log.write(" ".join(args) + "\\n")
+if "-O" in args:
+    path = args[args.index("-S") + 1]
+    with open(path + ".pid") as file:
+        os.kill(int(file.read()), 15)
+    os.remove(path)
+    os.remove(path + ".pid")
+elif "-f" in args:
+    if args[-1] == "down":
+        sys.exit("ssh: connect to host down port 22: Connection refused")
+    path = next(a.split("=", 1)[1] for a in args if a.startswith("ControlPath="))
+    sock = socket.socket(socket.AF_UNIX)
+    sock.bind(path)
+    sock.listen()
+    if pid := os.fork():
+        with open(path + ".pid", "w") as file:
+            file.write(str(pid))
+    else:
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        while True:
+            sock.accept()[0].close()
+"""
+
+
+@pytest.fixture
+def stub_ssh(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "ssh").write_text(STUB_SSH)
+    (bin_dir / "ssh").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("SSH_STUB_LOG", str(tmp_path / "ssh.log"))
+    monkeypatch.setattr(mux, "CONTROL_DIR", str(tmp_path / "cm"))
+    yield tmp_path / "ssh.log"
+
+    # stop the masters that are still running
+    for pid_file in (tmp_path / "cm").glob("*.pid"):
+        os.kill(int(pid_file.read_text()), signal.SIGTERM)
+
+
+def test_control_path(monkeypatch):
+    monkeypatch.setattr(mux, "CONTROL_DIR", "/tmp/cm")
+    assert mux.control_path("web1") == "/tmp/cm/web1"
+    assert mux.control_path("web 1").startswith("/tmp/cm/h-")
+    assert len(mux.control_path("x" * 200)) < 40
+
+
+def test_warm_and_connect(stub_ssh, config_file):
+    # a persistent master is opt-in
+    assert mux.ssh_command("web1") == ["ssh", "web1"]
+    assert mux.ssh_command("web1", master=True)[:3] == ["ssh", "-o", "ControlMaster=auto"]
+
+    results = mux.warm(["web1", "db1", "down"])
+    assert results["web1"] is None and results["db1"] is None
+    assert "Connection refused" in results["down"]
+    assert [name for name, _, age in mux.masters()] == ["db1", "web1"]
+
+    # a live master is reused, warming again doesn't start another ssh
+    assert mux.ssh_command("web1") == ["ssh", "-S", mux.control_path("web1"), "-o", "ControlMaster=no", "web1"]
+    calls = len(stub_ssh.read_text().splitlines())
+    assert mux.warm(["web1"]) == {"web1": None}
+    assert len(stub_ssh.read_text().splitlines()) == calls
+
+    assert mux.close_master("web1") is None
+    assert [name for name, _, _ in mux.masters()] == ["db1"]
+
+
+def test_stale_socket_is_removed(stub_ssh):
+    mux.warm(["web1"])
+    path = mux.control_path("web1")
+    os.kill(int(open(f"{path}.pid").read()), signal.SIGTERM)
+    os.remove(f"{path}.pid")
+
+    for _ in range(50):
+        if not mux.is_alive(path):
+            break
+        time.sleep(0.01)
+    assert not os.path.exists(path)
+    assert mux.masters() == []
+
+
+def test_connection_sharing_of_the_ssh_config_is_kept(stub_ssh, config_file):
+    with open(config_file, "a") as file:
+        file.write("\nHost db*\n  ControlPath ~/.ssh/cm-%C\n")
+    c = store.load_config()
+    assert mux.ssh_command("db1", master=True, c=c) == ["ssh", "db1"]
+    assert mux.ssh_command("web1", master=True, c=c)[:3] == ["ssh", "-o", "ControlMaster=auto"]
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from ssh_cli.cmds.list import _host_rows
+from ssh_cli.output import parse_columns, write_rows
+from ssh_cli.sshconfig import SshConfig, SshConfigFile
+
+ROWS = [{"name": "web1", "hostname": "10.0.0.1", "identityfile": ["a", "b"]}, {"name": "web2", "hostname": None}]
+
+
+def _write(fmt, columns=("name", "hostname", "identityfile")) -> str:
+    file = io.StringIO()
+    assert write_rows(iter(ROWS), list(columns), fmt, file)
+    return file.getvalue()
+
+
+def test_write_json():
+    assert json.loads(_write("json")) == ROWS
+    assert _write("json").startswith("[\n  {")
+
+
+def test_write_ndjson():
+    assert [json.loads(line) for line in _write("ndjson").splitlines()] == ROWS
+
+
+def test_write_tsv():
+    assert _write("tsv").splitlines() == ["name\thostname\tidentityfile", "web1\t10.0.0.1\ta,b", "web2\t\t"]
+
+
+def test_write_empty():
+    file = io.StringIO()
+    write_rows(iter([]), ["name"], "json", file)
+    assert json.loads(file.getvalue()) == []
+
+
+def test_parse_columns():
+    assert parse_columns(None, ["name"]) == ["name"]
+    assert parse_columns("Name, HostName,,user", ["name"]) == ["name", "hostname", "user"]
+
+
+def test_host_rows_only_computes_requested_columns(monkeypatch):
+    from ssh_cli import resolve
+
+    lines = ["Host web2", "  User root", "Host web1", "  HostName 10.0.0.1", "Host *"]
+    c = SshConfig([("config", SshConfigFile(lines))])
+    assert list(_host_rows(c, ["name", "user"])) == [
+        {"name": "*", "user": None}, {"name": "web1", "user": None}, {"name": "web2", "user": "root"}
+    ]
+
+    def fail(*args):
+        raise AssertionError("host resolved")
+
+    monkeypatch.setattr(resolve.EffectiveConfig, "resolve", fail)
+    assert list(_host_rows(c, ["name"], effective=True)) == [{"name": "web1"}, {"name": "web2"}]
+
+
+def test_list_closed_pipe(tmp_path):
+    path = tmp_path / "config"
+    path.write_text("".join(f"Host host{i}\n  HostName 10.0.{i // 256}.{i % 256}\n" for i in range(20_000)))
+    env = {
+        **os.environ,
+        "USER": "test",
+        "SSH_CLI_CONFIG_PATH": str(path),
+        "SSH_CLI_KEY_DIR": str(tmp_path / "keys"),
+        "SSH_CLI_CACHE_DIR": str(tmp_path / "cache"),
+    }
+    os.makedirs(tmp_path / "keys")
+    # `head -n 2`: the reader closes the pipe after two rows
+    ssh_cli = subprocess.Popen(
+        [sys.executable, "-c", "from ssh_cli import main; main()", "--list", "--format", "ndjson"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+    head = subprocess.run(["head", "-n", "2"], stdin=ssh_cli.stdout, capture_output=True, text=True)
+    ssh_cli.stdout.close()
+    _, stderr = ssh_cli.communicate(timeout=60)
+
+    assert [json.loads(line)["name"] for line in head.stdout.splitlines()] == ["host0", "host1"]
+    assert ssh_cli.returncode == 0
+    assert b"Traceback" not in stderr
+
+
+def test_list_json_on_first_run(tmp_path):
+    # the config file and the key directory are created, the messages don't end up in the json
+    env = {
+        **os.environ,
+        "USER": "test",
+        "SSH_CLI_CONFIG_PATH": str(tmp_path / "config"),
+        "SSH_CLI_KEY_DIR": str(tmp_path / "keys"),
+        "SSH_CLI_CACHE_DIR": str(tmp_path / "cache"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", "from ssh_cli import main; main()", "--list", "--format", "json"],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+    assert result.returncode == 0
+    assert json.loads(result.stdout) == []
+    assert "Config file created" in result.stderr
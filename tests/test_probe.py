@@ -0,0 +1,69 @@
+import asyncio
+import socket
+import threading
+import time
+
+from ssh_cli import probe
+
+
+def _server(banner=None):
+    """
+    This function starts a local listening socket that (optionally) sends a banner to every client.
+    """
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(64)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            if banner:
+                conn.sendall(banner)
+            threading.Timer(2, conn.close).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return sock
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_probe():
+    ssh, silent, noisy = _server(b"SSH-2.0-OpenSSH_9.6\r\n"), _server(), _server(b"x" * 100000)
+    try:
+        result = asyncio.run(probe.probe("web1", "127.0.0.1", ssh.getsockname()[1]))
+        assert result.status == "ssh" and result.banner == "SSH-2.0-OpenSSH_9.6" and result.latency >= 0
+
+        assert asyncio.run(probe.probe("web2", "127.0.0.1", silent.getsockname()[1], timeout=0.2)).status == "open"
+        assert asyncio.run(probe.probe("web3", "127.0.0.1", _free_port())).status == "refused"
+
+        # a bad host is reported, it doesn't abort the probe
+        assert asyncio.run(probe.probe("web4", "127.0.0.1", noisy.getsockname()[1])).status == "open"
+        assert asyncio.run(probe.probe("web5", "127.0.0.1", "ssh")).status == "invalid port"
+    finally:
+        ssh.close()
+        silent.close()
+        noisy.close()
+
+
+def test_probe_hosts_concurrently():
+    # hosts that never send a banner take the whole timeout, probing them one after another would take 50 x 0.5s
+    silent = _server()
+    port = silent.getsockname()[1]
+    results = []
+    try:
+        start = time.perf_counter()
+        probe.probe_hosts([(f"host{i}", "127.0.0.1", port) for i in range(50)], results.append, timeout=0.5)
+        elapsed = time.perf_counter() - start
+    finally:
+        silent.close()
+
+    assert sorted(result.host for result in results) == sorted(f"host{i}" for i in range(50))
+    assert {result.status for result in results} == {"open"}
+    assert elapsed < 3
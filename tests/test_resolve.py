@@ -0,0 +1,140 @@
+import os
+import pwd
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from ssh_cli import config
+from ssh_cli.resolve import EffectiveConfig, PatternIndex, config_blocks, resolve_hosts
+from ssh_cli.sshconfig import SshConfig, SshConfigFile, read_ssh_config
+
+CONFIG = """\
+User global
+Host web1 web2
+  HostName %h.example.com
+  IdentityFile ~/.ssh/keys/%h
+Host web?
+  Port 2222
+  IdentityFile ~/.ssh/keys/shared
+Host *.prod !db.prod
+  User deploy
+  ServerAliveInterval=30
+Match host web1.example.com
+  ForwardAgent yes
+Match originalhost db* user global
+  Port 5432
+Host db.prod
+  HostName 10.0.0.5
+  Include {include}
+Host *
+  User ignored
+  ServerAliveInterval 60
+"""
+
+INCLUDED = """\
+  ForwardAgent yes
+Host app*
+  HostName app.internal
+"""
+
+HOSTS = ["web1", "web2", "web3", "a.prod", "db.prod", "app1", "other"]
+
+# the options that are compared with `ssh -G`
+KEYS = ["hostname", "user", "port", "identityfile", "forwardagent", "serveraliveinterval"]
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    included = tmp_path / "included"
+    included.write_text(INCLUDED)
+    path = tmp_path / "config"
+    path.write_text(CONFIG.format(include=included))
+    return str(path)
+
+
+def test_resolve(config_path):
+    effective = EffectiveConfig(read_ssh_config(config_path), local_user="me")
+    assert effective.resolve("web1") == {
+        "user": "global", "hostname": "web1.example.com", "identityfile": ["~/.ssh/keys/%h", "~/.ssh/keys/shared"],
+        "port": "2222", "forwardagent": "yes", "serveraliveinterval": "60"
+    }
+    assert effective.resolve("db.prod")["hostname"] == "10.0.0.5"
+    assert effective.resolve("db.prod")["port"] == "5432"
+    assert effective.resolve("db.prod")["forwardagent"] == "yes"
+    assert effective.resolve("a.prod")["serveraliveinterval"] == "30"
+    # the included file is inside of `Host db.prod`, so its `Host app*` block only applies to db.prod
+    assert effective.resolve("app1")["hostname"] == "app1"
+    assert effective.resolve("other") == {"user": "global", "serveraliveinterval": "60", "hostname": "other",
+                                          "port": "22"}
+
+
+def test_resolve_sources(config_path):
+    sources = EffectiveConfig(read_ssh_config(config_path)).resolve_sources("web1")
+    assert sources["hostname"] == [("web1.example.com", f"{config_path}:3")]
+    assert sources["port"] == [("2222", f"{config_path}:6")]
+
+
+def test_resolve_defaults(monkeypatch):
+    # the default port of ssh, not the default of ssh-cli for new hosts
+    monkeypatch.setattr(config, "SSH_DEFAULT_PORT", "2022")
+    c = SshConfig([("config", SshConfigFile(["Host web1", "  Port 2200"]))])
+    assert resolve_hosts(c, ["web1", "web2"]) == {
+        "web1": {"port": "2200", "hostname": "web1", "user": pwd.getpwuid(os.getuid()).pw_name},
+        "web2": {"port": "22", "hostname": "web2", "user": pwd.getpwuid(os.getuid()).pw_name},
+    }
+
+
+def test_resolve_reads_lines_like_the_parser():
+    lines = ["Host web1 # the web server", "  HostName=10.0.0.1", '  User "deploy"', "  Port = 2200 # custom",
+             "  IdentityFile ~/.ssh/keys/a#b"]
+    c = SshConfig([("config", SshConfigFile(lines))])
+    assert c.host("web1") == {"hostname": "10.0.0.1", "user": "deploy", "port": "2200",
+                              "identityfile": "~/.ssh/keys/a#b"}
+    assert resolve_hosts(c)["web1"] == {**c.host("web1"), "identityfile": ["~/.ssh/keys/a#b"]}
+
+
+def _ssh_g(config_path, host) -> dict:
+    res = subprocess.run(["ssh", "-G", "-F", config_path, host], capture_output=True, text=True, check=True)
+    options = {}
+    for line in res.stdout.splitlines():
+        key, _, value = line.partition(" ")
+        options.setdefault(key, []).append(value)
+    return options
+
+
+@pytest.mark.skipif(shutil.which("ssh") is None, reason="ssh is not installed")
+@pytest.mark.parametrize("host", HOSTS)
+def test_resolve_matches_ssh(config_path, host):
+    expected = _ssh_g(config_path, host)
+    options = EffectiveConfig(read_ssh_config(config_path)).resolve(host)
+    for key in KEYS:
+        if key in options:
+            value = options[key]
+            assert (value if isinstance(value, list) else [value]) == expected[key], key
+
+
+def test_pattern_index_candidates():
+    c = SshConfig([("config", SshConfigFile(
+        "Host web1\nHost web*\nHost *.prod\nHost w?b*\nHost db\nMatch all\nHost *".splitlines()
+    ))])
+    blocks = config_blocks(c)
+    index = PatternIndex(blocks)
+    assert [blocks[i].value for i in index.candidates("web1")] == ["", "web1", "web*", "w?b*", "all", "*"]
+    assert [blocks[i].value for i in index.candidates("x.prod")] == ["", "*.prod", "all", "*"]
+
+
+def test_resolve_is_linear():
+    def resolve_time(n):
+        lines = []
+        for i in range(n):
+            lines += [f"Host host{i}", f"  HostName 10.0.{i // 256}.{i % 256}", f"Host *.site{i}", "  Port 22"]
+        c = SshConfig([("config", SshConfigFile(lines))])
+        start = time.perf_counter()
+        resolve_hosts(c)
+        return time.perf_counter() - start
+
+    resolve_time(1000)
+    # ten times the hosts (and patterns) must not take a hundred times as long
+    assert resolve_time(10_000) < 30 * resolve_time(1_000)
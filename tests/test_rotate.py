@@ -0,0 +1,190 @@
+import os
+import time
+
+import pytest
+
+from ssh_cli import lib, mux, rotate, store
+from ssh_cli.cmds.rotate_keys import RotateKeys
+from ssh_cli.keygen import generate_key
+from ssh_cli.rotate import plan_rotations, rotate_keys
+
+# a stub `ssh` that runs the remote command locally with $HOME in $STUB_REMOTE/<host>. A key given with `-i` is
+# accepted if it is in the authorized_keys of the host, other connections stand for the key of the ssh config.
+# `down*` hosts refuse connections, `nokey*` hosts never accept a key given with `-i` and on `stuck*` hosts
+# changing authorized_keys with the new key fails.
+STUB_SSH = """#!/bin/sh
+key= verbose=
+while [ $# -gt 2 ]; do
+  case $1 in
+    -i) key=$2; shift 2;;
+    -o|-S) shift 2;;
+    -v) verbose=1; shift;;
+    *) shift;;
+  esac
+done
+host=$1 command=$2 home=$STUB_REMOTE/$1
+mkdir -p "$home"
+sleep "${STUB_DELAY:-0}"
+case $host in down*) echo "ssh: connect to host $host port 22: Connection refused" >&2; exit 255;; esac
+if [ -n "$key" ]; then
+  case $host in
+    nokey*) ;;
+    *) grep -qF -e "$(cut -d' ' -f2 "$key.pub")" "$home/.ssh/authorized_keys" 2>/dev/null && accepted=1;;
+  esac
+  if [ -n "$accepted" ]; then
+    [ -n "$verbose" ] && echo "debug1: Server accepts key: $key ED25519 SHA256:stub explicit" >&2
+    case $host/$command in stuck*mktemp*) echo "stuck" >&2; exit 1;; esac
+  fi
+fi
+HOME=$home exec sh -c "$command"
+"""
+
+# a stub `ssh-keygen` that writes a random (well-formed) ed25519 public key
+STUB_SSH_KEYGEN = """#!/bin/sh
+while [ $# -gt 0 ]; do
+  case $1 in
+    -f) file=$2; shift 2;;
+    -C) comment=$2; shift 2;;
+    *) shift;;
+  esac
+done
+[ -e "$file" ] && { echo "$file already exists" >&2; exit 1; }
+echo "PRIVATE KEY" > "$file"
+key=$({ printf '\\000\\000\\000\\013ssh-ed25519\\000\\000\\000\\040'; head -c 32 /dev/urandom; } | base64 -w0)
+echo "ssh-ed25519 $key $comment" > "$file.pub"
+"""
+
+HOSTS = ["web1", "web2", "nokey1", "down1", "stuck1"]
+
+
+@pytest.fixture
+def remote(config_file, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("ssh", STUB_SSH), ("ssh-keygen", STUB_SSH_KEYGEN)):
+        (bin_dir / name).write_text(script)
+        (bin_dir / name).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("STUB_REMOTE", str(tmp_path / "remote"))
+    monkeypatch.setattr(mux, "CONTROL_DIR", str(tmp_path / "cm"))
+    monkeypatch.setattr(rotate, "KEY_DIR_PATH", str(tmp_path / "keys"))
+
+    # every host has a key, which is authorized on the host
+    (tmp_path / "keys").mkdir()
+    with open(config_file, "w") as file:
+        for host in HOSTS:
+            key_file = tmp_path / "keys" / host
+            assert generate_key(str(key_file), host) is None
+            file.write(f"Host {host}\n  IdentityFile {key_file}\n")
+            os.makedirs(tmp_path / "remote" / host / ".ssh")
+            (tmp_path / "remote" / host / ".ssh" / "authorized_keys").write_text((tmp_path / "keys" / f"{host}.pub")
+                                                                                 .read_text())
+    return tmp_path
+
+
+def _authorized_keys(remote, host) -> list[str]:
+    return [line.split()[1] for line in (remote / "remote" / host / ".ssh" / "authorized_keys").read_text()
+            .splitlines()]
+
+
+def _key(path) -> str:
+    with open(f"{path}.pub") as file:
+        return file.read().split()[1]
+
+
+def test_rotate_keys(remote):
+    c = store.load_config()
+    rotations, errors = plan_rotations(c, HOSTS)
+    assert not errors
+    old_keys = {rotation.host: _key(rotation.old_key_file) for rotation in rotations}
+
+    results = {result.host: result for result in rotate_keys(c, rotations, concurrency=2)}
+
+    # rotated: only the new key is authorized, the config uses it and the old key files are removed
+    c = store.load_config()
+    for host in ("web1", "web2"):
+        assert results[host].error is None
+        new_key_file = results[host].rotation.new_key_file
+        assert _authorized_keys(remote, host) == [_key(new_key_file)]
+        assert c.host(host)["identityfile"] == new_key_file
+        assert not os.path.exists(remote / "keys" / host)
+
+    # failed: rolled back to the old key, the new key files are removed
+    assert results["nokey1"].error.startswith("verify:")
+    assert results["down1"].error.startswith("install:")
+    assert results["stuck1"].error.startswith("remove old key:")
+    for host in ("nokey1", "down1", "stuck1"):
+        assert results[host].done == ()
+        assert _authorized_keys(remote, host) == [old_keys[host]]
+        assert c.host(host)["identityfile"] == str(remote / "keys" / host)
+        assert not os.path.exists(results[host].rotation.new_key_file)
+    assert sorted(os.listdir(remote / "keys")) == sorted(
+        [*(f"{host}{suffix}" for host in ("nokey1", "down1", "stuck1") for suffix in ("", ".pub")),
+         *(os.path.basename(results[host].rotation.new_key_file) + suffix
+           for host in ("web1", "web2") for suffix in ("", ".pub"))]
+    )
+
+
+def test_rotate_keys_rolls_back_when_config_write_fails(remote, monkeypatch):
+    c = store.load_config()
+    rotations, _ = plan_rotations(c, ["web1", "web2"])
+    old_keys = {rotation.host: _key(rotation.old_key_file) for rotation in rotations}
+    text = open(store.CONFIG_FILE_PATH).read()
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(rotate, "save_config", fail)
+    with pytest.raises(OSError):
+        rotate_keys(c, rotations)
+
+    for rotation in rotations:
+        assert _authorized_keys(remote, rotation.host) == [old_keys[rotation.host]]
+        assert not os.path.exists(rotation.new_key_file)
+    assert open(store.CONFIG_FILE_PATH).read() == text
+
+
+def test_plan_rotations(remote):
+    with open(store.CONFIG_FILE_PATH, "a") as file:
+        file.write(f"Host nokeyfile\n  HostName 10.0.0.1\nHost lost\n  IdentityFile {remote}/keys/lost\n")
+    _, errors = plan_rotations(store.load_config(), ["web1", "nokeyfile", "lost"])
+    assert errors == {"nokeyfile": "no IdentityFile", "lost": f"the public key of `{remote}/keys/lost` can't be read"}
+
+
+def test_rotate_keys_concurrently(remote, monkeypatch):
+    monkeypatch.setenv("STUB_DELAY", "0.2")
+    c = store.load_config()
+    rotations, _ = plan_rotations(c, ["web1", "web2"])
+    start = time.perf_counter()
+    results = rotate_keys(c, rotations, concurrency=2)
+    assert all(result.error is None for result in results)
+    # three ssh commands per host
+    assert time.perf_counter() - start < 2 * 3 * 0.2
+
+
+def test_rotate_keys_cmd(remote, monkeypatch, capsys):
+    monkeypatch.setattr(lib.inquirer, "confirm", lambda *_, **__: True)
+    assert RotateKeys().run(hosts="web*,down1") == 1
+    out = capsys.readouterr().out
+    assert "Rotated the key of web1" in out and "down1: install:" in out
+    assert "Rotated the keys of 2 of 3 host(s)" in out
+
+    assert RotateKeys().run(hosts="web*") == 0
+    assert RotateKeys().run(hosts="nothing") == 1
+
+
+def test_rotate_keys_keeps_keys_outside_the_key_dir(remote):
+    # e.g. `~/.ssh/id_ed25519`, which may be used elsewhere
+    os.rename(remote / "keys" / "web1", remote / "id_ed25519")
+    os.rename(remote / "keys" / "web1.pub", remote / "id_ed25519.pub")
+    text = open(store.CONFIG_FILE_PATH).read().replace(str(remote / "keys" / "web1"), str(remote / "id_ed25519"))
+    open(store.CONFIG_FILE_PATH, "w").write(text)
+
+    c = store.load_config()
+    rotations, _ = plan_rotations(c, ["web1", "web2"])
+    unused = []
+    results = rotate_keys(c, rotations, on_unused_key=unused.append)
+    assert all(result.error is None for result in results)
+    assert os.path.exists(remote / "id_ed25519") and os.path.exists(remote / "id_ed25519.pub")
+    assert not os.path.exists(remote / "keys" / "web2")
+    assert unused == [str(remote / "id_ed25519")]
@@ -0,0 +1,74 @@
+from ssh_cli import search
+from ssh_cli.search import HostSearchIndex
+
+
+def _index():
+    return HostSearchIndex(
+        ["db1", "db2", "web1", "web10", "webmail"],
+        {
+            "db1": ("10.0.0.5", "postgres"),
+            "db2": ("10.0.0.6", "postgres"),
+            "web1": ("web1.example.com", "root"),
+            "web10": ("web10.example.com", "root"),
+            "webmail": ("mail.example.com", "admin"),
+        },
+    )
+
+
+def test_search_empty_query():
+    assert _index().search("", limit=2) == ["db1", "db2"]
+
+
+def test_search_alias_ranking():
+    assert _index().search("web1") == ["web1", "web10"]
+    assert _index().search("we")[:3] == ["web1", "web10", "webmail"]
+
+
+def test_search_hostname_and_user():
+    assert _index().search("10.0.0.6") == ["db2"]
+    assert set(_index().search("postgres")) == {"db1", "db2"}
+    assert _index().search("mail.example") == ["webmail"]
+
+
+def test_search_multiple_terms():
+    assert _index().search("root web10") == ["web10"]
+
+
+def test_search_with_many_hosts():
+    hosts = [f"host{i:05d}" for i in range(50_000)]
+    index = HostSearchIndex(hosts, {host: (f"{host}.dc{i % 7}.example.com", "root") for i, host in enumerate(hosts)})
+
+    query = ""
+    for char in "host04242":
+        query += char
+        results = index.search(query, limit=10)
+    assert results[0] == "host04242"
+    assert index.search("dc3", limit=10) == [f"host{i:05d}" for i in range(3, 73, 7)]
+
+
+def test_search_scores_few_hosts_for_specific_queries(monkeypatch):
+    hosts = [f"host{i:05d}" for i in range(50_000)]
+    index = HostSearchIndex(hosts, {host: (f"{host}.dc{i % 7}.example.com", "root") for i, host in enumerate(hosts)})
+    scored = []
+    monkeypatch.setattr(search, "_subsequence_score", lambda query, text: scored.append(text) or 0)
+
+    # no match, typos and a term that is not a prefix: only the hosts sharing trigrams or a first character with
+    # the terms are scored (three fields each), not all 50000 hosts
+    for query in ("zzzz", "hxst04242", "ost04242", "host04242 xyz"):
+        scored.clear()
+        index.search(query, limit=10)
+        assert len(scored) < 3 * 2000, query
+
+
+def test_search_mid_word_and_typos():
+    assert _index().search("eb") == ["web1", "web10", "webmail"]
+    assert _index().search("ai") == ["webmail"]
+    assert _index().search("wb1")[:2] == ["web1", "web10"]
+
+
+def test_search_ordered():
+    index = _index().ordered(["webmail", "db2"])
+    assert index.hosts == ["webmail", "db2", "db1", "web1", "web10"]
+    assert dict(zip(index.hosts, index.details))["db2"] == ("10.0.0.6", "postgres")
+    assert index.search("db") == ["db2", "db1"]
+    assert index.ordered(["db1"]).search("", limit=2) == ["db1", "db2"]
@@ -0,0 +1,85 @@
+import os
+
+import inquirer
+import pytest
+
+from ssh_cli import store
+from ssh_cli.__main__ import ShellCmd
+from ssh_cli.cmds.interface import Command
+from ssh_cli.session import Session
+from ssh_cli.watch import FileWatcher
+
+
+@pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "stat"])
+def test_file_watcher(tmp_path, use_inotify):
+    path = tmp_path / "config"
+    path.write_text("Host web1\n")
+    watcher = FileWatcher([path], use_inotify=use_inotify)
+    assert not watcher.changed()
+
+    path.write_text("Host web1\nHost web2\n")
+    assert watcher.changed()
+    assert not watcher.changed()
+
+    # replaced with a rename, like `save_config` and most editors do
+    (tmp_path / "config.tmp").write_text("Host web3\n")
+    os.replace(tmp_path / "config.tmp", path)
+    assert watcher.changed()
+
+    # other files in the same directory don't count
+    (tmp_path / "other").write_text("x")
+    assert not watcher.changed()
+
+    path.unlink()
+    assert watcher.changed()
+    watcher.close()
+
+
+def test_file_watcher_uses_inotify(tmp_path):
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        pytest.skip("inotify is only available on Linux")
+    assert FileWatcher([tmp_path / "config"]).uses_inotify
+
+
+@pytest.mark.parametrize("use_inotify", [True, False], ids=["inotify", "stat"])
+def test_session_reloads_on_change(config_file, use_inotify):
+    session = Session(use_inotify=use_inotify)
+    c = session.config
+    assert session.config is c and session.index is session.index
+    assert session.loads == 1
+
+    c.add("web2", Hostname="10.0.0.2")
+    store.save_config(c)
+    assert session.config.hosts() == ("web1", "web2")
+    assert "web2" in session.index
+    assert session.loads == 2
+
+    with open(config_file, "a") as file:
+        file.write("Host web3\n")
+    assert "web3" in session.index
+    assert session.loads == 3
+    session.close()
+
+
+class _Recorder(Command):
+    help = "Record"
+    cmd = "record"
+
+    def __init__(self):
+        self.sessions = []
+
+    def run(self, *args, session=None, **kwargs) -> int:
+        self.sessions.append(session)
+        return 0
+
+
+def test_shell_dispatches_by_command(config_file, monkeypatch):
+    recorder = _Recorder()
+    answers = iter([{"cmd": recorder}, {"cmd": recorder}, None])
+    monkeypatch.setattr("ssh_cli.__main__.COMMANDS", [recorder])
+    monkeypatch.setattr(inquirer, "prompt", lambda questions: next(answers))
+    monkeypatch.setattr(inquirer, "confirm", lambda *args, **kwargs: True)
+
+    assert ShellCmd().run() == 0
+    first, second = recorder.sessions
+    assert isinstance(first, Session) and first is second
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from ssh_cli import sshconfig
+
+sshconf = pytest.importorskip("sshconf")
+
+CONFIG = """# global options
+User admin
+IdentitiesOnly yes
+
+Host web1 web1.example.com
+    HostName 10.0.0.1
+    # a comment inside the block
+    IdentityFile ~/.ssh/keys/web1
+    IdentityFile ~/.ssh/keys/shared
+
+# the database
+Host db1
+    HostName 10.0.0.5   # trailing comment
+    Port 2222
+    LocalForward 5432 localhost:5432
+Host *
+    ServerAliveInterval 30
+"""
+
+
+def _strings(options):
+    # sshconf keeps the values passed to add/set as they are, values are always strings here (as after reading)
+    return {key: [str(v) for v in value] if isinstance(value, list) else str(value) for key, value in options.items()}
+
+
+def _both(text):
+    return sshconf.SshConfigFile(text.splitlines()), sshconfig.SshConfigFile(text.splitlines(True))
+
+
+def test_parse_like_sshconf():
+    expected, actual = _both(CONFIG)
+    assert actual.hosts() == expected.hosts()
+    for host in [*expected.hosts(), "unknown"]:
+        assert actual.host(host) == expected.host(host)
+    assert actual.config() == expected.config()
+    assert actual.indent == expected.indent
+
+
+@pytest.mark.parametrize("change", [
+    lambda c: c.add("app1", HostName="10.0.0.9", user="deploy", LocalForward=["1 a:1", "2 b:2"]),
+    lambda c: c.add("app1", before_host="db1", Hostname="10.0.0.9"),
+    lambda c: c.set("db1", Port=22, User="root"),
+    lambda c: c.set("web1 web1.example.com", IdentityFile="~/.ssh/keys/new"),
+    lambda c: c.unset("db1", "port", "localforward"),
+    lambda c: c.rename("db1", "db2"),
+    lambda c: c.remove("db1"),
+    lambda c: c.remove("*"),
+])
+def test_changes_like_sshconf(change):
+    expected, actual = _both(CONFIG)
+    change(expected)
+    change(actual)
+    assert actual.config() == expected.config()
+    assert actual.hosts() == expected.hosts()
+    for host in expected.hosts():
+        assert actual.host(host) == _strings(expected.host(host))
+
+
+def test_errors_like_sshconf():
+    for config_file in _both(CONFIG):
+        with pytest.raises(ValueError):
+            config_file.add("db1")
+        with pytest.raises(ValueError):
+            config_file.set("unknown", Port=22)
+        with pytest.raises(ValueError):
+            config_file.set("db1", Host="x")
+        with pytest.raises(ValueError):
+            config_file.remove("unknown")
+
+
+def test_read_ssh_config_with_includes(tmp_path):
+    (tmp_path / "conf.d").mkdir()
+    (tmp_path / "conf.d" / "extra").write_text("Host extra\n  HostName 10.0.0.7\n")
+    (tmp_path / "config").write_text("Include conf.d/*\n" + CONFIG)
+
+    expected = sshconf.read_ssh_config(str(tmp_path / "config"))
+    actual = sshconfig.read_ssh_config(str(tmp_path / "config"))
+    assert [path for path, _ in actual.configs_] == [path for path, _ in expected.configs_]
+    assert actual.hosts() == expected.hosts()
+    assert actual.host("extra") == expected.host("extra") == {"hostname": "10.0.0.7"}
+    assert actual.config() == expected.config()
+
+    actual.add("new", HostName="10.0.0.8")
+    actual.set("extra", Port=2222)
+    assert "Host new" in actual.configs_[0][1].config()
+    assert actual.configs_[1][1].config() == "Host extra\n  HostName 10.0.0.7\n  Port 2222"
+
+
+def test_duplicate_hosts():
+    config_file = sshconfig.SshConfigFile("Host a\n  Port 1\nHost b\n  Port 2\nHost a\n  User x\n".splitlines())
+    assert config_file.hosts() == ("a", "b", "a")
+    assert config_file.host("a") == {"port": "1", "user": "x"}
+
+
+def test_set_keeps_the_order_of_values():
+    # unlike sshconf, which writes the values of existing lines in reverse order (the first IdentityFile is the
+    # one ssh tries first)
+    config_file = sshconfig.SshConfigFile("Host a\n  IdentityFile x\n  IdentityFile y\n".splitlines())
+    config_file.set("a", IdentityFile=["1", "2", "3"])
+    assert config_file.host("a") == {"identityfile": ["1", "2", "3"]}
+    assert config_file.config() == "Host a\n  IdentityFile 1\n  IdentityFile 2\n  IdentityFile 3"
+
+
+def test_read_ssh_config_include_order_and_cycles(tmp_path):
+    (tmp_path / "conf.d").mkdir()
+    (tmp_path / "conf.d" / "b").write_text("Include conf.d/*\nHost b\n")
+    (tmp_path / "conf.d" / "a").write_text(f"Include {tmp_path}/config\nHost a\n")
+    (tmp_path / "first").write_text("Host first\n")
+    (tmp_path / "config").write_text("Include first\nInclude conf.d/*\nHost main\n")
+
+    # each file is read once, depth first in the order of the Include lines and of the matches
+    c = sshconfig.read_ssh_config(str(tmp_path / "config"))
+    assert [os.path.basename(path) for path, _ in c.configs_] == ["config", "first", "a", "b"]
+    assert c.hosts() == ("main", "first", "a", "b")
+
+
+def test_read_ssh_config_include_depth(tmp_path):
+    for i in range(30):
+        (tmp_path / f"c{i}").write_text(f"Include c{i + 1}\nHost h{i}\n")
+    c = sshconfig.read_ssh_config(str(tmp_path / "c0"))
+    assert len(c.configs_) == sshconfig._MAX_INCLUDE_DEPTH + 1
@@ -0,0 +1,65 @@
+# startup benchmark: ssh-cli is called from scripts in tight loops, so the cold start must stay cheap
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ssh_cli.cmds import COMMANDS
+
+# modules that must not be imported by commands that don't need them (termcolor is needed for any output)
+HEAVY_MODULES = ["inquirer", "prettytable", "validators", "sshconf", "readchar", "blessed"]
+
+# budget for the cumulative import time of the package (in microseconds), override with SSH_CLI_IMPORT_BUDGET_US
+IMPORT_BUDGET_US = int(os.getenv("SSH_CLI_IMPORT_BUDGET_US") or 50_000)
+
+
+def _import_times(tmp_path, *argv) -> dict:
+    """
+    This function runs ssh-cli with `-X importtime` and returns the cumulative import time per module.
+    """
+    env = {
+        **os.environ,
+        "USER": "test",
+        "SSH_CLI_CONFIG_PATH": str(tmp_path / "config"),
+        "SSH_CLI_KEY_DIR": str(tmp_path / "keys"),
+        "SSH_CLI_CACHE_DIR": str(tmp_path / "cache"),
+    }
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"import sys; sys.argv = ['ssh-cli', *{list(argv)!r}]; from ssh_cli import main; main()"],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+    times = {}
+    for line in res.stderr.splitlines():
+        if line.startswith("import time:") and not line.endswith("package"):
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_startup_does_not_import_command_dependencies(tmp_path):
+    times = _import_times(tmp_path, "--config")
+    assert "ssh_cli" in times
+    assert not [module for module in HEAVY_MODULES if module in times]
+
+
+def test_help_imports_no_dependencies(tmp_path):
+    times = _import_times(tmp_path, "--help")
+    assert "ssh_cli" in times
+    assert not [module for module in [*HEAVY_MODULES, "termcolor"] if module in times]
+
+
+def test_startup_import_budget(tmp_path):
+    # take the best of a few runs, the first one may include writing the bytecode cache
+    best = min(_import_times(tmp_path, "--config")["ssh_cli"] for _ in range(3))
+    assert best < IMPORT_BUDGET_US, f"importing ssh_cli took {best}us (budget: {IMPORT_BUDGET_US}us)"
+
+
+@pytest.mark.parametrize("command", COMMANDS, ids=[command.cmd for command in COMMANDS])
+def test_lazy_commands_match_implementation(command):
+    implementation = command.load()
+    assert implementation.cmd == command.cmd
+    assert implementation.help == command.help
+    assert implementation.argument == command.argument
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+
+import pytest
+
+from ssh_cli import store
+
+
+def test_load_config_uses_cache(config_file, monkeypatch):
+    assert store.load_config(config_file).hosts() == ("web1",)
+
+    def fail(_):
+        raise AssertionError("config parsed again")
+
+    monkeypatch.setattr(store, "read_ssh_config", fail)
+    assert store.load_config(config_file).host("web1")["hostname"] == "10.0.0.1"
+
+
+def test_load_config_detects_changes(config_file):
+    store.load_config(config_file)
+    with open(config_file, "a") as file:
+        file.write("\nHost web2\n  HostName 10.0.0.2\n")
+    assert store.load_config(config_file).hosts() == ("web1", "web2")
+
+
+def test_save_config_refreshes_cache(config_file, monkeypatch):
+    c = store.load_config(config_file)
+    c.add("db1", Hostname="10.0.0.5")
+    store.save_config(c, config_file)
+
+    monkeypatch.setattr(store, "read_ssh_config", lambda _: pytest.fail("config parsed again"))
+    assert store.load_config(config_file).hosts() == ("web1", "db1")
+
+
+def test_invalidate_cache(config_file):
+    store.load_config(config_file)
+    assert os.listdir(store.CACHE_DIR)
+    store.invalidate_cache(config_file)
+    assert not [f for f in os.listdir(store.CACHE_DIR) if f.endswith(".pickle")]
+
+
+def test_save_config_merges_concurrent_changes(config_file):
+    with open(config_file, "w") as file:
+        file.write("# my hosts\nUser admin\n\nHost web1\n  HostName 10.0.0.1\n\nHost web2\n  HostName 10.0.0.2\n")
+    os.chmod(config_file, 0o640)
+    first, second = store.load_config(config_file), store.load_config(config_file)
+
+    first.add("db1", Hostname="10.0.0.5")
+    first.set("web2", Hostname="10.0.0.3")
+    store.save_config(first, config_file)
+
+    # the second invocation still has the old config, its changes are applied on top of the first ones
+    second.add("db2", Hostname="10.0.0.6")
+    second.remove("web1")
+    store.save_config(second, config_file)
+
+    with open(config_file) as file:
+        assert file.read() == ("# my hosts\nUser admin\n\nHost web2\n  HostName 10.0.0.3\n\n"
+                               "Host db1\n  HostName 10.0.0.5\n\nHost db2\n  HostName 10.0.0.6\n")
+    assert os.stat(config_file).st_mode & 0o777 == 0o640
+    assert second.hosts() == ("web2", "db1", "db2")
+    assert store.load_config(config_file).hosts() == ("web2", "db1", "db2")
+
+
+def test_save_config_keeps_included_files(config_file, tmp_path):
+    (tmp_path / "extra").write_text("Host db1\n  HostName 10.0.0.5\n")
+    with open(config_file, "a") as file:
+        file.write(f"Include {tmp_path / 'extra'}\n")
+
+    c = store.load_config(config_file)
+    c.set("db1", Hostname="10.0.0.6")
+    store.save_config(c, config_file)
+
+    assert (tmp_path / "extra").read_text() == "Host db1\n  HostName 10.0.0.6"
+    assert "db1" not in open(config_file).read()
+
+
+def _add_host(path, i, barrier):
+    barrier.wait()
+    c = store.load_config(path)
+    c.add(f"host{i}", Hostname=f"10.1.0.{i}")
+    store.save_config(c, path)
+
+
+def test_save_config_parallel_creates(config_file):
+    ctx = multiprocessing.get_context("fork")
+    n = 16
+    barrier = ctx.Barrier(n)
+    processes = [ctx.Process(target=_add_host, args=(config_file, i, barrier)) for i in range(n)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    hosts = store.load_config(config_file).hosts()
+    assert sorted(hosts) == sorted(["web1", *(f"host{i}" for i in range(n))])
+    assert not [f for f in os.listdir(os.path.dirname(config_file)) if f.startswith(".config-")]
@@ -0,0 +1,65 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+from ssh_cli import trace
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setattr(trace, "TRACE", "1")
+    monkeypatch.setattr(trace, "_spans", [])
+
+
+def test_span_disabled(monkeypatch):
+    monkeypatch.setattr(trace, "TRACE", None)
+    monkeypatch.setattr(trace, "_spans", [])
+    with trace.span("parse config") as s:
+        pass
+    assert s is trace.span("other") and trace._spans == []
+
+
+def test_summary(tracing):
+    for _ in range(3):
+        with trace.span("parse config", path="config"):
+            pass
+    with trace.span("render"):
+        with trace.span("prompt"):
+            pass
+    assert {name: count for name, count, _, _ in trace.summary()} == {"parse config": 3, "render": 1, "prompt": 1}
+
+
+def test_chrome_events(tracing):
+    with trace.span("parse config", path="config"):
+        pass
+    event, = trace.chrome_events()
+    assert event["name"] == "parse config" and event["ph"] == "X" and event["args"] == {"path": "config"}
+    assert event["ts"] >= 0 and event["dur"] >= 0
+
+
+def test_trace_and_profile(tmp_path):
+    (tmp_path / "config").write_text("Host web1\n  HostName 10.0.0.1\n")
+    os.makedirs(tmp_path / "keys")
+    env = {
+        **os.environ,
+        "USER": "test",
+        "SSH_CLI_CONFIG_PATH": str(tmp_path / "config"),
+        "SSH_CLI_KEY_DIR": str(tmp_path / "keys"),
+        "SSH_CLI_CACHE_DIR": str(tmp_path / "cache"),
+        "SSH_CLI_TRACE": str(tmp_path / "trace.json"),
+    }
+    res = subprocess.run(
+        [sys.executable, "-c", "from ssh_cli import main; main()", "--list", "--format", "json",
+         "--profile", str(tmp_path / "list.prof")],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+    assert res.returncode == 0, res.stderr
+    assert json.loads(res.stdout) == [{"name": "web1", "hostname": "10.0.0.1"}]
+
+    names = {event["name"] for event in json.loads((tmp_path / "trace.json").read_text())["traceEvents"]}
+    assert {"import ssh_cli", "parse arguments", "import list", "run list", "parse config", "render"} <= names
+    assert pstats.Stats(str(tmp_path / "list.prof")).total_calls > 0
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+import pytest
+
+from ssh_cli import store, usage
+from ssh_cli.cmds.list import _host_rows
+
+
+@pytest.fixture
+def config(config_file):
+    with open(config_file, "a") as file:
+        file.write("Host web2\nHost db1\nHost db2\n")
+    return store.load_config(config_file)
+
+
+def _write_log(*lines):
+    os.makedirs(os.path.dirname(usage.USAGE_LOG_PATH), exist_ok=True)
+    with open(usage.USAGE_LOG_PATH, "w") as file:
+        file.writelines(f"{int(timestamp)}\t{weight}\t{host}\n" for timestamp, weight, host in lines)
+
+
+def test_record(config):
+    usage.record("web1")
+    usage.record("db1", "show")
+    usage.record("bad host")
+    assert usage.scores() == pytest.approx({"web1": 1.0, "db1": 0.25}, rel=1e-3)
+
+
+def test_scores_decay(config):
+    now = int(time.time())
+    _write_log(
+        # used often, but long ago
+        *[(now - 10 * usage.HALF_LIFE, 1.0, "db1")] * 100,
+        # used once, just now
+        (now, 1.0, "web2"),
+        (now - usage.HALF_LIFE, 1.0, "db2"),
+    )
+    with open(usage.USAGE_LOG_PATH, "a") as file:
+        file.write("garbage line\n12")
+    assert usage.scores(now=now) == pytest.approx({"db1": 100 / 1024, "web2": 1.0, "db2": 0.5})
+    assert usage.ranked_hosts(config) == ["web2", "db2", "db1"]
+
+
+def test_frecency_order(config):
+    usage.record("db2")
+    usage.record("db2")
+    usage.record("web2")
+    usage.record("unknown")
+    assert usage.frecency_order(config) == ["db2", "web2", "db1", "web1"]
+    assert [row["name"] for row in _host_rows(config, ["name"], sort="recent")] == ["db2", "web2", "db1", "web1"]
+
+
+def test_ranking_is_cached(config, monkeypatch):
+    usage.record("db1")
+    assert usage.ranked_hosts(config) == ["db1"]
+
+    scores = usage.scores
+    monkeypatch.setattr(usage, "scores", lambda *args: pytest.fail("usage log read again"))
+    assert usage.ranked_hosts(config) == ["db1"]
+
+    # a new use changes the log, the ranking is computed again
+    monkeypatch.setattr(usage, "scores", scores)
+    usage.record("web2")
+    usage.record("web2")
+    assert usage.ranked_hosts(config) == ["web2", "db1"]
+
+
+def test_compact_keeps_scores(config, monkeypatch):
+    for i in range(500):
+        usage.record(f"host{i % 50}")
+    usage.record("web1")
+    before, size = usage.scores(), os.path.getsize(usage.USAGE_LOG_PATH)
+
+    monkeypatch.setattr(usage, "MAX_LOG_SIZE", 0)
+    usage.compact()
+    assert usage.scores() == pytest.approx(before, rel=1e-3)
+    assert os.path.getsize(usage.USAGE_LOG_PATH) < size / 5
+
+
+def test_log_stays_bounded(config, monkeypatch):
+    monkeypatch.setattr(usage, "MAX_LOG_SIZE", 1024)
+    monkeypatch.setattr(usage, "MAX_HOSTS", 20)
+    for i in range(1000):
+        usage.record(f"host{i % 100}")
+        assert os.path.getsize(usage.USAGE_LOG_PATH) <= 1024
+    assert len(usage.scores()) < 100
+
+
+
+def test_no_use_is_lost_while_compacting(config, monkeypatch):
+    monkeypatch.setattr(usage, "MAX_LOG_SIZE", 512)
+
+    def connect():
+        for i in range(200):
+            usage.record(f"host{i % 10}")
+
+    threads = [threading.Thread(target=connect) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # compacting keeps the scores, so they add up to the number of uses
+    assert sum(usage.scores().values()) == pytest.approx(800, rel=1e-3)
+
+
+def test_search_index_is_not_rebuilt_when_the_order_changes(config, monkeypatch):
+    from ssh_cli import search
+
+    index = search.search_index(config, usage.frecency_order(config))
+    monkeypatch.setattr(search, "HostSearchIndex", lambda *_: pytest.fail("index rebuilt"))
+    usage.record("db2")
+    index = search.search_index(config, usage.frecency_order(config))
+
+    # the most used host comes first, for an empty query and among equal matches
+    assert index.hosts[0] == "db2"
+    assert index.search("")[:2] == ["db2", "db1"]
+    assert index.search("db") == ["db2", "db1"]
+    assert dict(zip(index.hosts, index.details))["db2"] == (None, None)
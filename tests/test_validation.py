@@ -2,7 +2,8 @@
 
 import pytest
 
-from ssh_cli.validation import is_number, is_not_empty, is_valid_hostname
+from ssh_cli.index import HostIndex
+from ssh_cli.validation import is_number, is_not_empty, is_valid_alias, is_valid_hostname, host_exists
 
 
 def test_is_number():
@@ -17,7 +18,25 @@ def test_is_not_empty():
         is_not_empty(None, "")
 
 
+def test_is_valid_alias():
+    assert is_valid_alias(None, "web-1.prod") == True
+    for x in ("", "../web1", "web 1", "web\t1"):
+        with pytest.raises(Exception):
+            is_valid_alias(None, x)
+
+
 def test_is_valid_hostname():
     assert is_valid_hostname(None, "example.com") == True
     with pytest.raises(Exception):
         is_valid_hostname(None, "example")
+
+
+def test_host_exists():
+    index = HostIndex()
+    index.add("web1", "10.0.0.1")
+    assert host_exists(None, "web2", index) == True
+    with pytest.raises(Exception):
+        host_exists(None, "web1", index)
+    with pytest.raises(Exception) as e:
+        host_exists(None, "WEB1", index)
+    assert "`web1`" in e.value.reason